@@ -13,43 +13,504 @@ SkyBattle - 一体化 Web 应用
 """
 
 import argparse
+import gzip
+import hashlib
 import json
+import math
+import multiprocessing
+import re
+import struct
+import sys
 import threading
 import time
 import numpy as np
 from pathlib import Path
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from dataclasses import dataclass, asdict, field
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import os
 
 # 导入核心模块
-from backend.envs import CombatEnv, CombatConfig
+from backend.envs import CombatEnv, CombatConfig, Drone
 from backend.agents import MAPPOAgent
+from backend.utils.jit import njit, HAS_NUMBA
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+
+def _json_default(obj):
+    """标准库 json 回退: 把 NumPy 数组/标量转成 Python 对象"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(data) -> bytes:
+    """序列化为 JSON 字节: 优先 orjson (C 实现，原生支持 NumPy)"""
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_json_default).encode()
+
+# ============================================================
+#                       追击策略内核
+# ============================================================
+
+# 控制量随机扰动幅度 [throttle, pitch, yaw, roll]
+ACTION_NOISE = np.array([0.1, 0.05, 0.1, 0.1])
+
+
+@njit(cache=True)
+def _wrap_angle(angle):
+    """把角度归一化到 [-pi, pi)，标量与数组通用，无分支"""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def _compute_actions_numpy(pos, orient, hp, alive, is_red, noise, missile_roll, step):
+    """追击策略 - NumPy 向量化实现 (无 Numba 时使用)
+
+    Returns:
+        (discrete[N], continuous[N, 4])
+    """
+    n = len(pos)
+    discrete = np.zeros(n, dtype=np.int64)
+    continuous = np.zeros((n, 4))
+    
+    # 没有敌人时巡逻
+    continuous[alive, 0] = 0.3
+    continuous[alive, 2] = math.sin(step * 0.05) * 0.3
+    
+    red_idx = np.flatnonzero(alive & is_red)
+    blue_idx = np.flatnonzero(alive & ~is_red)
+    if len(red_idx) == 0 or len(blue_idx) == 0:
+        return discrete, continuous
+    
+    # 红蓝两队两两距离矩阵 (R, B)，两队共用
+    diff = pos[red_idx, None, :] - pos[None, blue_idx, :]
+    dist_rb = np.sqrt((diff * diff).sum(-1))
+    
+    # 找最近或血量最低的敌人 (距离 + HP*2 最小)
+    active = np.concatenate([red_idx, blue_idx])
+    target = np.concatenate([
+        blue_idx[np.argmin(dist_rb + hp[blue_idx] * 2, axis=1)],
+        red_idx[np.argmin(dist_rb.T + hp[red_idx] * 2, axis=1)],
+    ])
+    
+    to_target = pos[target] - pos[active]
+    dist = np.sqrt((to_target * to_target).sum(-1))
+    
+    # 距离过近时给一个默认朝向
+    too_close = dist < 1
+    to_target[too_close] = (1.0, 0.0, 0.0)
+    dist[too_close] = 1.0
+    
+    direction = to_target / dist[:, None]
+    
+    # 计算转向
+    yaw_target = np.arctan2(direction[:, 1], direction[:, 0])
+    pitch_target = np.arcsin(np.clip(direction[:, 2], -1, 1))
+    
+    yaw_error = yaw_target - orient[active, 2]
+    pitch_error = pitch_target - orient[active, 1]
+    
+    # 归一化角度误差到 [-pi, pi)
+    yaw_error = _wrap_angle(yaw_error)
+    
+    # 控制输入
+    throttle = np.where(dist > 100, 0.8, 0.5)
+    yaw_rate = np.clip(yaw_error * 0.5, -1, 1)
+    pitch_rate = np.clip(pitch_error * 0.5, -1, 1)
+    
+    # 决定是否开火: 近距离且瞄准 - 机枪; 中距离瞄准好 - 偶尔发射导弹
+    angle_to_target = np.abs(yaw_error) + np.abs(pitch_error)
+    fire_gun = (dist < 150) & (angle_to_target < 0.5)
+    fire_missile = (dist < 300) & (angle_to_target < 0.3) & (missile_roll[active] < 0.02)
+    discrete[active] = np.where(fire_gun, 1, np.where(fire_missile, 2, 0))
+    
+    # 添加一点随机性让战斗更自然
+    continuous[active, 0] = np.clip(throttle + noise[active, 0], 0, 1)
+    continuous[active, 1] = np.clip(pitch_rate + noise[active, 1], -1, 1)
+    continuous[active, 2] = np.clip(yaw_rate + noise[active, 2], -1, 1)
+    continuous[active, 3] = noise[active, 3]  # 少量翻滚
+    
+    return discrete, continuous
+
+
+@njit(cache=True, fastmath=True)
+def _compute_actions_kernel(pos, orient, hp, alive, is_red, noise, missile_roll, step):
+    """追击策略 - Numba 编译内核，逐机计算，语义与 NumPy 实现一致"""
+    n = pos.shape[0]
+    discrete = np.zeros(n, dtype=np.int64)
+    continuous = np.zeros((n, 4))
+    patrol_yaw = math.sin(step * 0.05) * 0.3
+    
+    for i in range(n):
+        if not alive[i]:
+            continue
+        
+        # 找最近或血量最低的敌人
+        target = -1
+        best_score = 0.0
+        for j in range(n):
+            if not alive[j] or is_red[j] == is_red[i]:
+                continue
+            dx = pos[j, 0] - pos[i, 0]
+            dy = pos[j, 1] - pos[i, 1]
+            dz = pos[j, 2] - pos[i, 2]
+            score = math.sqrt(dx * dx + dy * dy + dz * dz) + hp[j] * 2
+            if target < 0 or score < best_score:
+                target = j
+                best_score = score
+        
+        if target < 0:
+            # 没有敌人，巡逻
+            continuous[i, 0] = 0.3
+            continuous[i, 2] = patrol_yaw
+            continue
+        
+        dx = pos[target, 0] - pos[i, 0]
+        dy = pos[target, 1] - pos[i, 1]
+        dz = pos[target, 2] - pos[i, 2]
+        dist = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if dist < 1:
+            dx, dy, dz = 1.0, 0.0, 0.0
+            dist = 1.0
+        
+        yaw_target = math.atan2(dy / dist, dx / dist)
+        pitch_target = math.asin(min(max(dz / dist, -1.0), 1.0))
+        
+        yaw_error = yaw_target - orient[i, 2]
+        pitch_error = pitch_target - orient[i, 1]
+        yaw_error = _wrap_angle(yaw_error)
+        
+        throttle = 0.8 if dist > 100 else 0.5
+        yaw_rate = min(max(yaw_error * 0.5, -1.0), 1.0)
+        pitch_rate = min(max(pitch_error * 0.5, -1.0), 1.0)
+        
+        angle_to_target = abs(yaw_error) + abs(pitch_error)
+        if dist < 150 and angle_to_target < 0.5:
+            discrete[i] = 1
+        elif dist < 300 and angle_to_target < 0.3 and missile_roll[i] < 0.02:
+            discrete[i] = 2
+        
+        continuous[i, 0] = min(max(throttle + noise[i, 0], 0.0), 1.0)
+        continuous[i, 1] = min(max(pitch_rate + noise[i, 1], -1.0), 1.0)
+        continuous[i, 2] = min(max(yaw_rate + noise[i, 2], -1.0), 1.0)
+        continuous[i, 3] = noise[i, 3]
+    
+    return discrete, continuous
+
+
+# 有 Numba 时使用编译内核，否则退回 NumPy 向量化实现
+_compute_actions = _compute_actions_kernel if HAS_NUMBA else _compute_actions_numpy
+
+
+def warmup_kernels():
+    """启动时预先编译 (或从磁盘缓存加载) Numba 内核，避免第一局游戏承担 JIT 编译延迟"""
+    if not HAS_NUMBA:
+        return
+    pos = np.array([[0.0, 0.0, 100.0], [100.0, 0.0, 100.0]])
+    # 参数的 dtype 和内存布局与 _get_smart_actions 一致: missile_roll 是 draws 的跨步列视图
+    draws = np.random.default_rng(0).random((2, 5))
+    _compute_actions_kernel(pos, np.zeros((2, 3)), np.full(2, 100.0), np.ones(2, dtype=bool),
+                            np.array([True, False]), (draws[:, :4] * 2 - 1) * ACTION_NOISE,
+                            draws[:, 4], 0)
+    _wrap_angle(0.0)
+    _wrap_angle(np.zeros(2))
+
+
+def _drone_arrays(drones: List[dict]) -> Tuple[np.ndarray, ...]:
+    """把渲染状态中的无人机列表一次性整理为 SoA 数组
+
+    Returns:
+        (pos[N, 3], vel[N, 3], orient[N, 3], hp[N], alive[N], is_red[N])
+    """
+    n = len(drones)
+    pos = np.array([d["position"] for d in drones], dtype=np.float64).reshape(n, 3)
+    vel = np.array([d["velocity"] for d in drones], dtype=np.float64).reshape(n, 3)
+    orient = np.array([d["orientation"] for d in drones], dtype=np.float64).reshape(n, 3)
+    hp = np.fromiter((d["hp"] for d in drones), dtype=np.float64, count=n)
+    alive = np.fromiter((d["is_alive"] for d in drones), dtype=bool, count=n)
+    is_red = np.fromiter((d["team"] == "red" for d in drones), dtype=bool, count=n)
+    return pos, vel, orient, hp, alive, is_red
 
 # ============================================================
 #                       全局状态管理
 # ============================================================
 
+# 共享内存中的游戏状态编码 (控制块: [current_frame, status, winner])
+STATUS_CODES = ("waiting", "running", "paused", "finished", "stopped")
+WINNER_CODES = (None, "red", "blue", "draw")
+
+# 弹药最长寿命 (秒，与 CombatEnv 中导弹一致)，用于估算共享内存中弹药缓冲的上界
+PROJECTILE_MAX_LIFETIME = 3.5
+
+
+def _frame_layout(n: int, max_steps: int, proj_capacity: int) -> List[Tuple[str, tuple, type]]:
+    """帧缓冲的字段布局 (名称, 形状, 类型)，本地分配与共享内存共用"""
+    return [
+        ("control", (3,), np.int64),
+        ("positions", (max_steps, n, 3), np.float32),
+        ("velocities", (max_steps, n, 3), np.float32),
+        ("hp", (max_steps, n), np.float32),
+        ("alive", (max_steps, n), np.bool_),
+        ("alive_count", (max_steps, 2), np.int16),
+        ("team_hp", (max_steps, 2), np.float32),
+        ("proj_offsets", (max_steps + 1,), np.int64),
+        ("proj_positions", (proj_capacity, 3), np.float32),
+    ]
+
+
+def _layout_nbytes(layout) -> int:
+    """按 8 字节对齐累加各字段所需字节数"""
+    total = 0
+    for _, shape, dtype in layout:
+        total += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    return total
+
+
 @dataclass
 class GameState:
-    """游戏状态"""
+    """游戏状态
+
+    帧数据以预分配的 SoA 数组保存 (第一维为帧序号)，``current_frame``
+    为已写入的帧数。弹药数量每帧不同，所有帧的弹药位置连续存放在
+    ``proj_positions`` 中，第 i 帧占 ``proj_offsets[i]:proj_offsets[i+1]`` 行 (CSR 布局)。
+
+    单写多读、无锁: 游戏线程通过 ``record_frame`` 先写完第 i 帧的所有缓冲，
+    最后才把 ``current_frame`` 发布为 i+1 (GIL 下单次属性赋值是原子的)；
+    HTTP 线程先快照 ``current_frame``，只读取该前缀，因此总能看到完整的帧。
+
+    多进程模式下缓冲位于 ``SharedMemory`` 中，由工作进程写入；帧数、状态和
+    胜者额外写入 ``control`` 控制块，主进程通过 ``refresh`` 同步到属性上。
+    """
     game_id: str
     status: str  # waiting, running, paused, finished
-    frames: List[dict]
     current_frame: int
     winner: Optional[str]
     config: dict
+    drone_ids: List[str] = field(default_factory=list)
+    teams: List[str] = field(default_factory=list)
+    positions: Optional[np.ndarray] = None    # (max_steps, N, 3) float32
+    velocities: Optional[np.ndarray] = None   # (max_steps, N, 3) float32
+    hp: Optional[np.ndarray] = None           # (max_steps, N) float32
+    alive: Optional[np.ndarray] = None        # (max_steps, N) bool
+    alive_count: Optional[np.ndarray] = None  # (max_steps, 2) int16 [red, blue]
+    team_hp: Optional[np.ndarray] = None      # (max_steps, 2) float32 [red, blue]
+    proj_offsets: Optional[np.ndarray] = None    # (max_steps + 1,) int64
+    proj_positions: Optional[np.ndarray] = None  # (capacity, 3) float32，本地模式按需倍增
+    control: Optional[np.ndarray] = None         # (3,) int64，仅多进程模式
+    shm: Optional[SharedMemory] = field(default=None, repr=False)
+    finished: threading.Event = field(default_factory=threading.Event, repr=False)
+    
+    def allocate(self, drones: List[dict], max_steps: int, shared: bool = False):
+        """按首帧的无人机列表预分配帧缓冲
+
+        Args:
+            shared: 在共享内存中分配，供工作进程写入。共享内存无法扩容，
+                弹药缓冲按每架无人机每步最多发射一枚、弹药寿命有限估算上界；
+                弹药和导弹总数有限，上界同时不超过整局可能出现的弹药帧数
+        """
+        n = len(drones)
+        self.drone_ids = [d["id"] for d in drones]
+        self.teams = [d["team"] for d in drones]
+        if shared:
+            dt = CombatConfig().dt
+            lifetime_frames = math.ceil(PROJECTILE_MAX_LIFETIME / dt) + 1
+            per_game = n * (Drone.MAX_AMMO + Drone.MAX_MISSILES) * lifetime_frames
+            proj_capacity = max(64, min(max_steps * n * lifetime_frames, per_game))
+            layout = _frame_layout(n, max_steps, proj_capacity)
+            self.shm = SharedMemory(create=True, size=_layout_nbytes(layout))
+            self._bind(layout)
+        else:
+            self._bind(_frame_layout(n, max_steps, max(64, 4 * n)))
+            self.control = None
+        self.current_frame = 0
+    
+    def attach(self, shm_name: str, drone_ids: List[str], teams: List[str], proj_capacity: int):
+        """在工作进程中挂载主进程分配的共享帧缓冲"""
+        self.drone_ids = list(drone_ids)
+        self.teams = list(teams)
+        self.shm = SharedMemory(name=shm_name)
+        self._bind(_frame_layout(len(drone_ids), self.config["max_steps"], proj_capacity))
+    
+    def _bind(self, layout):
+        """按布局创建各字段数组 (有共享内存时为其上的视图)"""
+        offset = 0
+        for name, shape, dtype in layout:
+            if self.shm is None:
+                setattr(self, name, np.zeros(shape, dtype=dtype))
+                continue
+            count = int(np.prod(shape))
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+            offset += -(-count * np.dtype(dtype).itemsize // 8) * 8
+    
+    def set_status(self, status: str):
+        """更新状态 (多进程模式下连同胜者一起发布到控制块)"""
+        self.status = status
+        if self.control is not None:
+            self.control[2] = WINNER_CODES.index(self.winner)
+            self.control[1] = STATUS_CODES.index(status)
+        if status == "finished":
+            self.finished.set()
+    
+    def refresh(self):
+        """多进程模式: 从控制块同步状态、胜者和帧数 (先读状态再读帧数)"""
+        if self.control is None:
+            return
+        self.status = STATUS_CODES[int(self.control[1])]
+        self.winner = WINNER_CODES[int(self.control[2])]
+        self.current_frame = int(self.control[0])
+    
+    def release(self, unlink: bool = False):
+        """释放共享内存 (由创建方负责 unlink)"""
+        if self.shm is None:
+            return
+        for name, _, _ in _frame_layout(0, 0, 0):
+            setattr(self, name, None)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+    
+    def record_frame(self, step: int, arrays: Tuple[np.ndarray, ...], info: dict,
+                     projectiles: List[dict]):
+        """写入第 ``step`` 帧，全部写完后再发布 ``current_frame``"""
+        pos, vel, _, hp, alive, is_red = arrays
+        self.positions[step] = pos
+        self.velocities[step] = vel
+        self.hp[step] = hp
+        self.alive[step] = alive
+        self.alive_count[step] = (info["red_alive"], info["blue_alive"])
+        self.team_hp[step] = (hp[is_red].sum(), hp[~is_red].sum())
+        start = int(self.proj_offsets[step])
+        stop = start + len(projectiles)
+        if stop > len(self.proj_positions) and self.shm is not None:
+            # 共享缓冲无法扩容，超出上界的弹药不再记录
+            projectiles = projectiles[:len(self.proj_positions) - start]
+            stop = len(self.proj_positions)
+        elif stop > len(self.proj_positions):
+            # 先拷贝出更大的缓冲再替换引用，读者拿到的任一版本都包含已发布的帧
+            grown = np.zeros((max(stop, 2 * len(self.proj_positions)), 3), dtype=np.float32)
+            grown[:start] = self.proj_positions[:start]
+            self.proj_positions = grown
+        if projectiles:
+            self.proj_positions[start:stop] = [p["position"] for p in projectiles]
+        self.proj_offsets[step + 1] = stop
+        # 发布: 读者从此刻起才能看到这一帧
+        self.current_frame = step + 1
+        if self.control is not None:
+            self.control[0] = step + 1
+    
+    def frames_since(self, since: int = 0, end: Optional[int] = None) -> List[dict]:
+        """把 ``[since, end)`` 区间的帧还原为前端使用的字典格式 (end 默认为已写入帧数)"""
+        end = self.current_frame if end is None else end
+        since = max(0, min(since, end))
+        if self.positions is None or since >= end:
+            return []
+        
+        positions = self.positions[since:end].tolist()
+        velocities = self.velocities[since:end].tolist()
+        hp = self.hp[since:end].tolist()
+        alive = self.alive[since:end].tolist()
+        alive_count = self.alive_count[since:end].tolist()
+        team_hp = self.team_hp[since:end].tolist()
+        offsets = self.proj_offsets[since:end + 1].tolist()
+        proj = self.proj_positions[offsets[0]:offsets[-1]].tolist()
+        drone_meta = list(zip(self.drone_ids, self.teams))
+        
+        frames = []
+        for k in range(end - since):
+            frames.append({
+                "step": since + k,
+                "drones": [
+                    {"id": did, "team": team, "position": p, "velocity": v, "hp": h, "is_alive": a}
+                    for (did, team), p, v, h, a in zip(drone_meta, positions[k], velocities[k], hp[k], alive[k])
+                ],
+                "projectiles": [
+                    {"position": p}
+                    for p in proj[offsets[k] - offsets[0]:offsets[k + 1] - offsets[0]]
+                ],
+                "red_alive": alive_count[k][0],
+                "blue_alive": alive_count[k][1],
+                "red_hp": team_hp[k][0],
+                "blue_hp": team_hp[k][1],
+            })
+        return frames
+    
+    def frames_blob(self, since: int = 0, end: Optional[int] = None) -> Tuple[int, bytes]:
+        """把 ``[since, end)`` 区间的帧打包为二进制记录 (小端，4 字节对齐)
+
+        每帧: ``[step:i32][n_drones:u16][n_proj:u16]``，
+        ``[red_alive, blue_alive, red_hp, blue_hp]:f32``，
+        每架无人机 9 个 f32 ``(pos3, vel3, hp, team(0 红 1 蓝), alive)``，
+        每枚弹药 3 个 f32 位置。
+
+        Returns:
+            (帧数, 字节串)
+        """
+        end = self.current_frame if end is None else end
+        since = max(0, min(since, end))
+        count = end - since
+        if self.positions is None or count == 0:
+            return 0, b""
+        
+        n = len(self.drone_ids)
+        drones = np.empty((count, n, 9), dtype="<f4")
+        drones[..., 0:3] = self.positions[since:end]
+        drones[..., 3:6] = self.velocities[since:end]
+        drones[..., 6] = self.hp[since:end]
+        drones[..., 7] = [team != "red" for team in self.teams]
+        drones[..., 8] = self.alive[since:end]
+        
+        stats = np.empty((count, 4), dtype="<f4")
+        stats[:, :2] = self.alive_count[since:end]
+        stats[:, 2:] = self.team_hp[since:end]
+        
+        offsets = self.proj_offsets[since:end + 1]
+        proj = self.proj_positions[offsets[0]:offsets[-1]].astype("<f4")
+        header = np.empty(count, dtype=[("step", "<i4"), ("n_drones", "<u2"), ("n_proj", "<u2")])
+        header["step"] = np.arange(since, end)
+        header["n_drones"] = n
+        header["n_proj"] = np.diff(offsets)
+        
+        parts = []
+        base = int(offsets[0])
+        for k in range(count):
+            parts += [header[k].tobytes(), stats[k].tobytes(), drones[k].tobytes(),
+                      proj[int(offsets[k]) - base:int(offsets[k + 1]) - base].tobytes()]
+        return count, b"".join(parts)
 
 class GameManager:
     """游戏管理器"""
     
-    def __init__(self):
+    def __init__(self, workers: int = 0):
+        """
+        Args:
+            workers: 大于 0 时在进程池中运行游戏，绕开 GIL 并行模拟；
+                为 0 时在后台线程中运行
+        """
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
         self.games: Dict[str, GameState] = {}
         self.current_game: Optional[str] = None
         self.lock = threading.Lock()
         self.game_counter = 0
+        # PCG64 生成器: 比旧版全局 Mersenne Twister 更快，内部自带锁，可跨游戏线程共享
+        self._rng = np.random.default_rng()
     
     def create_game(self, team_size: int = 3, max_steps: int = 500) -> str:
         """创建新游戏"""
@@ -60,7 +521,6 @@ class GameManager:
             self.games[game_id] = GameState(
                 game_id=game_id,
                 status="waiting",
-                frames=[],
                 current_frame=0,
                 winner=None,
                 config={"team_size": team_size, "max_steps": max_steps}
@@ -68,14 +528,50 @@ class GameManager:
             self.current_game = game_id
             return game_id
     
+    def start_game(self, game_id: str):
+        """在后台运行游戏: 有工作进程时提交到进程池，否则启动线程"""
+        if self.workers <= 0:
+            threading.Thread(target=self.run_game, args=(game_id,), daemon=True).start()
+            return
+        
+        game = self.games[game_id]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        
+        # 主进程按无人机名单分配共享帧缓冲，工作进程挂载后直接写入
+        env = CombatEnv(config=CombatConfig(team_size=game.config["team_size"]))
+        env.reset()
+        game.allocate(env.get_state_for_render()["drones"], game.config["max_steps"], shared=True)
+        game.set_status("waiting")
+        
+        future = self._pool.submit(
+            _run_game_worker, game.game_id, game.config, game.shm.name,
+            game.drone_ids, game.teams, len(game.proj_positions))
+        
+        def on_done(f):
+            # 工作进程异常退出时也要结束游戏，避免前端一直等待
+            if f.exception() is not None and game.control is not None:
+                game.set_status("finished")
+            game.finished.set()
+        future.add_done_callback(on_done)
+    
+    def close(self):
+        """关闭进程池并释放所有共享帧缓冲"""
+        # 先 unlink 共享内存: 仍在运行的工作进程已映射的内存不受影响
+        for game in self.games.values():
+            game.release(unlink=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
     def run_game(self, game_id: str, speed: str = "normal"):
-        """运行游戏（在后台线程中）"""
+        """运行游戏（在后台线程或工作进程中）"""
         if game_id not in self.games:
             return
         
         game = self.games[game_id]
-        game.status = "running"
-        game.frames = []
+        game.set_status("running")
         
         # 创建环境
         config = CombatConfig(
@@ -85,159 +581,168 @@ class GameManager:
         env = CombatEnv(config=config)
         obs, info = env.reset(seed=int(time.time() * 1000) % 100000)
         
-        # 运行战斗
+        # 运行战斗 (每步只生成一次渲染状态，上一步的状态直接作为策略输入)
+        # 同一份状态的 SoA 数组同时供帧记录和下一步策略使用
+        state = env.get_state_for_render()
+        arrays = _drone_arrays(state["drones"])
+        if game.positions is None:
+            game.allocate(state["drones"], config.max_steps)
+        actions = {}
         for step in range(config.max_steps):
             if game.status == "stopped":
                 break
             
-            state = env.get_state_for_render()
-            
-            # 智能追击策略
-            actions = self._get_smart_actions(state, step)
+            # 智能追击策略 (动作字典整局复用)
+            self._get_smart_actions(state, step, arrays, actions)
             
             obs, rewards, terminated, truncated, info = env.step(actions)
             state = env.get_state_for_render()
+            arrays = _drone_arrays(state["drones"])
             
-            # 保存帧（包含更多信息用于可视化）
-            frame = {
-                "step": step,
-                "drones": state["drones"],
-                "projectiles": state["projectiles"],
-                "red_alive": info["red_alive"],
-                "blue_alive": info["blue_alive"],
-                "red_hp": sum(d["hp"] for d in state["drones"] if d["team"] == "red"),
-                "blue_hp": sum(d["hp"] for d in state["drones"] if d["team"] == "blue"),
-            }
-            game.frames.append(frame)
+            # 保存帧（写入预分配的帧缓冲，写完后发布）
+            game.record_frame(step, arrays, info, state["projectiles"])
             
-            if all(terminated.values()):
+            # 任一方全灭即结束，不再生成多余的回放帧
+            if all(terminated.values()) or not info["red_alive"] or not info["blue_alive"]:
                 game.winner = info.get("winner")
                 break
         
-        game.status = "finished"
+        if not game.winner and game.current_frame:
+            # 根据最后一帧的存活数和HP判断胜负 (需在标记结束前写入，前端读到结束时胜负已确定)
+            last = game.current_frame - 1
+            red_alive, blue_alive = game.alive_count[last].tolist()
+            red_hp, blue_hp = game.team_hp[last].tolist()
+            if red_alive > blue_alive:
+                game.winner = "red"
+            elif blue_alive > red_alive:
+                game.winner = "blue"
+            elif red_hp > blue_hp:
+                game.winner = "red"
+            elif blue_hp > red_hp:
+                game.winner = "blue"
+            else:
+                game.winner = "draw"
+        
+        game.set_status("finished")
     
-    def _get_smart_actions(self, state: dict, step: int) -> dict:
-        """智能追击策略 - 让战斗更有策略性"""
-        actions = {}
+    def _get_smart_actions(self, state: dict, step: int,
+                           arrays: Optional[Tuple[np.ndarray, ...]] = None,
+                           actions: Optional[dict] = None) -> dict:
+        """智能追击策略 - 让战斗更有策略性
+
+        每帧只把无人机状态整理成一次 SoA 数组 (可由调用方传入 ``arrays``
+        复用)，数值计算交给 ``_compute_actions`` 批量完成，这里只负责组装动作字典。
+        传入上一步返回的 ``actions`` 时原地覆写其中的条目，避免每帧重新分配字典和列表
+        (环境在 ``step`` 中立即拷贝动作，复用是安全的)。
+        """
+        if actions is None:
+            actions = {}
         drones = state["drones"]
-        
-        # 分队
-        red_drones = [d for d in drones if d["team"] == "red" and d["is_alive"]]
-        blue_drones = [d for d in drones if d["team"] == "blue" and d["is_alive"]]
-        
-        for drone in drones:
-            drone_id = drone["id"]
-            
-            if not drone["is_alive"]:
-                actions[drone_id] = {"discrete": 0, "continuous": [0, 0, 0, 0]}
-                continue
-            
-            pos = np.array(drone["position"])
-            vel = np.array(drone["velocity"])
-            
-            # 找最近的敌人
-            enemies = blue_drones if drone["team"] == "red" else red_drones
-            if not enemies:
-                # 没有敌人，巡逻
-                actions[drone_id] = {
-                    "discrete": 0,
-                    "continuous": [0.3, 0, np.sin(step * 0.05) * 0.3, 0]
-                }
-                continue
-            
-            # 找最近或血量最低的敌人
-            target = min(enemies, key=lambda e: (
-                np.linalg.norm(np.array(e["position"]) - pos) + 
-                e["hp"] * 2  # 优先攻击低血量
-            ))
-            target_pos = np.array(target["position"])
-            
-            # 计算追击方向
-            to_target = target_pos - pos
-            dist = np.linalg.norm(to_target)
-            
-            if dist < 1:
-                to_target = np.array([1, 0, 0])
-                dist = 1
-            
-            direction = to_target / dist
-            
-            # 计算转向
-            yaw_target = np.arctan2(direction[1], direction[0])
-            pitch_target = np.arcsin(np.clip(direction[2], -1, 1))
-            
-            current_yaw = drone["orientation"][2] if len(drone["orientation"]) > 2 else 0
-            current_pitch = drone["orientation"][1] if len(drone["orientation"]) > 1 else 0
-            
-            yaw_error = yaw_target - current_yaw
-            pitch_error = pitch_target - current_pitch
-            
-            # 归一化角度误差
-            while yaw_error > np.pi: yaw_error -= 2 * np.pi
-            while yaw_error < -np.pi: yaw_error += 2 * np.pi
-            
-            # 控制输入
-            throttle = 0.8 if dist > 100 else 0.5
-            yaw_rate = np.clip(yaw_error * 0.5, -1, 1)
-            pitch_rate = np.clip(pitch_error * 0.5, -1, 1)
-            
-            # 决定是否开火
-            angle_to_target = abs(yaw_error) + abs(pitch_error)
-            
-            if dist < 150 and angle_to_target < 0.5:
-                # 近距离且瞄准 - 开火
-                discrete = 1  # 机枪
-            elif dist < 300 and angle_to_target < 0.3 and np.random.random() < 0.02:
-                # 中距离瞄准好 - 偶尔发射导弹
-                discrete = 2  # 导弹
+        n = len(drones)
+        if n == 0:
+            return actions
+        
+        if arrays is None:
+            arrays = _drone_arrays(drones)
+        pos, _, orient, hp, alive, is_red = arrays
+        
+        if not (alive & is_red).any() or not (alive & ~is_red).any():
+            # 一方全灭: 胜负已定，存活方统一巡逻，跳过抽样和内核计算
+            patrol = [0.3, 0.0, math.sin(step * 0.05) * 0.3, 0.0]
+            for drone, is_alive in zip(drones, alive.tolist()):
+                cont = patrol if is_alive else [0.0, 0.0, 0.0, 0.0]
+                entry = actions.get(drone["id"])
+                if entry is None:
+                    actions[drone["id"]] = {"discrete": 0, "continuous": list(cont)}
+                else:
+                    entry["discrete"] = 0
+                    entry["continuous"][:] = cont
+            return actions
+        
+        # 随机扰动在内核外一次性批量抽取，内核本身保持纯数值、可复现
+        draws = self._rng.random((n, 5))
+        noise = (draws[:, :4] * 2 - 1) * ACTION_NOISE
+        missile_roll = draws[:, 4]
+        
+        discrete, continuous = _compute_actions(
+            pos, orient, hp, alive, is_red, noise, missile_roll, step)
+        
+        for drone, disc, cont in zip(drones, discrete.tolist(), continuous.tolist()):
+            entry = actions.get(drone["id"])
+            if entry is None:
+                actions[drone["id"]] = {"discrete": disc, "continuous": cont}
             else:
-                discrete = 0  # 不开火
-            
-            # 添加一点随机性让战斗更自然
-            throttle += np.random.uniform(-0.1, 0.1)
-            yaw_rate += np.random.uniform(-0.1, 0.1)
-            pitch_rate += np.random.uniform(-0.05, 0.05)
-            
-            actions[drone_id] = {
-                "discrete": int(discrete),
-                "continuous": [
-                    float(np.clip(throttle, 0, 1)),
-                    float(np.clip(pitch_rate, -1, 1)),
-                    float(np.clip(yaw_rate, -1, 1)),
-                    float(np.random.uniform(-0.1, 0.1))  # 少量翻滚
-                ]
-            }
+                entry["discrete"] = disc
+                entry["continuous"][:] = cont
         
         return actions
-        if not game.winner:
-            # 根据存活和HP判断胜负
-            last = game.frames[-1] if game.frames else None
-            if last:
-                if last["red_alive"] > last["blue_alive"]:
-                    game.winner = "red"
-                elif last["blue_alive"] > last["red_alive"]:
-                    game.winner = "blue"
-                elif last["red_hp"] > last["blue_hp"]:
-                    game.winner = "red"
-                elif last["blue_hp"] > last["red_hp"]:
-                    game.winner = "blue"
-                else:
-                    game.winner = "draw"
     
-    def get_game_data(self, game_id: str) -> Optional[dict]:
-        """获取游戏数据"""
+    def get_game_data(self, game_id: str, since: int = 0) -> Optional[dict]:
+        """获取游戏数据
+
+        Args:
+            since: 只返回该帧序号之后的新帧，便于前端增量拉取
+        """
         if game_id not in self.games:
             return None
         
         game = self.games[game_id]
+        game.refresh()
+        # 先读状态再读帧数: 状态为 finished 时所有帧都已写入
+        status = game.status
+        total = game.current_frame
         return {
             "game_id": game.game_id,
-            "status": game.status,
-            "frames": game.frames,
+            "status": status,
+            "frames": game.frames_since(since, total),
+            "since": since,
             "winner": game.winner,
             "config": game.config,
-            "total_frames": len(game.frames)
+            "total_frames": total
         }
+    
+    def get_game_blob(self, game_id: str, since: int = 0) -> Optional[Tuple[bytes, str]]:
+        """获取二进制格式的游戏数据 (供前端用 TypedArray 直接解码)
+
+        头部 16 字节: ``[since:u32][帧数:u32][n_drones:u16][status:u8][winner:u8][total_frames:u32]``，
+        之后是 ``GameState.frames_blob`` 的帧记录。
+
+        Returns:
+            (字节串, ETag)
+        """
+        game = self.games.get(game_id)
+        if game is None:
+            return None
+        game.refresh()
+        # 先读状态再读帧数: 状态为 finished 时所有帧都已写入
+        status = game.status
+        total = game.current_frame
+        since = max(0, min(since, total))
+        count, frames = game.frames_blob(since, total)
+        header = struct.pack("<IIHBBI", since, count, len(game.drone_ids),
+                             STATUS_CODES.index(status), WINNER_CODES.index(game.winner), total)
+        return header + frames, f'"{total}-{status}"'
+    
+    def get_game_etag(self, game_id: str) -> Optional[str]:
+        """游戏数据的 ETag: 帧数与状态不变则内容不变"""
+        game = self.games.get(game_id)
+        if game is None:
+            return None
+        game.refresh()
+        return f'"{game.current_frame}-{game.status}"'
+
+
+def _run_game_worker(game_id: str, config: dict, shm_name: str,
+                     drone_ids: List[str], teams: List[str], proj_capacity: int):
+    """进程池入口: 挂载共享帧缓冲并运行一局游戏"""
+    game = GameState(game_id=game_id, status="waiting", current_frame=0, winner=None, config=config)
+    game.attach(shm_name, drone_ids, teams, proj_capacity)
+    worker = GameManager()
+    worker.games[game_id] = game
+    try:
+        worker.run_game(game_id)
+    finally:
+        game.release()
 
 # 全局管理器
 manager = GameManager()
@@ -246,62 +751,156 @@ manager = GameManager()
 #                       HTTP 处理器
 # ============================================================
 
+def _int_param(params: Dict[str, List[str]], name: str, default: int, minimum: int = 0,
+               maximum: Optional[int] = None) -> int:
+    """读取整数查询参数，格式错误或超出 [minimum, maximum] 时抛出 ValueError"""
+    raw = params.get(name, [default])[0]
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {raw!r}") from None
+    if value < minimum:
+        raise ValueError(f"Invalid {name}: must be >= {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"Invalid {name}: must be <= {maximum}")
+    return value
+
+
+# 新游戏参数上限: 帧缓冲按 max_steps 和无人机数预分配 (进程模式下在共享内存中)
+MAX_TEAM_SIZE = 10
+MAX_GAME_STEPS = 10000
+
+
+# SSE 等待期间的保活间隔 (秒)
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
 class SkyBattleHandler(BaseHTTPRequestHandler):
     """HTTP 请求处理器"""
     
+    # HTTP/1.1 长连接: 前端轮询复用同一个 TCP 连接，所有响应都必须带 Content-Length
+    protocol_version = "HTTP/1.1"
+    
     def log_message(self, format, *args):
         """静默日志"""
         pass
     
-    def send_json(self, data: dict, status: int = 200):
+    def send_json(self, data: dict, status: int = 200, headers: Optional[Dict[str, str]] = None):
         """发送 JSON 响应"""
+        self.send_bytes(dumps_json(data), "application/json", status, headers)
+    
+    def send_bytes(self, body: bytes, content_type: str, status: int = 200,
+                   headers: Optional[Dict[str, str]] = None):
+        """发送字节响应"""
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
         self.send_header("Access-Control-Allow-Origin", "*")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
     
-    def send_html(self, html: str):
-        """发送 HTML 响应"""
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
+    def accepted_encodings(self) -> set:
+        """解析 Accept-Encoding，忽略 q=0 的编码"""
+        accepted = set()
+        for token in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = token.partition(";")
+            key, _, value = params.strip().partition("=")
+            try:
+                q = float(value) if key.strip() == "q" else 1.0
+            except ValueError:
+                q = 1.0
+            if name.strip() and q > 0:
+                accepted.add(name.strip().lower())
+        return accepted
+    
+    def send_page(self, page: "PrebuiltPage"):
+        """发送预先构建好的完整响应 (状态行 + 头部 + 正文)，一次写出
+
+        按 br > gzip > 原文的优先级选用客户端支持的编码；ETag 命中时返回 304。
+        """
+        accepted = self.accepted_encodings()
+        encoding = next((name for name in ("br", "gzip") if name in page.responses and name in accepted), None)
+        if self.headers.get("If-None-Match") == page.etags[encoding]:
+            self.wfile.write(page.not_modified[encoding])
+        else:
+            self.wfile.write(page.responses[encoding])
+    
+    def send_empty(self, status: int, headers: Optional[Dict[str, str]] = None):
+        """发送无正文响应"""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header("Content-Length", "0")
         self.end_headers()
-        self.wfile.write(html.encode())
     
     def do_GET(self):
         parsed = urlparse(self.path)
-        path = parsed.path
-        params = parse_qs(parsed.query)
-        
+        try:
+            self.route_get(parsed.path, parse_qs(parsed.query))
+        except ValueError as e:
+            # 参数错误也返回带 Content-Length 的响应，长连接可以继续复用
+            self.send_json({"error": str(e)}, 400)
+    
+    def route_get(self, path: str, params: Dict[str, List[str]]):
         if path == "/" or path == "/index.html":
-            self.send_html(get_main_page())
+            self.send_page(_MAIN_PAGE)
         
         elif path == "/api/new_game":
-            team_size = int(params.get("team_size", [3])[0])
-            max_steps = int(params.get("max_steps", [500])[0])
+            team_size = _int_param(params, "team_size", 3, minimum=1, maximum=MAX_TEAM_SIZE)
+            max_steps = _int_param(params, "max_steps", 500, minimum=1, maximum=MAX_GAME_STEPS)
             game_id = manager.create_game(team_size, max_steps)
             
             # 在后台运行游戏
-            thread = threading.Thread(
-                target=manager.run_game, 
-                args=(game_id,),
-                daemon=True
-            )
-            thread.start()
+            manager.start_game(game_id)
             
             self.send_json({"game_id": game_id, "status": "started"})
         
         elif path == "/api/game_data":
             game_id = params.get("game_id", [manager.current_game])[0]
+            since = _int_param(params, "since", 0)
             if game_id:
-                data = manager.get_game_data(game_id)
+                # 没有新帧且状态未变时直接返回 304，省去整次序列化
+                etag = manager.get_game_etag(game_id)
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_empty(304, {"ETag": etag})
+                    return
+                
+                data = manager.get_game_data(game_id, since)
                 if data:
-                    self.send_json(data)
+                    etag = f'"{data["total_frames"]}-{data["status"]}"'
+                    self.send_json(data, headers={"ETag": etag, "Cache-Control": "no-cache"})
                 else:
                     self.send_json({"error": "Game not found"}, 404)
             else:
                 self.send_json({"error": "No active game"}, 404)
         
+        elif path == "/api/game_data.bin":
+            game_id = params.get("game_id", [manager.current_game])[0]
+            since = _int_param(params, "since", 0)
+            etag = manager.get_game_etag(game_id) if game_id else None
+            if etag and self.headers.get("If-None-Match") == etag:
+                self.send_empty(304, {"ETag": etag})
+                return
+            
+            result = manager.get_game_blob(game_id, since) if game_id else None
+            if result:
+                body, etag = result
+                self.send_bytes(body, "application/octet-stream",
+                                headers={"ETag": etag, "Cache-Control": "no-cache"})
+            else:
+                self.send_json({"error": "Game not found"}, 404)
+        
+        elif path == "/api/game_stream":
+            game_id = params.get("game_id", [manager.current_game])[0]
+            game = manager.games.get(game_id) if game_id else None
+            if game is None:
+                self.send_json({"error": "Game not found"}, 404)
+                return
+            self.stream_until_finished(game)
+        
         elif path == "/api/status":
             self.send_json({
                 "status": "running",
@@ -310,789 +909,92 @@ class SkyBattleHandler(BaseHTTPRequestHandler):
             })
         
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_empty(404)
     
-    def do_OPTIONS(self):
+    def stream_until_finished(self, game: GameState):
+        """Server-Sent Events: 阻塞等待游戏结束后推送一条 finished 事件
+
+        前端无需轮询，收到事件后一次性拉取全部帧。等待期间定时发送注释行保活。
+        """
         self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
         self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        # 事件流没有 Content-Length，发送完毕后关闭连接
+        self.send_header("Connection", "close")
         self.end_headers()
+        self.close_connection = True
+        try:
+            while not game.finished.wait(timeout=SSE_KEEPALIVE_SECONDS):
+                self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+            self.wfile.write(b"data: finished\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def do_OPTIONS(self):
+        self.send_empty(200, {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type",
+        })
 
 # ============================================================
 #                       HTML 页面
 # ============================================================
 
+# 页面模板放在 templates/ 下 (页面没有模板变量，无需模板引擎)
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+
+
+@lru_cache(maxsize=1)
 def get_main_page() -> str:
-    return '''<!DOCTYPE html>
-<html lang="zh">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>SkyBattle - 无人机对战模拟器</title>
-    <style>
-        :root {
-            --bg-primary: #0a0a1a;
-            --bg-secondary: #12122a;
-            --bg-card: rgba(20, 20, 50, 0.8);
-            --accent-cyan: #00d4ff;
-            --accent-red: #ff4466;
-            --accent-blue: #4488ff;
-            --text-primary: #ffffff;
-            --text-secondary: #8888aa;
-        }
-        
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        
-        body {
-            font-family: 'Segoe UI', 'Microsoft YaHei', sans-serif;
-            background: linear-gradient(135deg, var(--bg-primary) 0%, var(--bg-secondary) 100%);
-            min-height: 100vh;
-            color: var(--text-primary);
-            overflow-x: hidden;
-        }
-        
-        /* 顶部导航 */
-        .navbar {
-            background: var(--bg-card);
-            backdrop-filter: blur(10px);
-            border-bottom: 1px solid rgba(0, 212, 255, 0.2);
-            padding: 15px 30px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            font-size: 1.8em;
-            font-weight: bold;
-            background: linear-gradient(90deg, var(--accent-cyan), #00ff88);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            text-shadow: 0 0 30px rgba(0, 212, 255, 0.5);
-        }
-        
-        .nav-status {
-            display: flex;
-            gap: 20px;
-            align-items: center;
-        }
-        
-        .status-dot {
-            width: 10px;
-            height: 10px;
-            background: #00ff88;
-            border-radius: 50%;
-            animation: pulse 2s infinite;
-        }
-        
-        @keyframes pulse {
-            0%, 100% { opacity: 1; }
-            50% { opacity: 0.5; }
-        }
-        
-        /* 主容器 */
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 30px;
-        }
-        
-        /* 控制面板 */
-        .control-panel {
-            background: var(--bg-card);
-            border-radius: 20px;
-            padding: 25px;
-            margin-bottom: 30px;
-            border: 1px solid rgba(0, 212, 255, 0.2);
-        }
-        
-        .control-row {
-            display: flex;
-            gap: 20px;
-            align-items: center;
-            flex-wrap: wrap;
-        }
-        
-        .control-group {
-            display: flex;
-            flex-direction: column;
-            gap: 5px;
-        }
-        
-        .control-group label {
-            font-size: 0.85em;
-            color: var(--text-secondary);
-        }
-        
-        .control-group select, .control-group input {
-            background: rgba(0, 0, 0, 0.3);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            color: white;
-            padding: 10px 15px;
-            border-radius: 10px;
-            font-size: 1em;
-        }
-        
-        .btn {
-            background: linear-gradient(135deg, var(--accent-cyan), #0088cc);
-            border: none;
-            color: white;
-            padding: 15px 40px;
-            font-size: 1.1em;
-            font-weight: bold;
-            border-radius: 30px;
-            cursor: pointer;
-            transition: all 0.3s;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        .btn:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 10px 30px rgba(0, 212, 255, 0.4);
-        }
-        
-        .btn:disabled {
-            background: #444;
-            cursor: not-allowed;
-            transform: none;
-        }
-        
-        .btn-danger {
-            background: linear-gradient(135deg, var(--accent-red), #cc0044);
-        }
-        
-        /* 游戏区域 */
-        .game-area {
-            display: grid;
-            grid-template-columns: 1fr 320px;
-            gap: 30px;
-        }
-        
-        @media (max-width: 1000px) {
-            .game-area { grid-template-columns: 1fr; }
-        }
-        
-        /* 战斗画布 */
-        .arena-container {
-            background: var(--bg-card);
-            border-radius: 20px;
-            padding: 20px;
-            border: 1px solid rgba(0, 212, 255, 0.2);
-        }
-        
-        .arena-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-        
-        .arena-title {
-            font-size: 1.3em;
-            color: var(--accent-cyan);
-        }
-        
-        #arena {
-            width: 100%;
-            height: 500px;
-            background: radial-gradient(ellipse at center, #1a1a3a 0%, #0a0a1a 100%);
-            border-radius: 15px;
-            border: 2px solid rgba(0, 212, 255, 0.3);
-        }
-        
-        /* 侧边栏 */
-        .sidebar {
-            display: flex;
-            flex-direction: column;
-            gap: 20px;
-        }
-        
-        .card {
-            background: var(--bg-card);
-            border-radius: 15px;
-            padding: 20px;
-            border: 1px solid rgba(0, 212, 255, 0.2);
-        }
-        
-        .card-title {
-            font-size: 1.1em;
-            margin-bottom: 15px;
-            color: var(--accent-cyan);
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
-        
-        /* 队伍状态 */
-        .team-status {
-            margin-bottom: 20px;
-        }
-        
-        .team-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 8px;
-        }
-        
-        .team-name {
-            font-weight: bold;
-            font-size: 1.1em;
-        }
-        
-        .team-name.red { color: var(--accent-red); }
-        .team-name.blue { color: var(--accent-blue); }
-        
-        .hp-bar {
-            height: 12px;
-            background: rgba(0, 0, 0, 0.5);
-            border-radius: 6px;
-            overflow: hidden;
-        }
-        
-        .hp-fill {
-            height: 100%;
-            transition: width 0.3s ease;
-            border-radius: 6px;
-        }
-        
-        .hp-fill.red { 
-            background: linear-gradient(90deg, var(--accent-red), #ff6688); 
-        }
-        .hp-fill.blue { 
-            background: linear-gradient(90deg, var(--accent-blue), #66aaff); 
-        }
-        
-        /* 统计数据 */
-        .stats-grid {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 15px;
-        }
-        
-        .stat-item {
-            background: rgba(0, 0, 0, 0.3);
-            padding: 15px;
-            border-radius: 10px;
-            text-align: center;
-        }
-        
-        .stat-value {
-            font-size: 1.8em;
-            font-weight: bold;
-            color: var(--accent-cyan);
-        }
-        
-        .stat-label {
-            font-size: 0.85em;
-            color: var(--text-secondary);
-            margin-top: 5px;
-        }
-        
-        /* 进度条 */
-        .progress-container {
-            margin-top: 15px;
-        }
-        
-        .progress-bar {
-            height: 6px;
-            background: rgba(0, 0, 0, 0.5);
-            border-radius: 3px;
-            overflow: hidden;
-        }
-        
-        .progress-fill {
-            height: 100%;
-            background: linear-gradient(90deg, var(--accent-cyan), #00ff88);
-            transition: width 0.3s;
-        }
-        
-        /* 胜利提示 */
-        .winner-overlay {
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0, 0, 0, 0.8);
-            display: none;
-            justify-content: center;
-            align-items: center;
-            z-index: 1000;
-        }
-        
-        .winner-box {
-            background: var(--bg-card);
-            padding: 50px 80px;
-            border-radius: 30px;
-            text-align: center;
-            border: 3px solid var(--accent-cyan);
-            animation: winner-appear 0.5s ease;
-        }
-        
-        @keyframes winner-appear {
-            from { transform: scale(0.5); opacity: 0; }
-            to { transform: scale(1); opacity: 1; }
-        }
-        
-        .winner-title {
-            font-size: 3em;
-            margin-bottom: 20px;
-        }
-        
-        .winner-team {
-            font-size: 2em;
-            font-weight: bold;
-        }
-        
-        .winner-team.red { color: var(--accent-red); }
-        .winner-team.blue { color: var(--accent-blue); }
-        .winner-team.draw { color: var(--text-secondary); }
-        
-        /* 加载动画 */
-        .loading {
-            display: none;
-            text-align: center;
-            padding: 50px;
-        }
-        
-        .spinner {
-            width: 50px;
-            height: 50px;
-            border: 4px solid rgba(0, 212, 255, 0.2);
-            border-top-color: var(--accent-cyan);
-            border-radius: 50%;
-            animation: spin 1s linear infinite;
-            margin: 0 auto 20px;
-        }
-        
-        @keyframes spin {
-            to { transform: rotate(360deg); }
-        }
-    </style>
-</head>
-<body>
-    <!-- 导航栏 -->
-    <nav class="navbar">
-        <div class="logo">✈️ SkyBattle</div>
-        <div class="nav-status">
-            <div class="status-dot"></div>
-            <span>系统运行中</span>
-        </div>
-    </nav>
-    
-    <div class="container">
-        <!-- 控制面板 -->
-        <div class="control-panel">
-            <div class="control-row">
-                <div class="control-group">
-                    <label>队伍大小</label>
-                    <select id="teamSize">
-                        <option value="2">2 vs 2</option>
-                        <option value="3" selected>3 vs 3</option>
-                        <option value="4">4 vs 4</option>
-                        <option value="5">5 vs 5</option>
-                    </select>
-                </div>
-                
-                <div class="control-group">
-                    <label>最大步数</label>
-                    <select id="maxSteps">
-                        <option value="200">200 (快速)</option>
-                        <option value="500" selected>500 (标准)</option>
-                        <option value="1000">1000 (持久)</option>
-                    </select>
-                </div>
-                
-                <div class="control-group">
-                    <label>播放速度</label>
-                    <select id="playSpeed">
-                        <option value="20">极快</option>
-                        <option value="50" selected>快速</option>
-                        <option value="100">正常</option>
-                        <option value="200">慢速</option>
-                    </select>
-                </div>
-                
-                <button class="btn" id="startBtn" onclick="startNewGame()">
-                    🎮 开始战斗
-                </button>
-            </div>
-        </div>
-        
-        <!-- 游戏区域 -->
-        <div class="game-area">
-            <!-- 战斗画布 -->
-            <div class="arena-container">
-                <div class="arena-header">
-                    <div class="arena-title">⚔️ 战斗区域</div>
-                    <div id="gameStatus">等待开始...</div>
-                </div>
-                <canvas id="arena"></canvas>
-                
-                <div class="loading" id="loading">
-                    <div class="spinner"></div>
-                    <div>战斗模拟中...</div>
-                </div>
-            </div>
-            
-            <!-- 侧边栏 -->
-            <div class="sidebar">
-                <!-- 队伍状态 -->
-                <div class="card">
-                    <div class="card-title">📊 队伍状态</div>
-                    
-                    <div class="team-status">
-                        <div class="team-header">
-                            <span class="team-name red">🔴 红队</span>
-                            <span id="redAlive">0/0</span>
-                        </div>
-                        <div class="hp-bar">
-                            <div class="hp-fill red" id="redHp" style="width: 100%"></div>
-                        </div>
-                    </div>
-                    
-                    <div class="team-status">
-                        <div class="team-header">
-                            <span class="team-name blue">🔵 蓝队</span>
-                            <span id="blueAlive">0/0</span>
-                        </div>
-                        <div class="hp-bar">
-                            <div class="hp-fill blue" id="blueHp" style="width: 100%"></div>
-                        </div>
-                    </div>
-                </div>
-                
-                <!-- 统计数据 -->
-                <div class="card">
-                    <div class="card-title">📈 战斗数据</div>
-                    <div class="stats-grid">
-                        <div class="stat-item">
-                            <div class="stat-value" id="currentStep">0</div>
-                            <div class="stat-label">当前步数</div>
-                        </div>
-                        <div class="stat-item">
-                            <div class="stat-value" id="totalFrames">0</div>
-                            <div class="stat-label">总帧数</div>
-                        </div>
-                        <div class="stat-item">
-                            <div class="stat-value" id="projectiles">0</div>
-                            <div class="stat-label">弹药数</div>
-                        </div>
-                        <div class="stat-item">
-                            <div class="stat-value" id="gameTime">0s</div>
-                            <div class="stat-label">战斗时间</div>
-                        </div>
-                    </div>
-                    
-                    <div class="progress-container">
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                            <span style="font-size: 0.85em; color: var(--text-secondary);">战斗进度</span>
-                            <span id="progressText" style="font-size: 0.85em;">0%</span>
-                        </div>
-                        <div class="progress-bar">
-                            <div class="progress-fill" id="progressFill" style="width: 0%"></div>
-                        </div>
-                    </div>
-                </div>
-                
-                <!-- 说明 -->
-                <div class="card">
-                    <div class="card-title">ℹ️ 说明</div>
-                    <ul style="font-size: 0.9em; color: var(--text-secondary); line-height: 1.8; padding-left: 20px;">
-                        <li>点击"开始战斗"启动新对局</li>
-                        <li>红蓝两队 AI 自动对战</li>
-                        <li>可调整队伍大小和战斗长度</li>
-                        <li>实时显示 HP 和存活状态</li>
-                    </ul>
-                </div>
-            </div>
-        </div>
-    </div>
-    
-    <!-- 胜利提示 -->
-    <div class="winner-overlay" id="winnerOverlay" onclick="this.style.display='none'">
-        <div class="winner-box">
-            <div class="winner-title">🏆 战斗结束</div>
-            <div class="winner-team" id="winnerText">红队获胜！</div>
-            <p style="margin-top: 20px; color: var(--text-secondary);">点击任意处关闭</p>
-        </div>
-    </div>
+    """读取主页面 HTML，只读一次，之后返回同一个共享的不可变字符串"""
+    return (TEMPLATE_DIR / "main.html").read_text(encoding="utf-8")
+
+
+def _minify_html(html: str) -> str:
+    """保守的页面压缩: 去掉 HTML/CSS 注释、整行 JS 注释、缩进和空行
+
+    保留换行，不改动任何一行的内容，JS 的自动分号插入不受影响。
+    """
+    html = re.sub(r"<!--.*?-->", "", html, flags=re.S)
+    html = re.sub(r"<style>.*?</style>",
+                  lambda m: re.sub(r"/\*.*?\*/", "", m.group(0), flags=re.S), html, flags=re.S)
+    lines = (line.strip() for line in html.split("\n"))
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+# 页面是静态的: 导入时压缩、编码一次，之后每个请求直接写出字节
+class PrebuiltPage:
+    """静态页面的预构建 HTTP 响应: 每种编码一份完整的 200 响应和 304 响应字节串"""
     
-    <script>
-        // 画布设置
-        const canvas = document.getElementById('arena');
-        const ctx = canvas.getContext('2d');
-        
-        // 状态
-        let gameData = null;
-        let currentFrame = 0;
-        let playing = false;
-        let animationId = null;
-        let teamSize = 3;
-        
-        // 调整画布大小
-        function resizeCanvas() {
-            const container = canvas.parentElement;
-            canvas.width = container.clientWidth - 40;
-            canvas.height = 500;
-            drawIdleScreen();
-        }
-        
-        window.addEventListener('resize', resizeCanvas);
-        resizeCanvas();
-        
-        // 空闲画面
-        function drawIdleScreen() {
-            ctx.fillStyle = '#0a0a1a';
-            ctx.fillRect(0, 0, canvas.width, canvas.height);
-            
-            // 网格
-            ctx.strokeStyle = 'rgba(0, 212, 255, 0.1)';
-            ctx.lineWidth = 1;
-            for (let x = 0; x < canvas.width; x += 50) {
-                ctx.beginPath();
-                ctx.moveTo(x, 0);
-                ctx.lineTo(x, canvas.height);
-                ctx.stroke();
-            }
-            for (let y = 0; y < canvas.height; y += 50) {
-                ctx.beginPath();
-                ctx.moveTo(0, y);
-                ctx.lineTo(canvas.width, y);
-                ctx.stroke();
-            }
-            
-            // 提示文字
-            ctx.font = 'bold 24px Segoe UI';
-            ctx.fillStyle = '#444';
-            ctx.textAlign = 'center';
-            ctx.fillText('点击上方按钮开始战斗', canvas.width / 2, canvas.height / 2);
-        }
-        
-        // 开始新游戏
-        async function startNewGame() {
-            const startBtn = document.getElementById('startBtn');
-            startBtn.disabled = true;
-            startBtn.textContent = '⏳ 加载中...';
-            
-            document.getElementById('loading').style.display = 'block';
-            document.getElementById('winnerOverlay').style.display = 'none';
-            
-            teamSize = parseInt(document.getElementById('teamSize').value);
-            const maxSteps = parseInt(document.getElementById('maxSteps').value);
-            
-            try {
-                // 创建游戏
-                const res = await fetch(`/api/new_game?team_size=${teamSize}&max_steps=${maxSteps}`);
-                const data = await res.json();
-                
-                // 等待游戏完成
-                await waitForGame(data.game_id);
-                
-                // 获取完整数据
-                const gameRes = await fetch(`/api/game_data?game_id=${data.game_id}`);
-                gameData = await gameRes.json();
-                
-                document.getElementById('loading').style.display = 'none';
-                document.getElementById('totalFrames').textContent = gameData.total_frames;
-                
-                // 开始播放
-                currentFrame = 0;
-                playing = true;
-                playAnimation();
-                
-            } catch (error) {
-                console.error(error);
-                alert('启动失败，请重试');
-            }
-            
-            startBtn.disabled = false;
-            startBtn.textContent = '🎮 开始战斗';
-        }
-        
-        // 等待游戏完成
-        async function waitForGame(gameId) {
-            while (true) {
-                const res = await fetch(`/api/game_data?game_id=${gameId}`);
-                const data = await res.json();
-                
-                if (data.status === 'finished') {
-                    return;
-                }
-                
-                await new Promise(r => setTimeout(r, 200));
-            }
-        }
-        
-        // 播放动画
-        function playAnimation() {
-            if (!playing || !gameData || currentFrame >= gameData.frames.length) {
-                playing = false;
-                if (gameData && gameData.winner) {
-                    showWinner(gameData.winner);
-                }
-                return;
-            }
-            
-            const frame = gameData.frames[currentFrame];
-            drawFrame(frame);
-            updateStats(frame);
-            
-            currentFrame++;
-            
-            const speed = parseInt(document.getElementById('playSpeed').value);
-            animationId = setTimeout(playAnimation, speed);
-        }
-        
-        // 绘制帧
-        function drawFrame(frame) {
-            // 清空（带轨迹效果）
-            ctx.fillStyle = 'rgba(10, 10, 26, 0.2)';
-            ctx.fillRect(0, 0, canvas.width, canvas.height);
-            
-            // 网格
-            ctx.strokeStyle = 'rgba(0, 212, 255, 0.05)';
-            ctx.lineWidth = 1;
-            for (let x = 0; x < canvas.width; x += 50) {
-                ctx.beginPath();
-                ctx.moveTo(x, 0);
-                ctx.lineTo(x, canvas.height);
-                ctx.stroke();
-            }
-            for (let y = 0; y < canvas.height; y += 50) {
-                ctx.beginPath();
-                ctx.moveTo(0, y);
-                ctx.lineTo(canvas.width, y);
-                ctx.stroke();
-            }
-            
-            // 无人机
-            frame.drones.forEach(drone => {
-                const x = (drone.position[0] + 500) / 1000 * canvas.width;
-                const y = (drone.position[1] + 500) / 1000 * canvas.height;
-                const z = drone.position[2];
-                
-                const isRed = drone.team === 'red';
-                const color = isRed ? '#ff4466' : '#4488ff';
-                const glowColor = isRed ? 'rgba(255, 68, 102, 0.4)' : 'rgba(68, 136, 255, 0.4)';
-                
-                if (drone.is_alive) {
-                    const size = 10 + z / 25;
-                    
-                    // 光晕
-                    ctx.beginPath();
-                    ctx.arc(x, y, size + 8, 0, Math.PI * 2);
-                    ctx.fillStyle = glowColor;
-                    ctx.fill();
-                    
-                    // 无人机
-                    ctx.beginPath();
-                    ctx.arc(x, y, size, 0, Math.PI * 2);
-                    ctx.fillStyle = color;
-                    ctx.fill();
-                    ctx.strokeStyle = 'white';
-                    ctx.lineWidth = 2;
-                    ctx.stroke();
-                    
-                    // HP 条
-                    const hpWidth = 30;
-                    const hpHeight = 4;
-                    ctx.fillStyle = 'rgba(0, 0, 0, 0.5)';
-                    ctx.fillRect(x - hpWidth/2, y - size - 12, hpWidth, hpHeight);
-                    ctx.fillStyle = color;
-                    ctx.fillRect(x - hpWidth/2, y - size - 12, hpWidth * (drone.hp / 100), hpHeight);
-                    
-                    // 速度向量
-                    const vx = drone.velocity[0] * 0.03;
-                    const vy = drone.velocity[1] * 0.03;
-                    ctx.beginPath();
-                    ctx.moveTo(x, y);
-                    ctx.lineTo(x + vx, y + vy);
-                    ctx.strokeStyle = color;
-                    ctx.lineWidth = 2;
-                    ctx.stroke();
-                } else {
-                    // 爆炸残骸
-                    ctx.font = '16px Arial';
-                    ctx.fillText('💥', x - 8, y + 5);
-                }
-            });
-            
-            // 弹药
-            frame.projectiles.forEach(proj => {
-                const x = (proj.position[0] + 500) / 1000 * canvas.width;
-                const y = (proj.position[1] + 500) / 1000 * canvas.height;
-                
-                // 光晕
-                ctx.beginPath();
-                ctx.arc(x, y, 6, 0, Math.PI * 2);
-                ctx.fillStyle = 'rgba(255, 255, 0, 0.3)';
-                ctx.fill();
-                
-                // 弹药
-                ctx.beginPath();
-                ctx.arc(x, y, 3, 0, Math.PI * 2);
-                ctx.fillStyle = '#ffff00';
-                ctx.fill();
-            });
-            
-            // 步数
-            ctx.font = 'bold 14px Segoe UI';
-            ctx.fillStyle = 'rgba(255, 255, 255, 0.7)';
-            ctx.textAlign = 'left';
-            ctx.fillText(`Step: ${frame.step}`, 15, 25);
-        }
-        
-        // 更新统计
-        function updateStats(frame) {
-            const maxHp = teamSize * 100;
-            
-            document.getElementById('redAlive').textContent = `${frame.red_alive}/${teamSize}`;
-            document.getElementById('blueAlive').textContent = `${frame.blue_alive}/${teamSize}`;
-            document.getElementById('redHp').style.width = (frame.red_hp / maxHp * 100) + '%';
-            document.getElementById('blueHp').style.width = (frame.blue_hp / maxHp * 100) + '%';
-            
-            document.getElementById('currentStep').textContent = frame.step;
-            document.getElementById('projectiles').textContent = frame.projectiles.length;
-            document.getElementById('gameTime').textContent = (frame.step * 0.1).toFixed(1) + 's';
-            document.getElementById('gameStatus').textContent = '战斗进行中...';
-            
-            const progress = (currentFrame / gameData.total_frames * 100).toFixed(0);
-            document.getElementById('progressText').textContent = progress + '%';
-            document.getElementById('progressFill').style.width = progress + '%';
-        }
-        
-        // 显示胜利
-        function showWinner(winner) {
-            document.getElementById('gameStatus').textContent = '战斗结束';
-            
-            const overlay = document.getElementById('winnerOverlay');
-            const text = document.getElementById('winnerText');
-            
-            if (winner === 'red') {
-                text.textContent = '🔴 红队获胜！';
-                text.className = 'winner-team red';
-            } else if (winner === 'blue') {
-                text.textContent = '🔵 蓝队获胜！';
-                text.className = 'winner-team blue';
-            } else {
-                text.textContent = '⚖️ 平局';
-                text.className = 'winner-team draw';
-            }
-            
-            overlay.style.display = 'flex';
-        }
-        
-        // 初始化
-        drawIdleScreen();
-    </script>
-</body>
-</html>
-'''
+    def __init__(self, body: bytes, content_type: str = "text/html; charset=utf-8"):
+        self.body = body
+        encoded = {None: body, "gzip": gzip.compress(body, compresslevel=9)}
+        if HAS_BROTLI:
+            encoded["br"] = brotli.compress(body, quality=11)
+        
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        self.etags: Dict[Optional[str], str] = {}
+        self.responses: Dict[Optional[str], bytes] = {}
+        self.not_modified: Dict[Optional[str], bytes] = {}
+        for encoding, payload in encoded.items():
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            common = ["Vary: Accept-Encoding", f"ETag: {etag}", "Cache-Control: no-cache"]
+            head = ["HTTP/1.1 200 OK", f"Content-Type: {content_type}",
+                    f"Content-Length: {len(payload)}"] + common
+            if encoding:
+                head.append(f"Content-Encoding: {encoding}")
+            self.etags[encoding] = etag
+            self.responses[encoding] = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload
+            self.not_modified[encoding] = ("\r\n".join(["HTTP/1.1 304 Not Modified"] + common)
+                                           + "\r\n\r\n").encode("latin-1")
+
+
+_MAIN_PAGE_BYTES = _minify_html(get_main_page()).encode("utf-8")
+_MAIN_PAGE = PrebuiltPage(_MAIN_PAGE_BYTES)
 
 # ============================================================
 #                       主程序
@@ -1102,27 +1004,41 @@ def main():
     parser = argparse.ArgumentParser(description="SkyBattle Web 应用")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="监听地址")
     parser.add_argument("--port", type=int, default=8080, help="端口号")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="运行游戏的工作进程数 (0 表示使用后台线程)")
     args = parser.parse_args()
+    manager.workers = args.workers
     
-    print()
-    print("╔" + "═" * 58 + "╗")
-    print("║" + " " * 15 + "✈️  SkyBattle Web App  ✈️" + " " * 15 + "║")
-    print("╠" + "═" * 58 + "╣")
-    print(f"║  🌐 本地访问: http://localhost:{args.port}" + " " * (27 - len(str(args.port))) + "║")
+    port = str(args.port)
+    lines = [
+        "",
+        f"╔{'═' * 58}╗",
+        f"║{' ' * 15}✈️  SkyBattle Web App  ✈️{' ' * 15}║",
+        f"╠{'═' * 58}╣",
+        f"║  🌐 本地访问: http://localhost:{port}{' ' * (27 - len(port))}║",
+    ]
     if args.host == "0.0.0.0":
-        print(f"║  🔗 远程访问: http://<服务器IP>:{args.port}" + " " * (18 - len(str(args.port))) + "║")
-    print("║" + " " * 58 + "║")
-    print("║  📌 按 Ctrl+C 停止服务器" + " " * 32 + "║")
-    print("╚" + "═" * 58 + "╝")
-    print()
+        lines.append(f"║  🔗 远程访问: http://<服务器IP>:{port}{' ' * (18 - len(port))}║")
+    lines += [
+        f"║{' ' * 58}║",
+        f"║  📌 按 Ctrl+C 停止服务器{' ' * 32}║",
+        f"╚{'═' * 58}╝",
+        "",
+    ]
+    # 一次性写出整个横幅
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
     
-    server = HTTPServer((args.host, args.port), SkyBattleHandler)
+    warmup_kernels()
+    server = ThreadingHTTPServer((args.host, args.port), SkyBattleHandler)
     
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n👋 服务器已停止")
         server.shutdown()
+    finally:
+        manager.close()
 
 if __name__ == "__main__":
     main()
@@ -12,230 +12,447 @@ SkyBattle v2.0 - 增强版无人机对战模拟器
 """
 
 import argparse
+import gzip
+import hashlib
 import json
-import threading
+import math
+import multiprocessing
+import os
+import re
+import tempfile
 import time
 import numpy as np
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict, is_dataclass
 from typing import List, Dict, Optional, Tuple
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
 from backend.envs import CombatEnv, CombatConfig
+from backend.envs.combat_env import TEAMS
+from backend.utils.jit import njit, HAS_NUMBA
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    from htmlmin import minify as _htmlmin
+    HAS_HTMLMIN = True
+except ImportError:
+    HAS_HTMLMIN = False
+
+
+def _json_default(obj):
+    """标准库 json 回退: 把 NumPy 数组/标量和 dataclass 转成 Python 对象"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(data) -> bytes:
+    """序列化为 JSON 字节: 优先 orjson (C 实现，原生支持 NumPy)"""
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, separators=(",", ":"), default=_json_default).encode()
+
+# ============================================================
+#                     追击内核
+# ============================================================
+
+@njit(cache=True, fastmath=True)
+def _pursue_kernel(px, py, pz, tx, ty, tz, tvx, tvy, tvz, yaw, pitch, aggression,
+                   r1, r2, r3):
+    """追击控制的标量内核
+
+    r1..r3 为调用方预先抽取的 [0, 1) 均匀随机数，分别用于油门扰动、偏航扰动和滚转。
+    discrete == 2 只表示已进入导弹射界，是否真正发射由调用方按冷却决定。
+
+    Returns:
+        (discrete, throttle, pitch_rate, yaw_rate, roll)
+    """
+    # 预测目标位置（提前量）
+    dx, dy, dz = tx - px, ty - py, tz - pz
+    predict_time = math.sqrt(dx * dx + dy * dy + dz * dz) / 500  # 假设子弹速度 500
+    dx += tvx * predict_time * 0.5
+    dy += tvy * predict_time * 0.5
+    dz += tvz * predict_time * 0.5
+    
+    # 计算追击方向
+    dist = math.sqrt(dx * dx + dy * dy + dz * dz)
+    if dist < 1:
+        ux, uy, uz = 1.0, 0.0, 0.0
+    else:
+        ux, uy, uz = dx / dist, dy / dist, dz / dist
+    
+    # 计算需要的偏航和俯仰
+    yaw_target = math.atan2(uy, ux)
+    pitch_target = math.asin(min(max(uz, -1.0), 1.0))
+    
+    # 偏航误差归一化到 [-pi, pi)
+    yaw_error = (yaw_target - yaw + math.pi) % (2 * math.pi) - math.pi
+    pitch_error = pitch_target - pitch
+    
+    # 控制增益
+    yaw_rate = min(max(yaw_error * 1.5, -1.0), 1.0)
+    pitch_rate = min(max(pitch_error * 1.2, -1.0), 1.0)
+    
+    # 速度控制
+    if dist > 200:
+        throttle = 1.0  # 全速追击
+    elif dist > 100:
+        throttle = 0.7
+    else:
+        throttle = 0.5  # 近距离减速
+    
+    # 决定开火
+    angle_error = abs(yaw_error) + abs(pitch_error)
+    
+    if dist < 200 and angle_error < 0.4:
+        discrete = 1  # 机枪
+    elif dist < 350 and angle_error < 0.25:
+        discrete = 2  # 导弹
+    elif dist < 120 and angle_error < 0.6:
+        discrete = 1  # 近距离更容易开火
+    else:
+        discrete = 0
+    
+    # 添加微小随机性
+    throttle += (r1 - 0.5) * 0.1
+    yaw_rate += (r2 - 0.5) * 0.1
+    
+    return (discrete,
+            min(max(throttle * aggression, 0.0), 1.0),
+            pitch_rate,
+            min(max(yaw_rate, -1.0), 1.0),
+            (r3 - 0.5) * 0.2)
+
+
+@njit(cache=True)
+def _pursue_batch_kernel(pos, ori, target_pos, target_vel, aggression, rand):
+    """对整队逐个调用 _pursue_kernel，编译后整个循环都在原生代码中执行"""
+    n = pos.shape[0]
+    discrete = np.zeros(n, dtype=np.int64)
+    continuous = np.empty((n, 4))
+    for i in range(n):
+        d, throttle, pitch_rate, yaw_rate, roll = _pursue_kernel(
+            pos[i, 0], pos[i, 1], pos[i, 2],
+            target_pos[i, 0], target_pos[i, 1], target_pos[i, 2],
+            target_vel[i, 0], target_vel[i, 1], target_vel[i, 2],
+            ori[i, 2], ori[i, 1], aggression[i],
+            rand[i, 0], rand[i, 1], rand[i, 2])
+        discrete[i] = d
+        continuous[i, 0] = throttle
+        continuous[i, 1] = pitch_rate
+        continuous[i, 2] = yaw_rate
+        continuous[i, 3] = roll
+    return discrete, continuous
+
+
+def _pursue_numpy(pos, ori, target_pos, target_vel, aggression, rand):
+    """_pursue_kernel 的 NumPy 批量版本: 整队一次完成，未安装 Numba 时使用"""
+    # 预测目标位置（提前量）
+    to_target = target_pos - pos
+    predict_time = np.sqrt((to_target ** 2).sum(axis=1)) / 500  # 假设子弹速度 500
+    to_target += target_vel * (predict_time * 0.5)[:, None]
+    
+    # 计算追击方向
+    dist = np.sqrt((to_target ** 2).sum(axis=1))
+    direction = np.where((dist < 1)[:, None], np.array([1.0, 0.0, 0.0]),
+                         to_target / np.maximum(dist, 1)[:, None])
+    
+    # 计算需要的偏航和俯仰
+    yaw_target = np.arctan2(direction[:, 1], direction[:, 0])
+    pitch_target = np.arcsin(np.clip(direction[:, 2], -1, 1))
+    yaw_error = (yaw_target - ori[:, 2] + np.pi) % (2 * np.pi) - np.pi
+    pitch_error = pitch_target - ori[:, 1]
+    
+    # 控制增益
+    yaw_rate = np.clip(yaw_error * 1.5, -1, 1)
+    pitch_rate = np.clip(pitch_error * 1.2, -1, 1)
+    
+    # 速度控制
+    throttle = np.where(dist > 200, 1.0, np.where(dist > 100, 0.7, 0.5))
+    
+    # 决定开火: 机枪 / 导弹 / 近距离机枪
+    angle_error = np.abs(yaw_error) + np.abs(pitch_error)
+    discrete = np.select(
+        [(dist < 200) & (angle_error < 0.4),
+         (dist < 350) & (angle_error < 0.25),
+         (dist < 120) & (angle_error < 0.6)],
+        [1, 2, 1], 0)
+    
+    # 添加微小随机性
+    throttle = throttle + (rand[:, 0] - 0.5) * 0.1
+    yaw_rate = yaw_rate + (rand[:, 1] - 0.5) * 0.1
+    
+    continuous = np.stack([
+        np.clip(throttle * aggression, 0, 1),
+        pitch_rate,
+        np.clip(yaw_rate, -1, 1),
+        (rand[:, 2] - 0.5) * 0.2,
+    ], axis=1)
+    return discrete, continuous
+
+
+def _batched_pursue(pos, ori, target_pos, target_vel, aggression, rand):
+    """整队追击控制
+
+    Args:
+        pos, ori, target_pos, target_vel: [N, 3]，第 i 行追击第 i 个目标
+        aggression: [N]
+        rand: [N, 3] 的 [0, 1) 均匀随机数
+
+    Returns:
+        (discrete[N], continuous[N, 4])
+    """
+    if HAS_NUMBA:
+        return _pursue_batch_kernel(pos, ori, target_pos, target_vel, aggression, rand)
+    return _pursue_numpy(pos, ori, target_pos, target_vel, aggression, rand)
+
+
+def warmup_kernels():
+    """启动时预先编译 (或从磁盘缓存加载) Numba 内核"""
+    if HAS_NUMBA:
+        # dtype 与 get_team_actions 一致: 位置/姿态/速度来自 float32 的 get_state_soa
+        pos = np.array([[0.0, 0.0, 100.0]], dtype=np.float32)
+        _pursue_batch_kernel(pos, np.zeros((1, 3), dtype=np.float32), pos + np.float32(100.0),
+                             np.zeros((1, 3), dtype=np.float32), np.full(1, 0.8),
+                             np.full((1, 3), 0.5))
+
 
 # ============================================================
 #                     智能策略系统
 # ============================================================
 
+TEAM_NAMES = TEAMS
+
+# 处于导弹射界时每步发射导弹的概率，用作冷却倒计时的几何分布参数
+MISSILE_PROBABILITY = 0.03
+
+# 角色编码 (SmartStrategy.roles 中的取值)
+ROLE_LEADER, ROLE_ATTACKER, ROLE_SUPPORT = 0, 1, 2
+ROLE_NAMES = ("leader", "attacker", "support")
+
+
+def drones_to_soa(drones: List[dict]) -> dict:
+    """把渲染格式的无人机字典列表转换为与 CombatEnv.get_state_soa() 相同的 SoA 结构"""
+    n = len(drones)
+    return {
+        "ids": [d["id"] for d in drones],
+        "team": np.array([TEAM_NAMES.index(d["team"]) for d in drones], dtype=np.int8),
+        "pos": np.array([d["position"] for d in drones], dtype=np.float32).reshape(n, 3),
+        "vel": np.array([d["velocity"] for d in drones], dtype=np.float32).reshape(n, 3),
+        "ori": np.array([d["orientation"] for d in drones], dtype=np.float32).reshape(n, 3),
+        "hp": np.array([d["hp"] for d in drones], dtype=np.float32),
+        "shield": np.array([d.get("shield", 0.0) for d in drones], dtype=np.float32),
+        "alive": np.array([d["is_alive"] for d in drones], dtype=bool),
+        "projectiles": np.zeros((0, 3), dtype=np.float32),
+    }
+
+
 class SmartStrategy:
-    """智能战斗策略 - 让 AI 更聪明"""
+    """智能战斗策略 - 让 AI 更聪明
+
+    输入为 CombatEnv.get_state_soa() 格式的 SoA 状态 (float32 数组)。
+    """
     
     def __init__(self):
-        self.role_assignments: Dict[str, str] = {}
+        self.roles: Optional[np.ndarray] = None  # 按无人机序号存放角色编码
         self.targets: Dict[str, str] = {}  # drone_id -> target_id
         self.formation_center = np.zeros(3)
+        self.rng = np.random.default_rng()
+        self._alive_index: Dict[str, int] = {}  # 存活无人机 id -> 队内序号，每步重建
+        self._last_alive_signature: Optional[bytes] = None  # 上次分配角色时的存活掩码
+        self.missile_countdown: Optional[np.ndarray] = None  # 按无人机序号，还需在射界内停留的步数
     
-    def assign_roles(self, team: str, drones: List[dict]):
+    def assign_roles(self, team: str, state: dict):
         """分配角色"""
-        team_drones = [d for d in drones if d["team"] == team and d["is_alive"]]
-        n = len(team_drones)
+        n_drones = len(state["ids"])
+        if self.roles is None or len(self.roles) != n_drones:
+            self.roles = np.full(n_drones, ROLE_ATTACKER, dtype=np.int8)
+        
+        members = np.flatnonzero((state["team"] == TEAM_NAMES.index(team)) & state["alive"])
+        n = len(members)
         
         # 按位置排序（前面的当突击手）
-        if team == "red":
-            team_drones.sort(key=lambda d: -d["position"][0])
-        else:
-            team_drones.sort(key=lambda d: d["position"][0])
+        x = state["pos"][members, 0]
+        members = members[np.argsort(-x if team == "red" else x, kind="stable")]
         
-        for i, drone in enumerate(team_drones):
+        for i, k in enumerate(members):
             if i == 0:
-                self.role_assignments[drone["id"]] = "leader"  # 队长
+                self.roles[k] = ROLE_LEADER  # 队长
             elif i < n * 0.6:
-                self.role_assignments[drone["id"]] = "attacker"  # 突击手
+                self.roles[k] = ROLE_ATTACKER  # 突击手
             else:
-                self.role_assignments[drone["id"]] = "support"  # 支援
+                self.roles[k] = ROLE_SUPPORT  # 支援
     
-    def get_team_actions(self, drones: List[dict], step: int) -> Dict[str, dict]:
+    def get_team_actions(self, state: dict, step: int) -> Dict[str, dict]:
         """获取整个团队的行动"""
         actions = {}
+        ids = state["ids"]
+        
+        red_members = np.flatnonzero((state["team"] == 0) & state["alive"])
+        blue_members = np.flatnonzero((state["team"] == 1) & state["alive"])
+        
+        # 每步构建一次队内 SoA 数组，红蓝距离矩阵在所有角色间共享
+        red = self._team_arrays(state, red_members)
+        blue = self._team_arrays(state, blue_members)
+        
+        # 分配角色: 仅在存活集合变化时重排；每 50 步兜底一次，跟上位置变化
+        alive_signature = state["alive"].tobytes()
+        if self._last_alive_signature is None:
+            self._last_alive_signature = alive_signature
+        if step % 50 == 0 or alive_signature != self._last_alive_signature:
+            self._last_alive_signature = alive_signature
+            self.assign_roles("red", state)
+            self.assign_roles("blue", state)
+            self._assign_targets(red["ids"], blue["ids"], blue["hp"])
+            self._assign_targets(blue["ids"], red["ids"], red["hp"])
+        
+        dmat = np.sqrt(((red["pos"][:, None, :] - blue["pos"][None, :, :]) ** 2).sum(-1))
+        
+        # 被围攻: 150 范围内至少两个敌人，一次阈值比较同时得到两队的结果
+        close = dmat < 150
+        red["in_danger"] = close.sum(axis=1) >= 2
+        blue["in_danger"] = close.sum(axis=0) >= 2
+        views = {
+            "red": (red_members, red, blue, dmat),
+            "blue": (blue_members, blue, red, dmat.T),
+        }
+        self._alive_index = {drone_id: i for team in (red, blue)
+                             for i, drone_id in enumerate(team["ids"])}
         
-        red_drones = [d for d in drones if d["team"] == "red" and d["is_alive"]]
-        blue_drones = [d for d in drones if d["team"] == "blue" and d["is_alive"]]
+        # 每步一次性抽取所有随机数: 油门扰动、偏航扰动、滚转
+        rand = self.rng.random((len(ids), 3))
         
-        # 分配角色
-        if step == 0 or step % 50 == 0:
-            self.assign_roles("red", drones)
-            self.assign_roles("blue", drones)
-            self._assign_targets(red_drones, blue_drones)
-            self._assign_targets(blue_drones, red_drones)
+        # 导弹冷却: 倒计时只在处于射界的步上递减，服从几何分布，
+        # 与每个射界步独立掷 3% 骰子的发射分布相同，但每次发射才抽一次随机数
+        if self.missile_countdown is None or len(self.missile_countdown) != len(ids):
+            self.missile_countdown = self.rng.geometric(MISSILE_PROBABILITY, len(ids))
         
-        # 获取每个无人机的行动
-        for drone in drones:
-            if not drone["is_alive"]:
-                actions[drone["id"]] = {"discrete": 0, "continuous": [0, 0, 0, 0]}
+        for k in np.flatnonzero(~state["alive"]):
+            actions[ids[k]] = {"discrete": 0, "continuous": [0, 0, 0, 0]}
+        
+        # 每队先按角色选出目标和进攻性，再一次性批量计算追击控制
+        for team in ("red", "blue"):
+            members, ally_arrays, enemy_arrays, team_dmat = views[team]
+            if not len(members):
+                continue
+            if not len(enemy_arrays["ids"]):
+                for drone_id in ally_arrays["ids"]:
+                    actions[drone_id] = self._patrol_action(step)
                 continue
             
-            enemies = blue_drones if drone["team"] == "red" else red_drones
-            allies = red_drones if drone["team"] == "red" else blue_drones
+            targets = np.empty(len(members), dtype=np.intp)
+            aggression = np.empty(len(members))
+            for i, k in enumerate(members):
+                role = self.roles[k] if self.roles is not None else ROLE_ATTACKER
+                targets[i], aggression[i] = self._get_role_target(
+                    ids[k], i, ally_arrays, enemy_arrays, team_dmat, role)
+            
+            discrete, continuous = _batched_pursue(
+                ally_arrays["pos"], ally_arrays["ori"],
+                enemy_arrays["pos"][targets], enemy_arrays["vel"][targets],
+                aggression, rand[members])
             
-            role = self.role_assignments.get(drone["id"], "attacker")
-            action = self._get_role_action(drone, allies, enemies, role, step)
-            actions[drone["id"]] = action
+            # 射界内 (dist >= 200) 倒计时未结束的无人机不开火: 近距机枪分支此时不可能成立
+            in_range = discrete == 2
+            if in_range.any():
+                self.missile_countdown[members[in_range]] -= 1
+                hold = self.missile_countdown[members] > 0
+                discrete[in_range & hold] = 0
+                fired = members[in_range & ~hold]
+                if len(fired):
+                    self.missile_countdown[fired] = self.rng.geometric(MISSILE_PROBABILITY, len(fired))
+            
+            for drone_id, d, c in zip(ally_arrays["ids"], discrete.tolist(), continuous.tolist()):
+                actions[drone_id] = {"discrete": d, "continuous": c}
         
         return actions
     
-    def _assign_targets(self, attackers: List[dict], targets: List[dict]):
+    @staticmethod
+    def _team_arrays(state: dict, members: np.ndarray) -> dict:
+        """按序号从 SoA 状态中取出一队存活无人机的数组
+
+        "weakest" 为血量最低者的队内序号 (空队为 -1)，每步只计算一次；
+        "in_danger" 由 get_team_actions 在算出距离矩阵后补上。
+        """
+        hp = state["hp"][members]
+        return {
+            "ids": [state["ids"][k] for k in members],
+            "pos": state["pos"][members],
+            "vel": state["vel"][members],
+            "ori": state["ori"][members],
+            "hp": hp,
+            "weakest": int(hp.argmin()) if len(hp) else -1,
+        }
+    
+    def _assign_targets(self, attackers: List[str], targets: List[str], target_hp: np.ndarray):
         """分配攻击目标 - 集火策略"""
         if not targets:
             return
         
         # 按血量排序，优先攻击低血量
-        sorted_targets = sorted(targets, key=lambda t: t["hp"])
+        order = np.argsort(target_hp, kind="stable")
         
-        for i, attacker in enumerate(attackers):
+        for i, attacker_id in enumerate(attackers):
             # 分散攻击目标，但优先低血量
-            target_idx = i % len(sorted_targets)
+            target_idx = i % len(order)
             if i < len(attackers) // 2:
                 target_idx = 0  # 一半人集火最低血量
-            self.targets[attacker["id"]] = sorted_targets[target_idx]["id"]
+            self.targets[attacker_id] = targets[order[target_idx]]
     
-    def _get_role_action(self, drone: dict, allies: List[dict], enemies: List[dict], 
-                         role: str, step: int) -> dict:
-        """根据角色获取行动"""
-        if not enemies:
-            return self._patrol_action(drone, step)
-        
-        if role == "leader":
-            return self._leader_action(drone, allies, enemies, step)
-        elif role == "attacker":
-            return self._attacker_action(drone, enemies, step)
+    def _get_role_target(self, drone_id: str, i: int, ally_arrays: dict, enemy_arrays: dict,
+                         dmat: np.ndarray, role: int) -> Tuple[int, float]:
+        """根据角色选择目标 (dmat 为 己方 x 敌方 距离矩阵，i 为本机所在行)
+
+        Returns:
+            (敌方队内序号, 进攻性)
+        """
+        if role == ROLE_LEADER:
+            return self._leader_target(i, dmat)
+        elif role == ROLE_ATTACKER:
+            return self._attacker_target(drone_id, i, dmat)
         else:
-            return self._support_action(drone, allies, enemies, step)
+            return self._support_target(i, ally_arrays, enemy_arrays, dmat)
     
-    def _leader_action(self, drone: dict, allies: List[dict], enemies: List[dict], 
-                       step: int) -> dict:
+    def _leader_target(self, i: int, dmat: np.ndarray) -> Tuple[int, float]:
         """队长行为 - 冲锋在前，选择最优目标"""
-        pos = np.array(drone["position"])
-        
         # 找最近的敌人
-        target = min(enemies, key=lambda e: np.linalg.norm(np.array(e["position"]) - pos))
-        
-        return self._pursue_and_attack(drone, target, aggression=0.9)
+        return int(dmat[i].argmin()), 0.9
     
-    def _attacker_action(self, drone: dict, enemies: List[dict], step: int) -> dict:
+    def _attacker_target(self, drone_id: str, i: int, dmat: np.ndarray) -> Tuple[int, float]:
         """突击手行为 - 追击分配的目标"""
-        pos = np.array(drone["position"])
-        
         # 使用分配的目标
-        target_id = self.targets.get(drone["id"])
-        target = next((e for e in enemies if e["id"] == target_id), None)
+        target_id = self.targets.get(drone_id)
+        t = self._alive_index.get(target_id)
         
-        if not target:
-            target = min(enemies, key=lambda e: np.linalg.norm(np.array(e["position"]) - pos))
+        if t is None:
+            t = int(dmat[i].argmin())
         
-        return self._pursue_and_attack(drone, target, aggression=0.85)
+        return t, 0.85
     
-    def _support_action(self, drone: dict, allies: List[dict], enemies: List[dict], 
-                        step: int) -> dict:
+    def _support_target(self, i: int, ally_arrays: dict, enemy_arrays: dict,
+                        dmat: np.ndarray) -> Tuple[int, float]:
         """支援行为 - 保持距离，支援队友"""
-        pos = np.array(drone["position"])
+        # 找被围攻的队友 (不含自己)
+        candidates = np.flatnonzero(ally_arrays["in_danger"])
+        candidates = candidates[candidates != i]
         
-        # 找被围攻的队友
-        allies_in_danger = []
-        for ally in allies:
-            if ally["id"] == drone["id"]:
-                continue
-            ally_pos = np.array(ally["position"])
-            nearby_enemies = sum(1 for e in enemies 
-                               if np.linalg.norm(np.array(e["position"]) - ally_pos) < 150)
-            if nearby_enemies >= 2:
-                allies_in_danger.append(ally)
-        
-        if allies_in_danger:
+        if len(candidates):
             # 支援被围攻的队友
-            ally = min(allies_in_danger, key=lambda a: a["hp"])
-            target = min(enemies, 
-                        key=lambda e: np.linalg.norm(np.array(e["position"]) - np.array(ally["position"])))
-            return self._pursue_and_attack(drone, target, aggression=0.7)
-        else:
-            # 正常追击
-            target = min(enemies, key=lambda e: e["hp"])  # 集火低血量
-            return self._pursue_and_attack(drone, target, aggression=0.75)
-    
-    def _pursue_and_attack(self, drone: dict, target: dict, aggression: float = 0.8) -> dict:
-        """追击并攻击目标"""
-        pos = np.array(drone["position"])
-        vel = np.array(drone["velocity"])
-        target_pos = np.array(target["position"])
-        target_vel = np.array(target["velocity"])
-        
-        # 预测目标位置（提前量）
-        dist = np.linalg.norm(target_pos - pos)
-        predict_time = dist / 500  # 假设子弹速度 500
-        predicted_pos = target_pos + target_vel * predict_time * 0.5
-        
-        # 计算追击方向
-        to_target = predicted_pos - pos
-        dist = np.linalg.norm(to_target)
-        
-        if dist < 1:
-            direction = np.array([1, 0, 0])
-        else:
-            direction = to_target / dist
-        
-        # 计算需要的偏航和俯仰
-        yaw_target = np.arctan2(direction[1], direction[0])
-        pitch_target = np.arcsin(np.clip(direction[2], -1, 1))
-        
-        ori = drone["orientation"]
-        current_yaw = ori[2] if len(ori) > 2 else 0
-        current_pitch = ori[1] if len(ori) > 1 else 0
-        
-        yaw_error = yaw_target - current_yaw
-        pitch_error = pitch_target - current_pitch
-        
-        # 归一化
-        while yaw_error > np.pi: yaw_error -= 2 * np.pi
-        while yaw_error < -np.pi: yaw_error += 2 * np.pi
+            ally = candidates[int(ally_arrays["hp"][candidates].argmin())]
+            return int(dmat[ally].argmin()), 0.7
         
-        # 控制增益
-        yaw_rate = np.clip(yaw_error * 1.5, -1, 1)
-        pitch_rate = np.clip(pitch_error * 1.2, -1, 1)
-        
-        # 速度控制
-        if dist > 200:
-            throttle = 1.0  # 全速追击
-        elif dist > 100:
-            throttle = 0.7
-        else:
-            throttle = 0.5  # 近距离减速
-        
-        # 决定开火
-        angle_error = abs(yaw_error) + abs(pitch_error)
-        
-        if dist < 200 and angle_error < 0.4:
-            discrete = 1  # 机枪
-        elif dist < 350 and angle_error < 0.25 and np.random.random() < 0.03:
-            discrete = 2  # 导弹
-        elif dist < 120 and angle_error < 0.6:
-            discrete = 1  # 近距离更容易开火
-        else:
-            discrete = 0
-        
-        # 添加微小随机性
-        throttle += np.random.uniform(-0.05, 0.05)
-        yaw_rate += np.random.uniform(-0.05, 0.05)
-        
-        return {
-            "discrete": int(discrete),
-            "continuous": [
-                float(np.clip(throttle * aggression, 0, 1)),
-                float(np.clip(pitch_rate, -1, 1)),
-                float(np.clip(yaw_rate, -1, 1)),
-                float(np.random.uniform(-0.1, 0.1))
-            ]
-        }
+        # 正常追击
+        return enemy_arrays["weakest"], 0.75  # 集火低血量
     
-    def _patrol_action(self, drone: dict, step: int) -> dict:
+    def _patrol_action(self, step: int) -> dict:
         """巡逻行为"""
         return {
             "discrete": 0,
@@ -252,44 +469,203 @@ class SmartStrategy:
 #                     游戏管理器
 # ============================================================
 
+# 无人机帧字段 (GameState.drone_frames 最后一维的列顺序)
+DRONE_FIELDS = ("px", "py", "pz", "vx", "vy", "vz", "roll", "pitch", "yaw",
+                "hp", "shield", "team", "alive", "role")
+FRAME_STATS = ("red_alive", "blue_alive", "red_hp", "blue_hp")
+
+
 @dataclass
 class GameState:
+    """一局游戏的状态，帧数据按列存放在预分配的 float32 数组中
+
+    drone_frames[step, drone, field] 按 DRONE_FIELDS 排列，frame_stats[step] 按
+    FRAME_STATS 排列；弹药数量每帧不同，逐帧存放 (k, 3) 数组。
+    只有 n_frames 之前的行是有效数据，写完一行后才递增 n_frames。
+    
+    每帧写入时同时序列化一次追加到 frames_bytes (每帧 JSON 后跟一个逗号)，
+    frame_offsets[k] 为第 k 帧的起始偏移，轮询时直接切片而不必重新序列化。
+    """
     game_id: str
     status: str
-    frames: List[dict]
     winner: Optional[str]
     config: dict
     stats: dict
+    drone_frames: np.ndarray
+    frame_stats: np.ndarray
+    projectiles: List[np.ndarray] = field(default_factory=list)
+    drone_ids: List[str] = field(default_factory=list)
+    drone_teams: List[str] = field(default_factory=list)
+    frames_bytes: bytearray = field(default_factory=bytearray)
+    frame_offsets: List[int] = field(default_factory=lambda: [0])
+    n_frames: int = 0
+    # 结束后的完整响应 (since=0) 只序列化一次，之后的请求直接写出
+    payload_bytes: Optional[bytes] = None
+    
+    @classmethod
+    def allocate(cls, game_id: str, team_size: int, max_steps: int) -> "GameState":
+        """按最大步数一次性分配帧缓冲区"""
+        return cls(
+            game_id=game_id,
+            status="waiting",
+            winner=None,
+            config={"team_size": team_size, "max_steps": max_steps},
+            stats={"red_damage": 0, "blue_damage": 0, "red_kills": 0, "blue_kills": 0},
+            drone_frames=np.zeros((max_steps, 2 * team_size, len(DRONE_FIELDS)), dtype=np.float32),
+            frame_stats=np.zeros((max_steps, len(FRAME_STATS)), dtype=np.float32),
+        )
+    
+    def record_frame(self, state: dict, roles: Optional[np.ndarray],
+                     red_alive: int, blue_alive: int) -> Tuple[float, float]:
+        """把一步的 SoA 状态 (CombatEnv.get_state_soa() 格式) 复制到下一行
+
+        Returns:
+            (red_hp, blue_hp) 由刚写入的血量列直接求和
+        """
+        k = self.n_frames
+        if not self.drone_ids:
+            self.drone_ids = list(state["ids"])
+            self.drone_teams = [TEAM_NAMES[t] for t in state["team"]]
+        
+        row = self.drone_frames[k]
+        row[:, 0:3] = state["pos"]
+        row[:, 3:6] = state["vel"]
+        row[:, 6:9] = state["ori"]
+        row[:, 9] = state["hp"]
+        row[:, 10] = state["shield"]
+        row[:, 11] = state["team"]
+        row[:, 12] = state["alive"]
+        if roles is not None:
+            row[:, 13] = roles
+        is_red = state["team"] == 0
+        red_hp = float(row[is_red, 9].sum())
+        blue_hp = float(row[~is_red, 9].sum())
+        self.frame_stats[k] = (red_alive, blue_alive, red_hp, blue_hp)
+        self.projectiles.append(state["projectiles"].copy())
+        self.frames_bytes += dumps_json(self._frame_row(k)) + b","
+        self.frame_offsets.append(len(self.frames_bytes))
+        self.n_frames = k + 1
+        return red_hp, blue_hp
+    
+    def frame_dicts(self, start: int = 0, end: Optional[int] = None) -> List[dict]:
+        """把 [start, end) 帧转换为前端使用的字典格式"""
+        end = self.n_frames if end is None else min(end, self.n_frames)
+        return [asdict(self._frame_row(k)) for k in range(start, end)]
+    
+    def frames_json(self, start: int, end: int) -> bytes:
+        """[start, end) 帧的 JSON 数组片段 (不含方括号)，直接切自 frames_bytes"""
+        if start >= end:
+            return b""
+        return bytes(self.frames_bytes[self.frame_offsets[start]:self.frame_offsets[end] - 1])
+    
+    def _frame_row(self, k: int) -> "FrameRow":
+        """第 k 帧的前端数据"""
+        rows = self.drone_frames[k].tolist()
+        red_alive, blue_alive, red_hp, blue_hp = self.frame_stats[k].tolist()
+        return FrameRow(
+            step=k,
+            drones=[{
+                "id": drone_id,
+                "team": team,
+                "position": r[0:3],
+                "velocity": r[3:6],
+                "orientation": r[6:9],
+                "hp": r[9],
+                "shield": r[10],
+                "is_alive": r[12] != 0,
+                "role": ROLE_NAMES[int(r[13])],
+            } for drone_id, team, r in zip(self.drone_ids, self.drone_teams, rows)],
+            projectiles=[{"position": p} for p in self.projectiles[k].tolist()],
+            red_alive=int(red_alive),
+            blue_alive=int(blue_alive),
+            red_hp=red_hp,
+            blue_hp=blue_hp,
+        )
+
+
+@dataclass(slots=True)
+class FrameRow:
+    """一帧的前端数据，比同样字段的 dict 更小、构造更快；orjson 可直接序列化"""
+    step: int
+    drones: List[dict]
+    projectiles: List[dict]
+    red_alive: int
+    blue_alive: int
+    red_hp: float
+    blue_hp: float
+
+
+# 线程模式下同时运行的游戏数上限，超出的新游戏排队等待 (状态保持 waiting)
+GAME_THREADS = 4
+
 
 class GameManager:
-    def __init__(self):
+    def __init__(self, workers: int = 0):
+        """
+        Args:
+            workers: 大于 0 时在进程池中运行游戏，多局对战可并行占用多个核心；
+                为 0 时在有界线程池中运行 (可边模拟边拉取帧)
+        """
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
         self.games: Dict[str, GameState] = {}
         self.current_game: Optional[str] = None
         self.game_counter = 0
-        self.strategy = SmartStrategy()
     
     def create_game(self, team_size: int = 3, max_steps: int = 400) -> str:
         self.game_counter += 1
         game_id = f"battle_{self.game_counter:04d}"
         
-        self.games[game_id] = GameState(
-            game_id=game_id,
-            status="waiting",
-            frames=[],
-            winner=None,
-            config={"team_size": team_size, "max_steps": max_steps},
-            stats={"red_damage": 0, "blue_damage": 0, "red_kills": 0, "blue_kills": 0}
-        )
+        self.games[game_id] = GameState.allocate(game_id, team_size, max_steps)
         self.current_game = game_id
         return game_id
     
+    def start_game(self, game_id: str):
+        """在后台运行游戏: 有工作进程时提交到进程池，否则提交到有界线程池"""
+        if self.workers <= 0:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=GAME_THREADS,
+                                                   thread_name_prefix="skybattle-game")
+            self._threads.submit(self.run_game, game_id)
+            return
+        
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        
+        game = self.games[game_id]
+        game.status = "running"
+        future = self._pool.submit(_run_game_worker, game)
+        
+        def on_done(f):
+            # 工作进程返回完整的游戏状态；异常退出时也要结束游戏，避免前端一直等待
+            if f.exception() is None:
+                self.games[game_id] = f.result()
+            else:
+                game.status = "finished"
+        future.add_done_callback(on_done)
+    
+    def close(self):
+        """停止线程中运行的游戏并关闭线程池和进程池"""
+        for game in list(self.games.values()):
+            if game.status in ("waiting", "running"):
+                game.status = "stopped"
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
     def run_game(self, game_id: str):
         if game_id not in self.games:
             return
         
         game = self.games[game_id]
+        if game.status == "stopped":
+            return
         game.status = "running"
-        game.frames = []
         
         config = CombatConfig(
             team_size=game.config["team_size"],
@@ -298,75 +674,101 @@ class GameManager:
         env = CombatEnv(config=config)
         obs, info = env.reset(seed=int(time.time() * 1000) % 100000)
         
-        # 重置策略
-        self.strategy = SmartStrategy()
+        # 每局独立的策略，并发运行的游戏互不干扰
+        strategy = SmartStrategy()
         
-        prev_hp = {"red": config.team_size * 100, "blue": config.team_size * 100}
+        prev_red_hp = prev_blue_hp = config.team_size * 100.0
+        
+        # 每步只取一次状态: 步进后的状态既用于记录本帧，也是下一步决策的输入
+        state = env.get_state_soa()
         
         for step in range(config.max_steps):
             if game.status == "stopped":
                 break
             
-            state = env.get_state_for_render()
-            
             # 使用智能策略
-            actions = self.strategy.get_team_actions(state["drones"], step)
+            actions = strategy.get_team_actions(state, step)
             
             obs, rewards, terminated, truncated, info = env.step(actions)
-            state = env.get_state_for_render()
+            state = env.get_state_soa()
             
-            # 计算伤害统计
-            red_hp = sum(d["hp"] for d in state["drones"] if d["team"] == "red")
-            blue_hp = sum(d["hp"] for d in state["drones"] if d["team"] == "blue")
+            # 保存帧，队伍血量由帧缓冲区中的血量列求和得到
+            red_hp, blue_hp = game.record_frame(state, strategy.roles,
+                                                info["red_alive"], info["blue_alive"])
             
-            game.stats["blue_damage"] += max(0, prev_hp["blue"] - blue_hp)
-            game.stats["red_damage"] += max(0, prev_hp["red"] - red_hp)
-            prev_hp = {"red": red_hp, "blue": blue_hp}
-            
-            # 保存帧
-            frame = {
-                "step": step,
-                "drones": state["drones"],
-                "projectiles": state["projectiles"],
-                "red_alive": info["red_alive"],
-                "blue_alive": info["blue_alive"],
-                "red_hp": red_hp,
-                "blue_hp": blue_hp,
-            }
-            game.frames.append(frame)
+            # 计算伤害统计
+            game.stats["blue_damage"] += max(0.0, prev_blue_hp - blue_hp)
+            game.stats["red_damage"] += max(0.0, prev_red_hp - red_hp)
+            prev_red_hp, prev_blue_hp = red_hp, blue_hp
             
             if all(terminated.values()):
                 game.winner = info.get("winner")
                 break
         
-        game.status = "finished"
         if not game.winner:
-            last = game.frames[-1] if game.frames else None
-            if last:
-                if last["red_alive"] > last["blue_alive"]:
+            if game.n_frames:
+                red_alive, blue_alive, red_hp, blue_hp = game.frame_stats[game.n_frames - 1]
+                if red_alive > blue_alive:
                     game.winner = "red"
-                elif last["blue_alive"] > last["red_alive"]:
+                elif blue_alive > red_alive:
                     game.winner = "blue"
-                elif last["red_hp"] > last["blue_hp"]:
+                elif red_hp > blue_hp:
                     game.winner = "red"
-                elif last["blue_hp"] > last["red_hp"]:
+                elif blue_hp > red_hp:
                     game.winner = "blue"
                 else:
                     game.winner = "draw"
+        # 胜负确定后才标记结束，结束时缓存的响应一定带着最终结果
+        game.status = "finished"
     
     def get_game_data(self, game_id: str) -> Optional[dict]:
         if game_id not in self.games:
             return None
         game = self.games[game_id]
+        n_frames = game.n_frames
         return {
             "game_id": game.game_id,
             "status": game.status,
-            "frames": game.frames,
+            "frames": game.frame_dicts(0, n_frames),
             "winner": game.winner,
             "config": game.config,
             "stats": game.stats,
-            "total_frames": len(game.frames)
+            "total_frames": n_frames
         }
+    
+    def get_game_json(self, game_id: str, since: int = 0) -> Optional[bytes]:
+        """序列化好的游戏数据，只包含 since 之后的帧
+
+        状态先于帧数读取，客户端看到 finished 时一定已拿到全部帧。
+        已结束游戏的完整响应缓存在 payload_bytes 中，之后不再重新拼接。
+        """
+        if game_id not in self.games:
+            return None
+        game = self.games[game_id]
+        if since == 0 and game.payload_bytes is not None:
+            return game.payload_bytes
+        status = game.status
+        n_frames = game.n_frames
+        head = dumps_json({
+            "game_id": game.game_id,
+            "status": status,
+            "winner": game.winner,
+            "config": game.config,
+            "stats": game.stats,
+            "total_frames": n_frames,
+            "since_step": since,
+        })
+        body = head[:-1] + b',"frames":[' + game.frames_json(since, n_frames) + b"]}"
+        if since == 0 and status == "finished":
+            game.payload_bytes = body
+        return body
+
+def _run_game_worker(game: GameState) -> GameState:
+    """进程池入口: 在工作进程中跑完一局并返回完整的游戏状态"""
+    worker = GameManager()
+    worker.games[game.game_id] = game
+    worker.run_game(game.game_id)
+    return game
 
 manager = GameManager()
 
@@ -374,55 +776,131 @@ manager = GameManager()
 #                     HTTP 服务器
 # ============================================================
 
+def _int_param(params: Dict[str, List[str]], name: str, default: int, minimum: int = 0,
+               maximum: Optional[int] = None) -> int:
+    """读取整数查询参数，格式错误或超出 [minimum, maximum] 时抛出 ValueError"""
+    raw = params.get(name, [default])[0]
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {raw!r}") from None
+    if value < minimum:
+        raise ValueError(f"Invalid {name}: must be >= {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"Invalid {name}: must be <= {maximum}")
+    return value
+
+
+# 新游戏参数上限: GameState.allocate 按 max_steps 和无人机数预分配帧缓冲
+MAX_TEAM_SIZE = 10
+MAX_GAME_STEPS = 10000
+
+# 同时处理的 HTTP 连接数上限: 每个长连接在空闲期间也占用一个线程，
+# 因此上限要远高于同时打开的浏览器连接数 (每个标签页约 2~6 个)；线程按需创建
+HTTP_THREADS = 64
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """在有界线程池中处理请求的 HTTP 服务器
+
+    ThreadingHTTPServer 为每个连接新建一个线程；这里改为提交到固定大小的线程池，
+    超出的连接在池队列中等待。
+    """
+    request_queue_size = 64
+    
+    def __init__(self, server_address, handler_class, max_workers: int = HTTP_THREADS):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http")
+    
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+    
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
 class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 长连接: 前端轮询复用同一个 TCP 连接，所有响应都必须带 Content-Length
+    protocol_version = "HTTP/1.1"
+    # 空闲长连接几秒后关闭，尽快归还线程池中的线程 (前端轮询间隔远小于此值)
+    timeout = 5
+    
     def log_message(self, format, *args):
         pass
     
     def send_json(self, data, status=200):
+        self.send_bytes(dumps_json(data), status)
+    
+    def send_bytes(self, body: bytes, status=200):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
     
-    def send_html(self, html):
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.end_headers()
-        self.wfile.write(html.encode())
+    def accepts_gzip(self) -> bool:
+        """Accept-Encoding 中是否包含 gzip (忽略 q=0)"""
+        for token in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = token.partition(";")
+            if name.strip().lower() == "gzip":
+                return params.replace(" ", "") not in ("q=0", "q=0.0")
+        return False
+    
+    def send_page(self):
+        """一次写出预先拼好的完整页面响应 (状态行 + 头部 + 正文)
+
+        平台支持 os.sendfile 时，200 响应从临时文件经内核零拷贝路径发出；
+        否则 socket.sendfile 会退回到 seek + read，多线程共享文件位置不安全，直接写字节。
+        """
+        gzipped = self.accepts_gzip()
+        etag = HTML_PAGE_GZ_ETAG if gzipped else HTML_PAGE_ETAG
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.wfile.write(HTML_PAGE_GZ_304 if gzipped else HTML_PAGE_304)
+        elif HAS_SENDFILE:
+            self.connection.sendfile(HTML_PAGE_GZ_FILE if gzipped else HTML_PAGE_FILE)
+        else:
+            self.wfile.write(HTML_PAGE_GZ_RESPONSE if gzipped else HTML_PAGE_RESPONSE)
     
     def do_GET(self):
         parsed = urlparse(self.path)
-        path = parsed.path
-        params = parse_qs(parsed.query)
-        
+        try:
+            self.route_get(parsed.path, parse_qs(parsed.query))
+        except ValueError as e:
+            # 参数错误也返回带 Content-Length 的响应，长连接可以继续复用
+            self.send_json({"error": str(e)}, 400)
+    
+    def route_get(self, path: str, params: Dict[str, List[str]]):
         if path == "/" or path == "/index.html":
-            self.send_html(HTML_PAGE)
+            self.send_page()
         elif path == "/api/new_game":
-            team_size = int(params.get("team_size", [3])[0])
-            max_steps = int(params.get("max_steps", [400])[0])
+            team_size = _int_param(params, "team_size", 3, minimum=1, maximum=MAX_TEAM_SIZE)
+            max_steps = _int_param(params, "max_steps", 400, minimum=1, maximum=MAX_GAME_STEPS)
             game_id = manager.create_game(team_size, max_steps)
-            threading.Thread(target=manager.run_game, args=(game_id,), daemon=True).start()
+            manager.start_game(game_id)
             self.send_json({"game_id": game_id, "status": "started"})
         elif path == "/api/game_data":
             game_id = params.get("game_id", [manager.current_game])[0]
+            since = _int_param(params, "since_step", 0)
             if game_id:
-                data = manager.get_game_data(game_id)
-                if data:
-                    self.send_json(data)
+                body = manager.get_game_json(game_id, since)
+                if body:
+                    self.send_bytes(body)
                     return
             self.send_json({"error": "No game"}, 404)
         elif path == "/api/status":
             self.send_json({"status": "running", "version": "2.0"})
         else:
             self.send_response(404)
+            self.send_header("Content-Length", "0")
             self.end_headers()
 
 # ============================================================
 #                     增强版 HTML 页面
 # ============================================================
 
-HTML_PAGE = '''<!DOCTYPE html>
+HTML_PAGE_RAW = '''<!DOCTYPE html>
 <html lang="zh">
 <head>
     <meta charset="UTF-8">
@@ -892,11 +1370,14 @@ HTML_PAGE = '''<!DOCTYPE html>
                 const res = await fetch(`/api/new_game?team_size=${teamSize}&max_steps=${maxSteps}`);
                 const data = await res.json();
                 
-                // 等待完成
+                // 等待完成: 每次只拉取新增的帧
+                const frames = [];
                 while (true) {
-                    const r = await fetch(`/api/game_data?game_id=${data.game_id}`);
+                    const r = await fetch(`/api/game_data?game_id=${data.game_id}&since_step=${frames.length}`);
                     const g = await r.json();
+                    for (const f of g.frames) frames.push(f);
                     if (g.status === 'finished') {
+                        g.frames = frames;
                         gameData = g;
                         break;
                     }
@@ -1089,6 +1570,63 @@ HTML_PAGE = '''<!DOCTYPE html>
 </html>
 '''
 
+
+def minify_html(html: str) -> str:
+    """导入时压缩页面: 优先用 htmlmin，缺失时退回保守的逐行压缩
+
+    保守压缩只去掉 HTML/CSS 注释、整行 JS 注释、缩进和空行，保留换行，
+    JS 的自动分号插入不受影响。
+    """
+    if HAS_HTMLMIN:
+        return _htmlmin(html, remove_comments=True, remove_empty_space=True,
+                        reduce_boolean_attributes=True)
+    html = re.sub(r"<!--.*?-->", "", html, flags=re.S)
+    html = re.sub(r"<style>.*?</style>",
+                  lambda m: re.sub(r"/\*.*?\*/", "", m.group(0), flags=re.S), html, flags=re.S)
+    lines = (line.strip() for line in html.split("\n"))
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+HTML_PAGE = minify_html(HTML_PAGE_RAW)
+
+# 页面在导入时编码一次，每次请求直接写出字节
+HTML_PAGE_BYTES = HTML_PAGE.encode("utf-8")
+# gzip 版本同样只压缩一次，客户端支持时直接发送
+HTML_PAGE_GZ = gzip.compress(HTML_PAGE_BYTES, 9)
+# 页面在进程生命周期内不变，ETag 也只算一次；两种编码的实体不同，各用一个标签
+HTML_PAGE_ETAG = '"%s"' % hashlib.sha1(HTML_PAGE_BYTES).hexdigest()
+HTML_PAGE_GZ_ETAG = HTML_PAGE_ETAG[:-1] + '-gzip"'
+
+
+def build_page_responses(body: bytes, etag: str, encoding: Optional[str] = None) -> Tuple[bytes, bytes]:
+    """拼出完整的 200 与 304 响应字节串，请求时一次 write 写出"""
+    common = [f"ETag: {etag}", "Vary: Accept-Encoding"]
+    head = [f"{Handler.protocol_version} 200 OK", "Content-Type: text/html; charset=utf-8",
+            f"Content-Length: {len(body)}"] + common
+    if encoding:
+        head.append(f"Content-Encoding: {encoding}")
+    ok = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+    not_modified = ("\r\n".join([f"{Handler.protocol_version} 304 Not Modified"] + common)
+                    + "\r\n\r\n").encode("latin-1")
+    return ok, not_modified
+
+
+HTML_PAGE_RESPONSE, HTML_PAGE_304 = build_page_responses(HTML_PAGE_BYTES, HTML_PAGE_ETAG)
+HTML_PAGE_GZ_RESPONSE, HTML_PAGE_GZ_304 = build_page_responses(HTML_PAGE_GZ, HTML_PAGE_GZ_ETAG, "gzip")
+
+
+def spill_to_tempfile(data: bytes):
+    """把响应字节写入匿名临时文件并保持打开，供 socket.sendfile 发送"""
+    f = tempfile.TemporaryFile()
+    f.write(data)
+    f.flush()
+    return f
+
+
+HAS_SENDFILE = hasattr(os, "sendfile")
+HTML_PAGE_FILE = spill_to_tempfile(HTML_PAGE_RESPONSE)
+HTML_PAGE_GZ_FILE = spill_to_tempfile(HTML_PAGE_GZ_RESPONSE)
+
 # ============================================================
 #                        主入口
 # ============================================================
@@ -1097,7 +1635,10 @@ def main():
     parser = argparse.ArgumentParser(description="SkyBattle v2.0")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="在进程池中并行运行游戏的工作进程数 (0 表示使用后台线程)")
     args = parser.parse_args()
+    manager.workers = args.workers
     
     print()
     print("╔" + "═" * 50 + "╗")
@@ -1108,11 +1649,14 @@ def main():
     print("╚" + "═" * 50 + "╝")
     print()
     
-    server = HTTPServer((args.host, args.port), Handler)
+    warmup_kernels()
+    server = PooledHTTPServer((args.host, args.port), Handler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n👋 已停止")
+    finally:
+        manager.close()
 
 if __name__ == "__main__":
     main()
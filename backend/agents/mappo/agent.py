@@ -4,12 +4,18 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 
 from .policy import MAPPOPolicy
 from .buffer import RolloutBuffer
 
+try:
+    from safetensors.torch import save_file, load_file
+    HAS_SAFETENSORS = True
+except ImportError:
+    HAS_SAFETENSORS = False
+
 
 class MAPPOAgent:
     """Multi-Agent PPO Agent with CTDE paradigm."""
@@ -21,7 +27,8 @@ class MAPPOAgent:
                  clip_ratio: float = 0.2, entropy_coef: float = 0.01,
                  value_coef: float = 0.5, max_grad_norm: float = 0.5,
                  n_epochs: int = 10, batch_size: int = 256, buffer_size: int = 2048,
-                 device: str = "cuda" if torch.cuda.is_available() else "cpu"):
+                 device: str = "cuda" if torch.cuda.is_available() else "cpu",
+                 compile: bool = False, cuda_graph: bool = False):
         
         self.obs_dim = obs_dim
         self.state_dim = state_dim
@@ -36,6 +43,12 @@ class MAPPOAgent:
         self.batch_size = batch_size
         
         self.policy = MAPPOPolicy(obs_dim, state_dim, discrete_dim, continuous_dim, device)
+        if compile:
+            self.policy.compile()
+        elif cuda_graph:
+            # reduce-overhead compilation already replays CUDA graphs; otherwise capture the
+            # eager actor for the fixed all-agents batch used by act_arrays
+            self.policy.capture_actor_graph(n_agents)
         
         self.actor_optimizer = optim.Adam(self.policy.actor.parameters(), lr=lr_actor)
         self.critic_optimizer = optim.Adam(self.policy.critic.parameters(), lr=lr_critic)
@@ -46,33 +59,56 @@ class MAPPOAgent:
         self.total_steps = 0
         self.total_episodes = 0
     
+    def act_arrays(self, obs_batch: np.ndarray, deterministic: bool = False):
+        """Act on a stacked [N, obs_dim] batch; returns (discrete [N], continuous [N, C], log_probs [N])."""
+        return self.policy.act_batch(obs_batch, deterministic)
+    
     def act(self, observations: Dict[str, np.ndarray], deterministic: bool = False):
-        actions, log_probs = {}, {}
-        for agent_id, obs in observations.items():
-            action, lp = self.policy.act(obs, deterministic)
-            actions[agent_id] = {"discrete": int(action["discrete"]), "continuous": action["continuous"].tolist()}
-            log_probs[agent_id] = float(lp)
-        return actions, log_probs
+        """Per-agent dict adapter over :meth:`act_arrays` for the env's step() API.
+        
+        Entries are NumPy scalars and row views of the batched outputs rather than
+        Python ints/lists; the env and the rollout buffer accept both.
+        """
+        agent_ids = list(observations)
+        if not agent_ids:
+            return {}, {}
+        discrete, continuous, log_probs = self.act_arrays(
+            np.stack([observations[aid] for aid in agent_ids]), deterministic)
+        actions = {aid: {"discrete": discrete[i], "continuous": continuous[i]}
+                   for i, aid in enumerate(agent_ids)}
+        return actions, dict(zip(agent_ids, log_probs))
     
-    def get_values(self, state: np.ndarray, agent_ids: List[str]) -> Dict[str, float]:
-        value = self.policy.get_value(state)
-        return {aid: value for aid in agent_ids}
+    def get_values(self, state: np.ndarray, agent_ids: Optional[List[str]] = None) -> float:
+        """Centralized value of ``state``; shared by every agent, so returned once as a scalar."""
+        return float(self.policy.get_value(state))
     
     def store_transition(self, observations, state, actions, rewards, dones, log_probs, values, agent_ids):
-        actions_np = {aid: {"discrete": np.array(a["discrete"]), "continuous": np.array(a["continuous"])}
-                      for aid, a in actions.items()}
-        self.buffer.add(observations, state, actions_np, rewards, dones, log_probs, values, agent_ids)
+        # The buffer writes the values from act() straight into its preallocated arrays
+        self.buffer.add(observations, state, actions, rewards, dones, log_probs, values, agent_ids)
+    
+    def store_arrays(self, observations, state, discrete_actions, continuous_actions,
+                     rewards, dones, log_probs, values):
+        """Store one step from dense per-agent arrays (see :meth:`RolloutBuffer.add_arrays`)."""
+        self.buffer.add_arrays(observations, state, discrete_actions, continuous_actions,
+                               rewards, dones, log_probs, values)
     
     def update(self, last_values: np.ndarray) -> Dict[str, float]:
         self.buffer.compute_advantages(last_values)
         
-        total_actor_loss, total_critic_loss, total_entropy, n_updates = 0.0, 0.0, 0.0, 0
+        # Accumulate on-device and sync once at the end instead of per minibatch
+        total_actor_loss = torch.zeros((), device=self.device)
+        total_critic_loss = torch.zeros((), device=self.device)
+        total_entropy = torch.zeros((), device=self.device)
+        n_updates = 0
         
         for _ in range(self.n_epochs):
             for batch in self.buffer.get(self.batch_size):
-                log_probs, entropy = self.policy.actor.evaluate_actions(
-                    batch["observations"], batch["discrete_actions"], batch["continuous_actions"])
-                values = self.policy.critic(batch["states"]).squeeze(-1)
+                with self.policy.autocast():
+                    log_probs, entropy = self.policy.actor.evaluate_actions(
+                        batch["observations"], batch["discrete_actions"], batch["continuous_actions"])
+                    values = self.policy.critic(batch["states"]).squeeze(-1)
+                # Log-probs come back in FP32 (see Actor.dist_params); the value loss is FP32 too
+                values = values.float()
                 
                 ratio = torch.exp(log_probs - batch["old_log_probs"])
                 surr1 = ratio * batch["advantages"]
@@ -81,40 +117,67 @@ class MAPPOAgent:
                 entropy_loss = -entropy.mean()
                 value_loss = nn.functional.mse_loss(values, batch["returns"])
                 
-                self.actor_optimizer.zero_grad()
-                (actor_loss + self.entropy_coef * entropy_loss).backward()
+                # Actor and critic parameters are disjoint, so one backward pass over the
+                # summed loss yields the same gradients as two separate passes.
+                self.actor_optimizer.zero_grad(set_to_none=True)
+                self.critic_optimizer.zero_grad(set_to_none=True)
+                (actor_loss + self.entropy_coef * entropy_loss + self.value_coef * value_loss).backward()
                 nn.utils.clip_grad_norm_(self.policy.actor.parameters(), self.max_grad_norm)
-                self.actor_optimizer.step()
-                
-                self.critic_optimizer.zero_grad()
-                (self.value_coef * value_loss).backward()
                 nn.utils.clip_grad_norm_(self.policy.critic.parameters(), self.max_grad_norm)
+                self.actor_optimizer.step()
                 self.critic_optimizer.step()
                 
-                total_actor_loss += actor_loss.item()
-                total_critic_loss += value_loss.item()
-                total_entropy += entropy.mean().item()
+                total_actor_loss += actor_loss.detach()
+                total_critic_loss += value_loss.detach()
+                total_entropy += entropy.detach().mean()
                 n_updates += 1
         
         self.buffer.reset()
-        return {"actor_loss": total_actor_loss / n_updates, "critic_loss": total_critic_loss / n_updates,
-                "entropy": total_entropy / n_updates}
+        return {"actor_loss": total_actor_loss.item() / n_updates,
+                "critic_loss": total_critic_loss.item() / n_updates,
+                "entropy": total_entropy.item() / n_updates}
     
     def should_update(self) -> bool:
         return self.buffer.is_full()
     
+    @staticmethod
+    def weights_path(path: str) -> Path:
+        """Sibling safetensors file holding the network weights of checkpoint ``path``."""
+        return Path(path).with_suffix(".safetensors")
+    
     def save(self, path: str):
+        """Save a checkpoint.
+        
+        With safetensors installed, the actor/critic weights go to ``weights_path(path)``
+        and ``path`` keeps only optimizer state and counters; otherwise everything is
+        pickled into ``path``.
+        """
         Path(path).parent.mkdir(parents=True, exist_ok=True)
-        torch.save({
-            "policy": {"actor": self.policy.actor.state_dict(), "critic": self.policy.critic.state_dict()},
+        ckpt = {
             "actor_opt": self.actor_optimizer.state_dict(), "critic_opt": self.critic_optimizer.state_dict(),
             "total_steps": self.total_steps, "total_episodes": self.total_episodes,
-        }, path)
+        }
+        if HAS_SAFETENSORS:
+            weights = {f"actor.{k}": v for k, v in self.policy.actor.state_dict().items()}
+            weights.update({f"critic.{k}": v for k, v in self.policy.critic.state_dict().items()})
+            save_file(weights, str(self.weights_path(path)))
+        else:
+            ckpt["policy"] = {"actor": self.policy.actor.state_dict(), "critic": self.policy.critic.state_dict()}
+        torch.save(ckpt, path)
     
     def load(self, path: str):
+        """Load a checkpoint written by :meth:`save`, in either layout."""
         ckpt = torch.load(path, map_location=self.device)
-        self.policy.actor.load_state_dict(ckpt["policy"]["actor"])
-        self.policy.critic.load_state_dict(ckpt["policy"]["critic"])
+        if "policy" in ckpt:
+            actor_state, critic_state = ckpt["policy"]["actor"], ckpt["policy"]["critic"]
+        else:
+            if not HAS_SAFETENSORS:
+                raise ImportError(f"safetensors is required to load the weights of {path}")
+            weights = load_file(str(self.weights_path(path)), device=str(self.device))
+            actor_state = {k[len("actor."):]: v for k, v in weights.items() if k.startswith("actor.")}
+            critic_state = {k[len("critic."):]: v for k, v in weights.items() if k.startswith("critic.")}
+        self.policy.actor.load_state_dict(actor_state)
+        self.policy.critic.load_state_dict(critic_state)
         self.actor_optimizer.load_state_dict(ckpt["actor_opt"])
         self.critic_optimizer.load_state_dict(ckpt["critic_opt"])
         self.total_steps = ckpt.get("total_steps", 0)
@@ -2,7 +2,41 @@
 
 import numpy as np
 import torch
-from typing import Generator
+from typing import Dict, Generator
+
+from ...utils.jit import njit, HAS_NUMBA
+
+
+@njit(cache=True, fastmath=True)
+def _gae_kernel(rewards, values, dones, last_values, gamma, gae_lambda, advantages):
+    """Backward GAE pass over [T, n_agents] arrays, writing into ``advantages``.
+    
+    Scalar loops with one running accumulator per agent; compiled by Numba.
+    """
+    gamma_lambda = gamma * gae_lambda
+    n_steps, n_agents = rewards.shape
+    last_gae = np.zeros(n_agents)
+    for j in range(n_agents):
+        next_value = float(last_values[j])
+        for t in range(n_steps - 1, -1, -1):
+            next_non_terminal = 1.0 - dones[t, j]
+            delta = rewards[t, j] + gamma * next_value * next_non_terminal - values[t, j]
+            last_gae[j] = delta + gamma_lambda * next_non_terminal * last_gae[j]
+            advantages[t, j] = last_gae[j]
+            next_value = values[t, j]
+
+
+def _gae_numpy(rewards, values, dones, last_values, gamma, gae_lambda, advantages):
+    """NumPy fallback for ``_gae_kernel``: one vectorized row update per timestep."""
+    gamma_lambda = gamma * gae_lambda
+    last_gae = np.zeros(rewards.shape[1])
+    next_values = last_values.astype(np.float64)
+    for t in range(rewards.shape[0] - 1, -1, -1):
+        next_non_terminal = 1.0 - dones[t]
+        delta = rewards[t] + gamma * next_values * next_non_terminal - values[t]
+        last_gae = delta + gamma_lambda * next_non_terminal * last_gae
+        advantages[t] = last_gae
+        next_values = values[t]
 
 
 class RolloutBuffer:
@@ -34,58 +68,89 @@ class RolloutBuffer:
         self.returns = np.zeros((self.buffer_size, self.n_agents), dtype=np.float32)
         self.ptr = 0
         self.full = False
+        self._tensors = None
     
-    def add(self, observations, state, actions, rewards, dones, log_probs, values, agent_ids):
-        for i, aid in enumerate(agent_ids):
-            self.observations[self.ptr, i] = observations[aid]
-            self.discrete_actions[self.ptr, i] = actions[aid]["discrete"]
-            self.continuous_actions[self.ptr, i] = actions[aid]["continuous"]
-            self.rewards[self.ptr, i] = rewards[aid]
-            self.dones[self.ptr, i] = float(dones[aid])
-            self.log_probs[self.ptr, i] = log_probs[aid]
-            self.values[self.ptr, i] = values[aid]
-        self.states[self.ptr] = state
+    def add_arrays(self, observations, state, discrete_actions, continuous_actions,
+                   rewards, dones, log_probs, values):
+        """Store one step from dense per-agent arrays, one slice write per field.
+        
+        Row i of every array belongs to agent column i; ``values`` may be the shared
+        centralized-critic scalar or an [n_agents] array.
+        """
+        t, n = self.ptr, len(observations)
+        self.observations[t, :n] = observations
+        self.discrete_actions[t, :n] = discrete_actions
+        self.continuous_actions[t, :n] = continuous_actions
+        self.rewards[t, :n] = rewards
+        self.dones[t, :n] = dones
+        self.log_probs[t, :n] = log_probs
+        self.values[t, :n] = values
+        self.states[t] = state
+        self._tensors = None
         self.ptr += 1
         if self.ptr >= self.buffer_size:
             self.full = True
     
+    def add(self, observations, state, actions, rewards, dones, log_probs, values, agent_ids):
+        """Dict-of-agents adapter over :meth:`add_arrays`; agent_ids fixes the column order."""
+        self.add_arrays(
+            [observations[aid] for aid in agent_ids], state,
+            [actions[aid]["discrete"] for aid in agent_ids],
+            [actions[aid]["continuous"] for aid in agent_ids],
+            [rewards[aid] for aid in agent_ids],
+            [dones[aid] for aid in agent_ids],
+            [log_probs[aid] for aid in agent_ids],
+            values if np.isscalar(values) else [values[aid] for aid in agent_ids],
+        )
+    
     def compute_advantages(self, last_values: np.ndarray):
-        last_gae = np.zeros(self.n_agents)
-        for t in reversed(range(self.ptr)):
-            next_values = last_values if t == self.ptr - 1 else self.values[t + 1]
-            next_non_terminal = 1.0 - self.dones[t]
-            delta = self.rewards[t] + self.gamma * next_values * next_non_terminal - self.values[t]
-            last_gae = delta + self.gamma * self.gae_lambda * next_non_terminal * last_gae
-            self.advantages[t] = last_gae
+        gae = _gae_kernel if HAS_NUMBA else _gae_numpy
+        gae(self.rewards[:self.ptr], self.values[:self.ptr], self.dones[:self.ptr],
+            np.asarray(last_values, dtype=np.float32), self.gamma, self.gae_lambda,
+            self.advantages[:self.ptr])
         self.returns[:self.ptr] = self.advantages[:self.ptr] + self.values[:self.ptr]
+        self._tensors = None
+    
+    def _flat_tensors(self) -> Dict[str, torch.Tensor]:
+        """Flatten the filled rows to [ptr * n_agents, ...] tensors on the device, once per update.
+        
+        ``states`` stays [ptr, state_dim]: every agent of a step shares it, so
+        :meth:`get` gathers rows by ``idx // n_agents`` instead of storing n_agents copies.
+        """
+        if self._tensors is None:
+            adv_flat = self.advantages[:self.ptr].reshape(-1)
+            adv_flat = (adv_flat - adv_flat.mean()) / (adv_flat.std() + 1e-8)
+            arrays = {
+                "observations": self.observations[:self.ptr].reshape(-1, self.obs_dim),
+                "states": self.states[:self.ptr],
+                "discrete_actions": self.discrete_actions[:self.ptr].reshape(-1),
+                "continuous_actions": self.continuous_actions[:self.ptr].reshape(-1, self.continuous_dim),
+                "old_log_probs": self.log_probs[:self.ptr].reshape(-1),
+                "advantages": adv_flat.astype(np.float32),
+                "returns": self.returns[:self.ptr].reshape(-1),
+            }
+            self._tensors = {key: self._to_device(arr) for key, arr in arrays.items()}
+        return self._tensors
+    
+    def _to_device(self, arr: np.ndarray) -> torch.Tensor:
+        """Host-to-device copy; on CUDA staged through pinned memory so it can run asynchronously."""
+        t = torch.from_numpy(np.ascontiguousarray(arr))
+        if torch.device(self.device).type != "cuda":
+            return t.to(self.device)
+        return t.pin_memory().to(self.device, non_blocking=True)
     
     def get(self, batch_size: int, shuffle: bool = True) -> Generator:
+        tensors = self._flat_tensors()
         size = self.ptr * self.n_agents
-        indices = np.arange(size)
-        if shuffle:
-            np.random.shuffle(indices)
-        
-        obs_flat = self.observations[:self.ptr].reshape(-1, self.obs_dim)
-        disc_flat = self.discrete_actions[:self.ptr].reshape(-1)
-        cont_flat = self.continuous_actions[:self.ptr].reshape(-1, self.continuous_dim)
-        log_probs_flat = self.log_probs[:self.ptr].reshape(-1)
-        adv_flat = self.advantages[:self.ptr].reshape(-1)
-        ret_flat = self.returns[:self.ptr].reshape(-1)
-        states_flat = np.repeat(self.states[:self.ptr], self.n_agents, axis=0)
-        
-        adv_flat = (adv_flat - adv_flat.mean()) / (adv_flat.std() + 1e-8)
+        # The rollout is already resident on the device; per epoch only the shuffled
+        # index vector crosses over, and minibatches are device-side gathers
+        indices = self._to_device(np.random.permutation(size) if shuffle else np.arange(size))
         
         for start in range(0, size, batch_size):
-            idx = indices[start:min(start + batch_size, size)]
-            yield {
-                "observations": torch.FloatTensor(obs_flat[idx]).to(self.device),
-                "states": torch.FloatTensor(states_flat[idx]).to(self.device),
-                "discrete_actions": torch.LongTensor(disc_flat[idx]).to(self.device),
-                "continuous_actions": torch.FloatTensor(cont_flat[idx]).to(self.device),
-                "old_log_probs": torch.FloatTensor(log_probs_flat[idx]).to(self.device),
-                "advantages": torch.FloatTensor(adv_flat[idx]).to(self.device),
-                "returns": torch.FloatTensor(ret_flat[idx]).to(self.device),
-            }
+            idx = indices[start:start + batch_size]
+            batch = {key: t[idx] for key, t in tensors.items() if key != "states"}
+            batch["states"] = tensors["states"][idx // self.n_agents]
+            yield batch
     
     def is_full(self) -> bool:
         return self.full or self.ptr >= self.buffer_size
@@ -1,12 +1,40 @@
 """MAPPO Policy Networks - Actor and Critic."""
 
+import math
+
 import torch
 import torch.nn as nn
-from torch.distributions import Categorical, Normal
 from typing import Tuple, Dict
 import numpy as np
 
 
+# Inline Categorical/Normal math: building torch.distributions objects per call costs
+# argument validation and a second softmax, which dominates for a 5-way head.
+_HALF_LOG_2PI = 0.5 * math.log(2 * math.pi)
+
+
+def _cat_sample_logp(logits: torch.Tensor, deterministic: bool = False):
+    """Sample (or argmax) a categorical action; returns (action, log_prob, log_softmax)."""
+    log_p = logits.log_softmax(-1)
+    if deterministic:
+        action = log_p.argmax(-1)
+    else:
+        action = torch.multinomial(log_p.exp().reshape(-1, log_p.shape[-1]), 1).view(log_p.shape[:-1])
+    return action, log_p.gather(-1, action.unsqueeze(-1)).squeeze(-1), log_p
+
+
+def _normal_logp(x: torch.Tensor, mean: torch.Tensor, log_std: torch.Tensor) -> torch.Tensor:
+    """Diagonal Gaussian log-density, summed over the last dim."""
+    return (-0.5 * ((x - mean) * torch.exp(-log_std)) ** 2 - log_std - _HALF_LOG_2PI).sum(-1)
+
+
+def _normal_sample_logp(mean: torch.Tensor, log_std: torch.Tensor, deterministic: bool = False):
+    """Sample (or take the mean of) a Gaussian action clamped to [-1, 1]; returns (action, log_prob)."""
+    action = mean if deterministic else mean + torch.exp(log_std) * torch.randn_like(mean)
+    action = torch.clamp(action, -1, 1)
+    return action, _normal_logp(action, mean, log_std)
+
+
 class Actor(nn.Module):
     """Actor network with discrete and continuous action heads."""
     
@@ -50,28 +78,33 @@ class Actor(nn.Module):
         cont_std = torch.exp(self.log_std).expand_as(cont_mean)
         return discrete_logits, cont_mean, cont_std
     
+    def dist_params(self, obs: torch.Tensor):
+        """Forward pass with outputs in FP32, so sampling and log-probs stay full precision under autocast."""
+        logits, mean, std = self(obs)
+        return logits.float(), mean.float(), std.float()
+    
     def get_action(self, obs: torch.Tensor, deterministic: bool = False):
-        logits, mean, std = self.forward(obs)
-        
-        disc_dist = Categorical(logits=logits)
-        disc_action = logits.argmax(-1) if deterministic else disc_dist.sample()
-        
-        cont_dist = Normal(mean, std)
-        cont_action = mean if deterministic else cont_dist.sample()
-        cont_action = torch.clamp(cont_action, -1, 1)
+        logits, mean, _ = self.dist_params(obs)
+        return self.sample(logits, mean, deterministic)
+    
+    def sample(self, logits: torch.Tensor, mean: torch.Tensor, deterministic: bool = False):
+        """Sample actions and their log-probs from forward outputs (see :meth:`get_action`)."""
+        log_std = self.log_std.float().expand_as(mean)
         
-        log_prob = disc_dist.log_prob(disc_action) + cont_dist.log_prob(cont_action).sum(-1)
+        disc_action, disc_logp, _ = _cat_sample_logp(logits, deterministic)
+        cont_action, cont_logp = _normal_sample_logp(mean, log_std, deterministic)
         
-        return {"discrete": disc_action, "continuous": cont_action}, log_prob
+        return {"discrete": disc_action, "continuous": cont_action}, disc_logp + cont_logp
     
     def evaluate_actions(self, obs: torch.Tensor, disc_action: torch.Tensor, cont_action: torch.Tensor):
-        logits, mean, std = self.forward(obs)
+        logits, mean, _ = self.dist_params(obs)
+        log_std = self.log_std.float().expand_as(mean)
         
-        disc_dist = Categorical(logits=logits)
-        cont_dist = Normal(mean, std)
-        
-        log_prob = disc_dist.log_prob(disc_action) + cont_dist.log_prob(cont_action).sum(-1)
-        entropy = disc_dist.entropy() + cont_dist.entropy().sum(-1)
+        log_p = logits.log_softmax(-1)
+        disc_logp = log_p.gather(-1, disc_action.long().unsqueeze(-1)).squeeze(-1)
+        log_prob = disc_logp + _normal_logp(cont_action, mean, log_std)
+        # Reuse log_softmax for the categorical entropy; Gaussian entropy depends only on log_std
+        entropy = -(log_p.exp() * log_p).sum(-1) + (0.5 + _HALF_LOG_2PI + log_std).sum(-1)
         
         return log_prob, entropy
 
@@ -110,20 +143,98 @@ class MAPPOPolicy:
         
         self.actor = Actor(obs_dim, discrete_dim, continuous_dim).to(device)
         self.critic = Critic(state_dim).to(device)
+        
+        # BF16 autocast for forward passes on GPUs that support it. Weights (including
+        # ``log_std``) stay FP32; BF16 keeps FP32's exponent range, so no GradScaler is needed.
+        self.device_type = torch.device(device).type
+        self.use_bf16 = self.device_type == "cuda" and torch.cuda.is_bf16_supported()
+        self._obs_staging = None
+        self._actor_graph = None
+    
+    def autocast(self, cache_enabled: bool = True):
+        """Autocast context for actor/critic forwards; a no-op unless ``use_bf16``."""
+        return torch.autocast(self.device_type, dtype=torch.bfloat16, enabled=self.use_bf16,
+                              cache_enabled=cache_enabled)
+    
+    def capture_actor_graph(self, batch_size: int) -> bool:
+        """Capture the actor forward for a fixed [batch_size, obs_dim] input as a CUDA graph.
+        
+        ``act_batch`` then replays the graph for batches of that size and samples
+        from its outputs eagerly, so the graph itself holds no RNG state. Optimizer
+        steps and ``load`` update the parameters in place, which the graph keeps
+        reading. Returns False (and does nothing) off CUDA.
+        """
+        if self.device_type != "cuda":
+            return False
+        static_obs = torch.zeros(batch_size, self.obs_dim, device=self.device)
+        # Warm up on a side stream so lazy initialization stays out of the capture
+        side = torch.cuda.Stream()
+        side.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(side), torch.inference_mode(), self.autocast(cache_enabled=False):
+            for _ in range(3):
+                self.actor.dist_params(static_obs)
+        torch.cuda.current_stream().wait_stream(side)
+        
+        graph = torch.cuda.CUDAGraph()
+        with torch.inference_mode(), self.autocast(cache_enabled=False), torch.cuda.graph(graph):
+            logits, mean, _ = self.actor.dist_params(static_obs)
+        self._actor_graph = (graph, static_obs, logits, mean)
+        return True
+    
+    def compile(self, mode: str = "reduce-overhead"):
+        """Compile both networks in place for the run's fixed input shapes.
+        
+        Each forward (backbone, both actor heads, ``log_std`` expansion) is captured
+        as one graph. ``nn.Module.compile`` keeps the parameters and ``state_dict``
+        keys of the original modules, so checkpoints stay interchangeable with eager
+        runs. Only ``__call__`` goes through the compiled graph, which is why the
+        actor's sampling methods call ``self(obs)`` rather than ``self.forward(obs)``.
+        """
+        self.actor.compile(mode=mode, dynamic=False, fullgraph=True)
+        self.critic.compile(mode=mode, dynamic=False, fullgraph=True)
     
     def act(self, obs: np.ndarray, deterministic: bool = False):
-        with torch.no_grad():
-            obs_t = torch.FloatTensor(obs).unsqueeze(0).to(self.device)
-            action, log_prob = self.actor.get_action(obs_t, deterministic)
-            return {
-                "discrete": action["discrete"].cpu().numpy()[0],
-                "continuous": action["continuous"].cpu().numpy()[0],
-            }, log_prob.cpu().numpy()[0]
+        discrete, continuous, log_probs = self.act_batch(np.asarray(obs)[None], deterministic)
+        return {"discrete": discrete[0], "continuous": continuous[0]}, log_probs[0]
+    
+    def _stage_obs(self, obs: np.ndarray) -> torch.Tensor:
+        """Host-to-device copy of an observation batch.
+        
+        On CUDA the batch goes through a reused pinned buffer so the copy is async;
+        elsewhere ``from_numpy`` is zero-copy.
+        """
+        obs = np.asarray(obs, dtype=np.float32)
+        if self.device_type != "cuda":
+            return torch.from_numpy(obs).to(self.device)
+        if self._obs_staging is None or self._obs_staging.shape != obs.shape:
+            self._obs_staging = torch.empty(obs.shape, dtype=torch.float32).pin_memory()
+        self._obs_staging.numpy()[...] = obs
+        return self._obs_staging.to(self.device, non_blocking=True)
+    
+    def act_batch(self, obs: np.ndarray, deterministic: bool = False):
+        """Act for a stacked [N, obs_dim] batch in one forward pass.
+
+        Returns (discrete [N], continuous [N, C], log_probs [N]) as numpy arrays,
+        read back from the device in a single copy.
+        """
+        with torch.inference_mode(), self.autocast():
+            obs_t = self._stage_obs(obs)
+            if self._actor_graph is not None and obs_t.shape == self._actor_graph[1].shape:
+                graph, static_obs, logits, mean = self._actor_graph
+                static_obs.copy_(obs_t)
+                graph.replay()
+                action, log_prob = self.actor.sample(logits, mean, deterministic)
+            else:
+                action, log_prob = self.actor.get_action(obs_t, deterministic)
+            cont = action["continuous"]
+            out = torch.cat([action["discrete"].unsqueeze(-1).to(cont.dtype), cont,
+                             log_prob.unsqueeze(-1)], dim=-1).cpu().numpy()
+        return out[:, 0].astype(np.int64), out[:, 1:-1], out[:, -1]
     
     def get_value(self, state: np.ndarray) -> float:
-        with torch.no_grad():
+        with torch.inference_mode(), self.autocast():
             state_t = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-            return self.critic(state_t).cpu().numpy()[0, 0]
+            return self.critic(state_t).float().cpu().numpy()[0, 0]
     
     def save(self, path: str):
         torch.save({"actor": self.actor.state_dict(), "critic": self.critic.state_dict()}, path)
@@ -5,9 +5,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 import asyncio
+import json
+import multiprocessing
+import threading
 import uuid
 from pathlib import Path
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 from ..envs import CombatEnv, CombatConfig
 from ..agents import MAPPOAgent
 
@@ -30,6 +39,15 @@ class ControlRequest(BaseModel):
     action: str  # start, pause, resume, stop
 
 
+# ============== Serialization ==============
+
+def dumps_text(message: dict) -> str:
+    """Serialize a message to a JSON text frame, with orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(message, separators=(",", ":"))
+
+
 # ============== Game Session ==============
 
 class GameSession:
@@ -38,24 +56,50 @@ class GameSession:
         self.config = config
         self.status = "created"
         
-        env_config = CombatConfig(team_size=config.team_size, max_steps=config.time_limit * 10)
+        self.observations = None
+        self.connections: List[WebSocket] = []
+        self.running = False
+        self.paused = False
+        # Set once the game loop has stopped and sent its last messages; websocket
+        # handlers wait on it instead of polling
+        self.finished_event = asyncio.Event()
+        
+        self._build()
+    
+    def _build(self):
+        env_config = CombatConfig(team_size=self.config.team_size, max_steps=self.config.time_limit * 10)
         self.env = CombatEnv(config=env_config)
         
         obs_dim = self.env.obs_dim
-        state_dim = obs_dim * config.team_size * 2
-        
-        self.agent = MAPPOAgent(obs_dim=obs_dim, state_dim=state_dim, n_agents=config.team_size * 2)
+        state_dim = obs_dim * self.config.team_size * 2
         
-        self.observations = None
-        self.connections: List[WebSocket] = []
+        self.agent = MAPPOAgent(obs_dim=obs_dim, state_dim=state_dim, n_agents=self.config.team_size * 2)
+    
+    def finish(self):
+        """Mark the game over; the loop sets ``finished_event`` after broadcasting ``game_end``."""
         self.running = False
-        self.paused = False
+        self.status = "finished"
+    
+    def stop(self, status: Optional[str] = None):
+        self.running = False
+        if status is not None:
+            self.status = status
+        self.finished_event.set()
+    
+    def close(self):
+        """Release resources held by the session; nothing to do in-process."""
     
     def reset(self):
         self.observations, _ = self.env.reset()
         self.status = "ready"
     
-    async def run_step(self) -> dict:
+    def info(self) -> dict:
+        return self.env._get_info()
+    
+    async def fetch_info(self) -> dict:
+        return self.info()
+    
+    def step(self) -> dict:
         if self.observations is None:
             self.reset()
         
@@ -63,19 +107,97 @@ class GameSession:
         self.observations, _, terminated, truncated, info = self.env.step(actions)
         
         if all(terminated.values()) or all(truncated.values()):
-            self.status = "finished"
-            self.running = False
+            self.finish()
         
         return self.env.get_state_for_render()
     
+    async def run_step(self) -> dict:
+        return self.step()
+    
     async def broadcast(self, message: dict):
+        # Serialize once and send the same text frame to every viewer
+        payload = dumps_text(message)
         for ws in self.connections:
             try:
-                await ws.send_json(message)
+                await ws.send_text(payload)
             except:
                 pass
 
 
+def _game_worker(conn, config: dict):
+    """Worker-process side of GameSessionProxy: owns one GameSession and steps it on request."""
+    session = GameSession("worker", GameCreateRequest(**config))
+    session.reset()
+    conn.send(session.info())
+    while conn.recv() is not None:
+        state = session.step()
+        conn.send((state, session.info(), session.status == "finished"))
+    conn.close()
+
+
+class GameSessionProxy(GameSession):
+    """GameSession whose env and agent run in a dedicated worker process.
+    
+    Control state (running/paused/status) and websocket fanout stay in the API
+    process; each step is one pipe round trip awaited off the event loop, so
+    CPU-bound physics and inference of concurrent games run on separate cores.
+    """
+    
+    def _build(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_game_worker, args=(child_conn, self.config.model_dump()),
+                                    daemon=True)
+        self._process.start()
+        child_conn.close()
+        # Serializes pipe round trips issued from worker threads
+        self._lock = threading.Lock()
+        self._info: Optional[dict] = None
+    
+    def close(self):
+        """Stop the worker; blocks, so async callers run it via ``asyncio.to_thread``."""
+        # Waits for an in-flight step round trip before touching the pipe
+        with self._lock:
+            if self._process.is_alive():
+                try:
+                    self._conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+                self._process.join(timeout=1.0)
+                if self._process.is_alive():
+                    self._process.terminate()
+            self._conn.close()
+    
+    def reset(self):
+        # The worker resets its env on startup
+        self.status = "ready"
+    
+    def info(self) -> dict:
+        with self._lock:
+            if self._info is None:
+                self._info = self._conn.recv()
+            return self._info
+    
+    async def fetch_info(self) -> dict:
+        return await asyncio.to_thread(self.info)
+    
+    def _request_step(self):
+        self.info()
+        with self._lock:
+            self._conn.send("step")
+            state, self._info, finished = self._conn.recv()
+        return state, finished
+    
+    def step(self) -> dict:
+        state, finished = self._request_step()
+        if finished:
+            self.finish()
+        return state
+    
+    async def run_step(self) -> dict:
+        return await asyncio.to_thread(self.step)
+
+
 # ============== Global State ==============
 
 games: Dict[str, GameSession] = {}
@@ -83,7 +205,10 @@ games: Dict[str, GameSession] = {}
 
 # ============== Create App ==============
 
-def create_app() -> FastAPI:
+def create_app(game_processes: bool = False) -> FastAPI:
+    """Build the API app; with ``game_processes`` each game steps in its own worker process."""
+    session_cls = GameSessionProxy if game_processes else GameSession
+    
     app = FastAPI(title="SkyBattle API", version="1.0.0")
     
     app.add_middleware(
@@ -97,7 +222,7 @@ def create_app() -> FastAPI:
     @app.post("/api/v1/games", response_model=GameResponse)
     async def create_game(request: GameCreateRequest):
         game_id = f"game_{uuid.uuid4().hex[:8]}"
-        session = GameSession(game_id, request)
+        session = session_cls(game_id, request)
         session.reset()
         games[game_id] = session
         return GameResponse(game_id=game_id, status="created", websocket_url=f"/ws/game/{game_id}")
@@ -107,7 +232,7 @@ def create_app() -> FastAPI:
         if game_id not in games:
             raise HTTPException(status_code=404, detail="Game not found")
         session = games[game_id]
-        info = session.env._get_info()
+        info = await session.fetch_info()
         return {"game_id": game_id, "status": session.status, **info}
     
     @app.post("/api/v1/games/{game_id}/control")
@@ -120,6 +245,7 @@ def create_app() -> FastAPI:
             session.running = True
             session.paused = False
             session.status = "running"
+            session.finished_event.clear()
             asyncio.create_task(_run_game_loop(session))
         elif request.action == "pause":
             session.paused = True
@@ -128,8 +254,7 @@ def create_app() -> FastAPI:
             session.paused = False
             session.status = "running"
         elif request.action == "stop":
-            session.running = False
-            session.status = "stopped"
+            session.stop("stopped")
         
         return {"status": "ok", "game_status": session.status}
     
@@ -137,8 +262,8 @@ def create_app() -> FastAPI:
     async def delete_game(game_id: str):
         if game_id not in games:
             raise HTTPException(status_code=404, detail="Game not found")
-        games[game_id].running = False
-        del games[game_id]
+        games[game_id].stop()
+        await asyncio.to_thread(games.pop(game_id).close)
         return {"status": "deleted"}
     
     @app.websocket("/ws/game/{game_id}")
@@ -151,14 +276,18 @@ def create_app() -> FastAPI:
         await websocket.accept()
         session.connections.append(websocket)
         
+        # Wait for the game to end or the client to leave, whichever comes first
+        finished = asyncio.create_task(session.finished_event.wait())
+        disconnected = asyncio.create_task(_wait_disconnect(websocket))
         try:
-            while True:
-                await asyncio.sleep(0.1)
-                if not session.running:
-                    break
+            done, _ = await asyncio.wait({finished, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if finished in done:
+                await websocket.close()
         except WebSocketDisconnect:
             pass
         finally:
+            finished.cancel()
+            disconnected.cancel()
             if websocket in session.connections:
                 session.connections.remove(websocket)
     
@@ -169,6 +298,12 @@ def create_app() -> FastAPI:
     return app
 
 
+async def _wait_disconnect(websocket: WebSocket):
+    """Discard client messages until the client disconnects."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
 async def _run_game_loop(session: GameSession):
     fps, frame_time = 10, 0.1
     
@@ -181,7 +316,8 @@ async def _run_game_loop(session: GameSession):
         await session.broadcast({"type": "game_state", "data": state})
         
         if session.status == "finished":
-            await session.broadcast({"type": "game_end", "data": session.env._get_info()})
+            await session.broadcast({"type": "game_end", "data": await session.fetch_info()})
+            session.finished_event.set()
             break
         
         await asyncio.sleep(frame_time)
@@ -190,5 +326,11 @@ async def _run_game_loop(session: GameSession):
 app = create_app()
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    parser = argparse.ArgumentParser(description="SkyBattle API server")
+    parser.add_argument("--game-processes", action="store_true",
+                        help="run each game's env and agent in its own worker process")
+    args = parser.parse_args()
+    uvicorn.run(create_app(game_processes=args.game_processes), host="0.0.0.0", port=8000)
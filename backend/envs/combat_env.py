@@ -2,12 +2,62 @@
 
 import gymnasium as gym
 from gymnasium import spaces
+import math
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 
 from .drone import Drone, DroneAction
 from .weapons import Bullet, MissileProjectile, Flare
+from ..utils.jit import njit, HAS_NUMBA
+
+# Team codes used by the structure-of-arrays state (index into this tuple)
+TEAMS = ("red", "blue")
+
+# Gun spread jitter is pre-sampled in blocks of this many shots
+SPREAD_POOL_SIZE = 1024
+
+
+@njit(cache=True, fastmath=True)
+def _projectile_kernel(pos, vel, lifetime, target_pos, homing, tracking, dt):
+    """Advance [P, 3] projectile arrays one step in place; ``homing`` rows steer first.
+    
+    Same steering rule as ``MissileProjectile.update_tracking``, as scalar loops
+    compiled by Numba.
+    """
+    for i in range(pos.shape[0]):
+        if homing[i]:
+            tx = target_pos[i, 0] - pos[i, 0]
+            ty = target_pos[i, 1] - pos[i, 1]
+            tz = target_pos[i, 2] - pos[i, 2]
+            dist = math.sqrt(tx * tx + ty * ty + tz * tz)
+            speed = math.sqrt(vel[i, 0] ** 2 + vel[i, 1] ** 2 + vel[i, 2] ** 2)
+            if dist >= 1e-6 and speed >= 1e-6:
+                k = tracking[i] * dt
+                nx = vel[i, 0] / speed * (1 - k) + tx / dist * k
+                ny = vel[i, 1] / speed * (1 - k) + ty / dist * k
+                nz = vel[i, 2] / speed * (1 - k) + tz / dist * k
+                scale = speed / math.sqrt(nx * nx + ny * ny + nz * nz)
+                vel[i, 0], vel[i, 1], vel[i, 2] = nx * scale, ny * scale, nz * scale
+        for c in range(3):
+            pos[i, c] += vel[i, c] * dt
+        lifetime[i] -= dt
+
+
+def _projectile_numpy(pos, vel, lifetime, target_pos, homing, tracking, dt):
+    """NumPy fallback for ``_projectile_kernel``."""
+    rows = np.flatnonzero(homing)
+    if len(rows):
+        to_target = target_pos[rows] - pos[rows]
+        dist = np.sqrt((to_target ** 2).sum(-1, keepdims=True))
+        speed = np.sqrt((vel[rows] ** 2).sum(-1, keepdims=True))
+        ok = ((dist >= 1e-6) & (speed >= 1e-6))[:, 0]
+        rows, to_target, dist, speed = rows[ok], to_target[ok], dist[ok], speed[ok]
+        k = tracking[rows, None] * dt
+        new_dir = vel[rows] / speed * (1 - k) + to_target / dist * k
+        vel[rows] = new_dir / np.sqrt((new_dir ** 2).sum(-1, keepdims=True)) * speed
+    pos += vel * dt
+    lifetime -= dt
 
 
 @dataclass
@@ -45,6 +95,17 @@ class CombatEnv(gym.Env):
         self.obs_dim = 13 + self.config.team_size * 10 + (self.config.team_size - 1) * 8 + 6
         self.n_agents = self.config.team_size * 2
         
+        # Column offsets of the observation sub-blocks (self, enemies, allies, environment)
+        enemy_start = 13
+        ally_start = enemy_start + self.config.team_size * 10
+        env_start = ally_start + (self.config.team_size - 1) * 8
+        self._obs_blocks = {
+            "self": slice(0, enemy_start),
+            "enemies": slice(enemy_start, ally_start),
+            "allies": slice(ally_start, env_start),
+            "env": slice(env_start, self.obs_dim),
+        }
+        
         # Action/observation spaces
         self.action_space = spaces.Dict({
             "discrete": spaces.Discrete(5),
@@ -58,6 +119,23 @@ class CombatEnv(gym.Env):
         self.flares: List[Flare] = []
         self.step_count = 0
         self.wind = np.zeros(3, dtype=np.float32)
+        self._soa: Optional[Dict[str, Any]] = None
+        self._spread_pool = np.zeros((0, 3))
+        self._spread_idx = 0
+        self._bind_drones()
+    
+    def _bind_drones(self):
+        """Index drones in ``self.drones`` order: int8 team codes into ``TEAMS`` and a shared alive bitset.
+        
+        Each drone's ``is_alive`` reads and writes its slot of ``self._alive``, so kills
+        show up in the bitset without rescanning the drones.
+        """
+        drones = list(self.drones.values())
+        self._team_id = np.array([TEAMS.index(d.team) for d in drones], dtype=np.int8)
+        self._team_idx = tuple(np.flatnonzero(self._team_id == code) for code in range(len(TEAMS)))
+        self._alive = np.ones(len(drones), dtype=bool)
+        for i, drone in enumerate(drones):
+            drone.bind_alive(self._alive, i)
     
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
         super().reset(seed=seed)
@@ -82,10 +160,15 @@ class CombatEnv(gym.Env):
             pos = np.array([spawn_offset, (i - self.config.team_size / 2) * 50, height], dtype=np.float32)
             ori = np.array([0.0, 0.0, np.pi], dtype=np.float32)
             self.drones[drone_id] = Drone(drone_id, "blue", pos, ori)
+        self._bind_drones()
         
         if self.np_random:
             self.wind = self.np_random.uniform(-5, 5, 3).astype(np.float32)
         
+        self._soa = None
+        self._spread_pool = np.zeros((0, 3))
+        self._spread_idx = 0
+        
         return self._get_observations(), self._get_info()
     
     def step(self, actions: Dict[str, Dict[str, Any]]):
@@ -136,55 +219,89 @@ class CombatEnv(gym.Env):
         return self._get_observations(), rewards, terminated, truncated, self._get_info()
     
     def _get_observations(self) -> Dict[str, np.ndarray]:
-        return {drone_id: self._get_obs(drone) for drone_id, drone in self.drones.items()}
-    
-    def _get_obs(self, drone: Drone) -> np.ndarray:
-        parts = []
+        """Build every drone's observation at once into one (n_agents, obs_dim) array.
+        
+        Layout per row: self state (13), nearest alive enemies (team_size x 10),
+        nearest alive allies ((team_size - 1) x 8), environment (6); missing
+        neighbours are zero-padded. Each block is written in place through views
+        of the output (see ``_obs_blocks``); the returned dict holds row views of
+        a freshly allocated array.
+        """
+        drones = list(self.drones.values())
+        n, k = len(drones), self.config.team_size
+        pos = np.array([d.position for d in drones], dtype=np.float32).reshape(n, 3)
+        vel = np.array([d.velocity for d in drones], dtype=np.float32).reshape(n, 3)
+        ori = np.array([d.orientation for d in drones], dtype=np.float32).reshape(n, 3)
+        stats = np.array([(d.hp, d.shield, d.energy, d.ammo) for d in drones], dtype=np.float64).reshape(n, 4)
+        team, alive = self._team_id, self._alive
+        
+        obs = np.zeros((n, self.obs_dim), dtype=np.float32)
+        blocks = self._obs_blocks
         
         # Self state (13)
-        parts.append(np.concatenate([
-            drone.position / 500.0, drone.velocity / 200.0, drone.orientation / np.pi,
-            [drone.hp / 100.0, drone.shield / 50.0, drone.energy / 100.0, drone.ammo / 500.0],
-        ]))
-        
-        # Enemies (team_size * 10)
-        enemies = sorted([d for d in self.drones.values() if d.team != drone.team and d.is_alive],
-                        key=lambda e: drone.distance_to(e))[:self.config.team_size]
-        for i in range(self.config.team_size):
-            if i < len(enemies):
-                e = enemies[i]
-                parts.append(np.array([
-                    *(e.position - drone.position) / 500.0, *(e.velocity - drone.velocity) / 200.0,
-                    drone.distance_to(e) / 1000.0, drone.angle_to(e) / np.pi, e.hp / 100.0, 0.0,
-                ], dtype=np.float32))
-            else:
-                parts.append(np.zeros(10, dtype=np.float32))
+        own = obs[:, blocks["self"]]
+        np.divide(pos, 500.0, out=own[:, 0:3])
+        np.divide(vel, 200.0, out=own[:, 3:6])
+        np.divide(ori, np.pi, out=own[:, 6:9])
+        np.divide(stats, (100.0, 50.0, 100.0, 500.0), out=own[:, 9:13], casting="same_kind")
+        
+        # Pairwise geometry: rel[i, j] is drone j relative to drone i
+        rel_pos = pos[None, :, :] - pos[:, None, :]
+        rel_vel = vel[None, :, :] - vel[:, None, :]
+        dist = np.sqrt((rel_pos.astype(np.float64) ** 2).sum(-1))
+        rows = np.arange(n)[:, None]
+        
+        # Enemies (team_size * 10), nearest first; stable sort keeps dict order on ties
+        enemy_mask = (team[None, :] != team[:, None]) & alive[None, :]
+        order = np.argsort(np.where(enemy_mask, dist, np.inf), axis=1, kind="stable")[:, :k]
+        valid = enemy_mask[rows, order]
+        forward = np.stack([np.cos(ori[:, 1]) * np.cos(ori[:, 2]), np.cos(ori[:, 1]) * np.sin(ori[:, 2]),
+                            np.sin(ori[:, 1])], axis=-1).astype(np.float32)
+        e_dist = dist[rows, order]
+        e_rel = rel_pos[rows, order]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos = np.einsum("ic,ijc->ij", forward, e_rel / e_dist[..., None].astype(np.float32))
+        angle = np.where(e_dist < 1e-6, 0.0, np.arccos(np.clip(cos, -1, 1)))
+        enemies = obs[:, blocks["enemies"]].reshape(n, k, 10)
+        np.divide(e_rel, 500.0, out=enemies[..., 0:3])
+        np.divide(rel_vel[rows, order], 200.0, out=enemies[..., 3:6])
+        np.divide(e_dist, 1000.0, out=enemies[..., 6], casting="same_kind")
+        np.divide(angle, np.pi, out=enemies[..., 7], casting="same_kind")
+        np.divide(stats[order, 0], 100.0, out=enemies[..., 8], casting="same_kind")
+        enemies[~valid] = 0.0
         
         # Allies ((team_size-1) * 8)
-        allies = sorted([d for d in self.drones.values() if d.team == drone.team and d.id != drone.id and d.is_alive],
-                       key=lambda a: drone.distance_to(a))[:self.config.team_size - 1]
-        for i in range(self.config.team_size - 1):
-            if i < len(allies):
-                a = allies[i]
-                parts.append(np.array([
-                    *(a.position - drone.position) / 500.0, *(a.velocity - drone.velocity) / 200.0,
-                    a.hp / 100.0, 1.0,
-                ], dtype=np.float32))
-            else:
-                parts.append(np.zeros(8, dtype=np.float32))
+        if k > 1:
+            ally_mask = (team[None, :] == team[:, None]) & alive[None, :] & ~np.eye(n, dtype=bool)
+            order = np.argsort(np.where(ally_mask, dist, np.inf), axis=1, kind="stable")[:, :k - 1]
+            valid = ally_mask[rows, order]
+            allies = obs[:, blocks["allies"]].reshape(n, k - 1, 8)
+            np.divide(rel_pos[rows, order], 500.0, out=allies[..., 0:3])
+            np.divide(rel_vel[rows, order], 200.0, out=allies[..., 3:6])
+            np.divide(stats[order, 0], 100.0, out=allies[..., 6], casting="same_kind")
+            allies[..., 7] = 1.0
+            allies[~valid] = 0.0
         
         # Environment (6)
         bounds = self.config.map_bounds
-        parts.append(np.concatenate([
-            self.wind / 10.0,
-            [(drone.position[i] - bounds[0]) / (bounds[1] - bounds[0]) for i in range(3)],
-        ]))
+        env = obs[:, blocks["env"]]
+        np.divide(self.wind, 10.0, out=env[:, 0:3])
+        np.divide(pos - bounds[0], bounds[1] - bounds[0], out=env[:, 3:6], casting="same_kind")
         
-        return np.concatenate(parts).astype(np.float32)
+        return {d.id: obs[i] for i, d in enumerate(drones)}
+    
+    def _next_spread(self) -> np.ndarray:
+        """Next gun spread jitter, drawn from the seeded env RNG a block at a time."""
+        if self._spread_idx >= len(self._spread_pool):
+            self._spread_pool = self.np_random.uniform(-0.08, 0.08, (SPREAD_POOL_SIZE, 3))
+            self._spread_idx = 0
+        jitter = self._spread_pool[self._spread_idx]
+        self._spread_idx += 1
+        return jitter
     
     def _fire_gun(self, drone: Drone):
-        direction = drone.get_forward() + np.random.uniform(-0.08, 0.08, 3)  # 更大散布
-        direction = direction / np.linalg.norm(direction)
+        direction = drone.get_forward() + self._next_spread()  # 更大散布
+        direction = direction / math.hypot(*direction.tolist())
         self.projectiles.append(Bullet(
             id=f"bullet_{len(self.projectiles)}", owner_id=drone.id, owner_team=drone.team,
             position=drone.position.copy() + direction * 5, velocity=direction * 600.0 + drone.velocity,
@@ -192,8 +309,12 @@ class CombatEnv(gym.Env):
         ))
     
     def _fire_missile(self, drone: Drone):
-        enemies = [d for d in self.drones.values() if d.team != drone.team and d.is_alive]
-        target = min(enemies, key=lambda e: drone.distance_to(e)) if enemies else None
+        candidates = (self._team_id != TEAMS.index(drone.team)) & self._alive
+        enemies = [d for d, ok in zip(self.drones.values(), candidates) if ok]
+        target = None
+        if enemies:
+            dists = np.linalg.norm(np.array([e.position for e in enemies]) - drone.position, axis=1)
+            target = enemies[int(np.argmin(dists))]
         direction = drone.get_forward()
         self.projectiles.append(MissileProjectile(
             id=f"missile_{len(self.projectiles)}", owner_id=drone.id, owner_team=drone.team,
@@ -202,72 +323,124 @@ class CombatEnv(gym.Env):
         ))
     
     def _update_projectiles(self, dt: float):
-        active = []
-        for proj in self.projectiles:
-            if isinstance(proj, MissileProjectile) and proj.target_id:
-                target = self.drones.get(proj.target_id)
-                distracted = any(f.can_distract(proj) for f in self.flares)
-                if distracted:
+        """Steer homing missiles and integrate every projectile in one array pass.
+        
+        Projectiles are gathered into [P, 3] arrays, advanced by the Numba kernel
+        (or its NumPy fallback), and survivors get row views of the results back.
+        """
+        projs = self.projectiles
+        if not projs:
+            return
+        n = len(projs)
+        pos = np.array([p.position for p in projs], dtype=np.float64).reshape(n, 3)
+        vel = np.array([p.velocity for p in projs], dtype=np.float64).reshape(n, 3)
+        lifetime = np.array([p.lifetime for p in projs], dtype=np.float64)
+        target_pos = np.zeros((n, 3))
+        homing = np.zeros(n, dtype=bool)
+        tracking = np.zeros(n)
+        
+        missiles = [i for i, p in enumerate(projs) if isinstance(p, MissileProjectile) and p.target_id]
+        if missiles:
+            distracted = np.zeros(len(missiles), dtype=bool)
+            if self.flares:
+                flare_pos = np.array([f.position for f in self.flares], dtype=np.float64).reshape(-1, 3)
+                radius = np.array([f.radius for f in self.flares])
+                dist = np.sqrt(((pos[missiles][:, None, :] - flare_pos[None, :, :]) ** 2).sum(-1))
+                distracted = (dist < radius[None, :]).any(axis=1)
+            for i, lost in zip(missiles, distracted):
+                proj = projs[i]
+                if lost:
                     proj.target_id = None
-                elif target and target.is_alive:
-                    proj.update_tracking(target.position, dt)
-            if proj.update(dt):
-                active.append(proj)
+                    continue
+                target = self.drones.get(proj.target_id)
+                if target and target.is_alive:
+                    homing[i] = True
+                    target_pos[i] = target.position
+                    tracking[i] = proj.tracking
+        
+        step = _projectile_kernel if HAS_NUMBA else _projectile_numpy
+        step(pos, vel, lifetime, target_pos, homing, tracking, dt)
+        
+        active = []
+        for i in np.flatnonzero(lifetime > 0):
+            proj = projs[i]
+            proj.position, proj.velocity, proj.lifetime = pos[i], vel[i], float(lifetime[i])
+            active.append(proj)
         self.projectiles = active
     
     def _check_collisions(self) -> List[dict]:
+        """Resolve projectile hits against a broadcast (projectiles x drones) distance test.
+        
+        Each projectile hits the first drone, in ``self.drones`` order, that is alive,
+        on the other team and within its hit radius; only candidate pairs are visited
+        in Python, so drones killed earlier in the same step are still skipped.
+        """
+        if not self.projectiles:
+            return []
         events = []
-        remaining = []
+        cfg = self.config
+        drones = list(self.drones.values())
         
-        for proj in self.projectiles:
-            hit = False
-            hit_radius = self.config.missile_hit_radius if isinstance(proj, MissileProjectile) else self.config.bullet_hit_radius
-            
-            for drone in self.drones.values():
-                if not drone.is_alive or drone.team == proj.owner_team:
+        proj_pos = np.array([p.position for p in self.projectiles], dtype=np.float64).reshape(-1, 3)
+        drone_pos = np.array([d.position for d in drones], dtype=np.float64).reshape(-1, 3)
+        radius = np.array([cfg.missile_hit_radius if isinstance(p, MissileProjectile) else cfg.bullet_hit_radius
+                           for p in self.projectiles])
+        proj_team = np.array([TEAMS.index(p.owner_team) for p in self.projectiles], dtype=np.int8)
+        
+        d2 = ((proj_pos[:, None, :] - drone_pos[None, :, :]) ** 2).sum(-1)
+        candidates = ((d2 < (radius ** 2)[:, None]) & self._alive[None, :]
+                      & (self._team_id[None, :] != proj_team[:, None]))
+        keep = np.ones(len(self.projectiles), dtype=bool)
+        
+        for i in np.flatnonzero(candidates.any(axis=1)):
+            proj = self.projectiles[i]
+            for j in np.flatnonzero(candidates[i]):
+                drone = drones[j]
+                if not drone.is_alive:
                     continue
-                if np.linalg.norm(proj.position - drone.position) < hit_radius:
-                    killed = drone.take_damage(proj.damage)
-                    attacker = self.drones.get(proj.owner_id)
-                    if attacker:
-                        attacker.damage_dealt += proj.damage
-                        if killed:
-                            attacker.kills += 1
-                    events.append({"type": "kill" if killed else "hit", "attacker": proj.owner_id,
-                                  "target": drone.id, "damage": proj.damage})
-                    hit = True
-                    break
-            if not hit:
-                remaining.append(proj)
-        
-        self.projectiles = remaining
+                killed = drone.take_damage(proj.damage)
+                attacker = self.drones.get(proj.owner_id)
+                if attacker:
+                    attacker.damage_dealt += proj.damage
+                    if killed:
+                        attacker.kills += 1
+                events.append({"type": "kill" if killed else "hit", "attacker": proj.owner_id,
+                              "target": drone.id, "damage": proj.damage})
+                keep[i] = False
+                break
+        
+        self.projectiles = [p for p, k in zip(self.projectiles, keep) if k]
         return events
     
     def _check_boundaries(self):
+        """Clamp drones to the map box, bouncing at half speed; hitting the ground costs 5 HP.
+        
+        One array comparison finds the out-of-bounds axes; only those drones are touched.
+        """
+        drones = [d for d, alive in zip(self.drones.values(), self._alive) if alive]
+        if not drones:
+            return
         bounds = self.config.map_bounds
         height = self.config.map_height
+        lo = np.array([bounds[0], bounds[0], height[0]])
+        hi = np.array([bounds[1], bounds[1], height[1]])
+        pos = np.array([d.position for d in drones], dtype=np.float64).reshape(-1, 3)
+        below, above = pos < lo, pos > hi
         
-        for drone in self.drones.values():
-            if not drone.is_alive:
-                continue
-            for i in range(2):
-                if drone.position[i] < bounds[0]:
-                    drone.position[i] = bounds[0]
-                    drone.velocity[i] = abs(drone.velocity[i]) * 0.5
-                elif drone.position[i] > bounds[1]:
-                    drone.position[i] = bounds[1]
-                    drone.velocity[i] = -abs(drone.velocity[i]) * 0.5
-            if drone.position[2] < height[0]:
-                drone.position[2] = height[0]
-                drone.velocity[2] = abs(drone.velocity[2]) * 0.5
+        for j in np.flatnonzero((below | above).any(axis=1)):
+            drone = drones[j]
+            for i in np.flatnonzero(below[j]):
+                drone.position[i] = lo[i]
+                drone.velocity[i] = abs(drone.velocity[i]) * 0.5
+            for i in np.flatnonzero(above[j]):
+                drone.position[i] = hi[i]
+                drone.velocity[i] = -abs(drone.velocity[i]) * 0.5
+            if below[j, 2]:
                 drone.take_damage(5.0)
-            elif drone.position[2] > height[1]:
-                drone.position[2] = height[1]
-                drone.velocity[2] = -abs(drone.velocity[2]) * 0.5
     
     def _compute_rewards(self, events: List[dict]) -> Dict[str, float]:
         cfg = self.config
-        rewards = {d: cfg.survival_reward if self.drones[d].is_alive else 0.0 for d in self.drones}
+        rewards = {d: cfg.survival_reward if alive else 0.0 for d, alive in zip(self.drones, self._alive)}
         
         for event in events:
             attacker, target = event.get("attacker"), event.get("target")
@@ -284,8 +457,8 @@ class CombatEnv(gym.Env):
         return rewards
     
     def _check_done(self):
-        red_alive = any(d.is_alive for d in self.drones.values() if d.team == "red")
-        blue_alive = any(d.is_alive for d in self.drones.values() if d.team == "blue")
+        red_idx, blue_idx = self._team_idx
+        red_alive, blue_alive = self._alive[red_idx].any(), self._alive[blue_idx].any()
         
         terminated = {d: not red_alive or not blue_alive for d in self.drones}
         truncated = {d: self.step_count >= self.config.max_steps for d in self.drones}
@@ -293,22 +466,63 @@ class CombatEnv(gym.Env):
         return terminated, truncated
     
     def _get_info(self) -> dict:
-        red_alive = sum(1 for d in self.drones.values() if d.team == "red" and d.is_alive)
-        blue_alive = sum(1 for d in self.drones.values() if d.team == "blue" and d.is_alive)
+        red_idx, blue_idx = self._team_idx
+        red_alive, blue_alive = int(self._alive[red_idx].sum()), int(self._alive[blue_idx].sum())
         return {
             "step": self.step_count, "red_alive": red_alive, "blue_alive": blue_alive,
             "winner": "red" if blue_alive == 0 and red_alive > 0 else "blue" if red_alive == 0 and blue_alive > 0 else None,
         }
     
     def get_state_for_render(self) -> dict:
+        # One stacked tolist() per frame instead of three per drone and one per projectile
+        drones = list(self.drones.values())
+        kinematics = np.array([(d.position, d.velocity, d.orientation) for d in drones],
+                              dtype=np.float64).reshape(len(drones), 3, 3).tolist()
+        proj_pos = np.array([p.position for p in self.projectiles], dtype=np.float64).reshape(-1, 3).tolist()
         return {
             "step": self.step_count,
-            "drones": [{"id": d.id, "team": d.team, "position": d.position.tolist(),
-                       "velocity": d.velocity.tolist(), "orientation": d.orientation.tolist(),
-                       "hp": d.hp, "shield": d.shield, "is_alive": d.is_alive} for d in self.drones.values()],
-            "projectiles": [{"id": p.id, "position": p.position.tolist()} for p in self.projectiles],
+            "drones": [{"id": d.id, "team": d.team, "position": pos, "velocity": vel, "orientation": ori,
+                        "hp": d.hp, "shield": d.shield, "is_alive": d.is_alive}
+                       for d, (pos, vel, ori) in zip(drones, kinematics)],
+            "projectiles": [{"id": p.id, "position": pos} for p, pos in zip(self.projectiles, proj_pos)],
         }
     
+    def get_state_soa(self) -> Dict[str, Any]:
+        """Structure-of-arrays snapshot of the drones and projectiles.
+        
+        Drone arrays are float32 (bool for ``alive``, int8 team codes into
+        ``TEAMS``), ordered like ``get_state_for_render()["drones"]``. They are
+        allocated once per episode and overwritten in place on every call, so
+        copy them to keep a snapshot across steps.
+        """
+        n = len(self.drones)
+        soa = self._soa
+        if soa is None or len(soa["ids"]) != n:
+            soa = self._soa = {
+                "ids": list(self.drones),
+                "team": self._team_id.copy(),
+                "pos": np.zeros((n, 3), dtype=np.float32),
+                "vel": np.zeros((n, 3), dtype=np.float32),
+                "ori": np.zeros((n, 3), dtype=np.float32),
+                "hp": np.zeros(n, dtype=np.float32),
+                "shield": np.zeros(n, dtype=np.float32),
+                "alive": np.zeros(n, dtype=bool),
+            }
+        
+        pos, vel, ori = soa["pos"], soa["vel"], soa["ori"]
+        hp, shield, alive = soa["hp"], soa["shield"], soa["alive"]
+        for i, d in enumerate(self.drones.values()):
+            pos[i] = d.position
+            vel[i] = d.velocity
+            ori[i] = d.orientation
+            hp[i] = d.hp
+            shield[i] = d.shield
+        alive[:] = self._alive
+        soa["step"] = self.step_count
+        soa["projectiles"] = np.array([p.position for p in self.projectiles],
+                                      dtype=np.float32).reshape(-1, 3)
+        return soa
+    
     def render(self):
         if self.render_mode == "human":
             info = self._get_info()
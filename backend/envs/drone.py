@@ -1,6 +1,7 @@
 """Drone model with physics and state management."""
 
 from dataclasses import dataclass
+import math
 from typing import Optional
 import numpy as np
 
@@ -72,7 +73,8 @@ class Drone:
         self.energy = self.MAX_ENERGY
         self.ammo = self.MAX_AMMO
         self.missiles = self.MAX_MISSILES
-        self.is_alive = True
+        self._alive_flags = np.ones(1, dtype=bool)
+        self._alive_index = 0
         self.is_boosting = False
         
         self.damage_dealt = 0.0
@@ -82,6 +84,19 @@ class Drone:
         self.missile_cooldown = 0.0
         self.flare_cooldown = 0.0
     
+    @property
+    def is_alive(self) -> bool:
+        return bool(self._alive_flags[self._alive_index])
+    
+    @is_alive.setter
+    def is_alive(self, value: bool):
+        self._alive_flags[self._alive_index] = value
+    
+    def bind_alive(self, flags: np.ndarray, index: int):
+        """Keep this drone's alive flag in ``flags[index]`` (e.g. the env's alive bitset)."""
+        flags[index] = self.is_alive
+        self._alive_flags, self._alive_index = flags, index
+    
     def reset(self, position: np.ndarray, orientation: np.ndarray):
         self.position = position.copy()
         self.velocity = np.zeros(3, dtype=np.float32)
@@ -159,12 +174,12 @@ class Drone:
         acceleration = forward * accel_mag
         
         # Drag
-        speed = np.linalg.norm(self.velocity)
+        speed = math.hypot(*self.velocity.tolist())
         if speed > 0:
             acceleration -= self.DRAG * speed * self.velocity
         
         self.velocity += acceleration * dt
-        speed = np.linalg.norm(self.velocity)
+        speed = math.hypot(*self.velocity.tolist())
         if speed > self.MAX_SPEED:
             self.velocity = self.velocity / speed * self.MAX_SPEED
         
@@ -203,11 +218,11 @@ class Drone:
         return np.array([np.cos(pitch) * np.cos(yaw), np.cos(pitch) * np.sin(yaw), np.sin(pitch)], dtype=np.float32)
     
     def distance_to(self, other: "Drone") -> float:
-        return float(np.linalg.norm(self.position - other.position))
+        return math.dist(self.position.tolist(), other.position.tolist())
     
     def angle_to(self, other: "Drone") -> float:
         to_other = other.position - self.position
-        dist = np.linalg.norm(to_other)
+        dist = math.hypot(*to_other.tolist())
         if dist < 1e-6:
             return 0.0
         dot = np.clip(np.dot(self.get_forward(), to_other / dist), -1, 1)
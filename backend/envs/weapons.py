@@ -1,6 +1,7 @@
 """Weapon systems for drones."""
 
 from dataclasses import dataclass
+import math
 from typing import Optional
 import numpy as np
 
@@ -39,18 +40,18 @@ class MissileProjectile(Projectile):
             return
         
         to_target = target_pos - self.position
-        dist = np.linalg.norm(to_target)
+        dist = math.hypot(*to_target.tolist())
         if dist < 1e-6:
             return
         
         desired = to_target / dist
-        speed = np.linalg.norm(self.velocity)
+        speed = math.hypot(*self.velocity.tolist())
         if speed < 1e-6:
             return
         
         current = self.velocity / speed
         new_dir = current * (1 - self.tracking * dt) + desired * self.tracking * dt
-        new_dir = new_dir / np.linalg.norm(new_dir)
+        new_dir = new_dir / math.hypot(*new_dir.tolist())
         self.velocity = new_dir * speed
 
 
@@ -69,4 +70,4 @@ class Flare:
         return self.lifetime > 0
     
     def can_distract(self, missile: MissileProjectile) -> bool:
-        return np.linalg.norm(missile.position - self.position) < self.radius
+        return math.dist(missile.position.tolist(), self.position.tolist()) < self.radius
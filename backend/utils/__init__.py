@@ -1,4 +1,5 @@
 """SkyBattle Utilities Package"""
 from .logger import TensorBoardLogger, ConsoleLogger
+from .jit import njit, HAS_NUMBA
 
-__all__ = ["TensorBoardLogger", "ConsoleLogger"]
+__all__ = ["TensorBoardLogger", "ConsoleLogger", "njit", "HAS_NUMBA"]
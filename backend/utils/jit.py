@@ -0,0 +1,16 @@
+"""Optional Numba JIT support."""
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    
+    def njit(*args, **kwargs):
+        """Fallback decorator: run the function as plain Python."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        
+        def decorator(func):
+            return func
+        return decorator
@@ -52,6 +52,24 @@ class TestActor:
         # Deterministic actions should be the same
         assert action1["discrete"].item() == action2["discrete"].item()
         torch.testing.assert_close(action1["continuous"], action2["continuous"])
+    
+    def test_evaluate_actions_matches_torch_distributions(self):
+        """Inline log-prob and entropy agree with torch.distributions."""
+        from torch.distributions import Categorical, Normal
+        actor = Actor(obs_dim=65)
+        with torch.no_grad():
+            actor.log_std.uniform_(-1, 0.5)
+        obs = torch.randn(32, 65)
+        disc = torch.randint(0, 5, (32,))
+        cont = torch.rand(32, 4) * 2 - 1
+        
+        with torch.no_grad():
+            log_prob, entropy = actor.evaluate_actions(obs, disc, cont)
+            logits, mean, std = actor(obs)
+        disc_dist, cont_dist = Categorical(logits=logits), Normal(mean, std)
+        
+        torch.testing.assert_close(log_prob, disc_dist.log_prob(disc) + cont_dist.log_prob(cont).sum(-1))
+        torch.testing.assert_close(entropy, disc_dist.entropy() + cont_dist.entropy().sum(-1))
 
 
 class TestCritic:
@@ -103,6 +121,63 @@ class TestMAPPOPolicy:
         value = policy.get_value(state)
         
         assert isinstance(value, float)
+    
+    def test_policy_act_batch_single_readback(self):
+        """The packed readback unpacks into integer actions, clamped continuous actions and log-probs."""
+        policy = MAPPOPolicy(obs_dim=65, state_dim=390, device="cpu")
+        obs = np.random.randn(6, 65).astype(np.float32)
+        
+        torch.manual_seed(0)
+        discrete, continuous, log_probs = policy.act_batch(obs)
+        torch.manual_seed(0)
+        action, log_prob = policy.actor.get_action(torch.from_numpy(obs))
+        
+        assert discrete.dtype == np.int64
+        np.testing.assert_array_equal(discrete, action["discrete"].numpy())
+        np.testing.assert_allclose(continuous, action["continuous"].detach().numpy(), rtol=1e-6)
+        np.testing.assert_allclose(log_probs, log_prob.detach().numpy(), rtol=1e-6)
+    
+    def test_actor_graph_capture_is_cuda_only(self):
+        """Off CUDA, graph capture is skipped and act_batch stays eager."""
+        policy = MAPPOPolicy(obs_dim=65, state_dim=390, device="cpu")
+        
+        assert policy.capture_actor_graph(6) is False
+        assert policy._actor_graph is None
+        assert policy.act_batch(np.random.randn(6, 65).astype(np.float32))[0].shape == (6,)
+    
+    @pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA graphs need a GPU")
+    def test_actor_graph_replay_matches_eager(self):
+        """Replaying the captured actor graph gives the eager actions, and tracks weight updates."""
+        policy = MAPPOPolicy(obs_dim=65, state_dim=390, device="cuda")
+        obs = np.random.randn(6, 65).astype(np.float32)
+        
+        eager = policy.act_batch(obs, deterministic=True)
+        assert policy.capture_actor_graph(6)
+        graphed = policy.act_batch(obs, deterministic=True)
+        with torch.no_grad():
+            policy.actor.log_std.add_(0.5)
+            policy.actor.continuous_mean[-2].bias.add_(0.1)
+        updated = policy.act_batch(obs, deterministic=True)
+        policy._actor_graph = None
+        
+        for got, want in zip(graphed, eager):
+            np.testing.assert_allclose(got, want, rtol=1e-3, atol=1e-3)
+        for got, want in zip(updated, policy.act_batch(obs, deterministic=True)):
+            np.testing.assert_allclose(got, want, rtol=1e-3, atol=1e-3)
+    
+    def test_policy_bf16_inference_keeps_fp32_outputs(self):
+        """Under BF16 autocast, log-probs, values and log_std stay FP32."""
+        policy = MAPPOPolicy(obs_dim=65, state_dim=390, device="cpu")
+        policy.use_bf16 = True  # CPU autocast supports BF16 too
+        
+        discrete, continuous, log_probs = policy.act_batch(np.random.randn(6, 65).astype(np.float32))
+        value = policy.get_value(np.random.randn(390).astype(np.float32))
+        
+        assert continuous.dtype == np.float32
+        assert log_probs.dtype == np.float32
+        assert np.all(np.isfinite(log_probs))
+        assert np.isfinite(value)
+        assert policy.actor.log_std.dtype == torch.float32
 
 
 class TestRolloutBuffer:
@@ -170,6 +245,106 @@ class TestRolloutBuffer:
         
         assert buffer.is_full()
 
+    
+    def test_buffer_add_writes_agent_columns(self):
+        """Plain ints and lists from act() land in each agent's column."""
+        buffer = RolloutBuffer(buffer_size=2, obs_dim=3, state_dim=5, n_agents=2, continuous_dim=2, device="cpu")
+        agent_ids = ["a0", "a1"]
+        observations = {"a0": np.full(3, 1.0, dtype=np.float32), "a1": np.full(3, 2.0, dtype=np.float32)}
+        actions = {"a0": {"discrete": 3, "continuous": [0.5, -0.5]}, "a1": {"discrete": 1, "continuous": [0.25, 0.0]}}
+        rewards = {"a0": 1.0, "a1": -1.0}
+        dones = {"a0": False, "a1": True}
+        log_probs = {"a0": -0.1, "a1": -0.2}
+        values = {"a0": 0.3, "a1": 0.4}
+        
+        buffer.add(observations, np.ones(5), actions, rewards, dones, log_probs, values, agent_ids)
+        
+        np.testing.assert_array_equal(buffer.observations[0], [[1, 1, 1], [2, 2, 2]])
+        np.testing.assert_array_equal(buffer.discrete_actions[0], [3, 1])
+        np.testing.assert_allclose(buffer.continuous_actions[0], [[0.5, -0.5], [0.25, 0.0]])
+        np.testing.assert_allclose(buffer.rewards[0], [1.0, -1.0])
+        np.testing.assert_array_equal(buffer.dones[0], [0.0, 1.0])
+        np.testing.assert_allclose(buffer.log_probs[0], [-0.1, -0.2])
+        np.testing.assert_allclose(buffer.values[0], [0.3, 0.4])
+    
+    @pytest.mark.parametrize("use_numba", [True, False])
+    def test_compute_advantages_matches_reference_gae(self, monkeypatch, use_numba):
+        """The GAE kernel and its NumPy fallback match a step-by-step reference."""
+        from backend.agents.mappo import buffer as buffer_module
+        monkeypatch.setattr(buffer_module, "HAS_NUMBA", use_numba and buffer_module.HAS_NUMBA)
+        buffer = RolloutBuffer(buffer_size=16, obs_dim=3, state_dim=5, n_agents=3, device="cpu")
+        rng = np.random.default_rng(0)
+        buffer.ptr = 12
+        buffer.rewards[:12] = rng.normal(size=(12, 3))
+        buffer.values[:12] = rng.normal(size=(12, 3))
+        buffer.dones[:12] = rng.random((12, 3)) < 0.2
+        last_values = rng.normal(size=3).astype(np.float32)
+        
+        buffer.compute_advantages(last_values)
+        
+        expected = np.zeros((12, 3))
+        last_gae = np.zeros(3)
+        for t in reversed(range(12)):
+            next_values = last_values if t == 11 else buffer.values[t + 1]
+            non_terminal = 1.0 - buffer.dones[t]
+            delta = buffer.rewards[t] + 0.99 * next_values * non_terminal - buffer.values[t]
+            last_gae = delta + 0.99 * 0.95 * non_terminal * last_gae
+            expected[t] = last_gae
+        np.testing.assert_allclose(buffer.advantages[:12], expected, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(buffer.returns[:12], expected + buffer.values[:12], rtol=1e-5, atol=1e-5)
+        assert not buffer.advantages[12:].any()
+    
+    def test_buffer_add_arrays_matches_dict_add(self):
+        """Dense per-agent arrays and the dict adapter store identical rows."""
+        kwargs = dict(buffer_size=2, obs_dim=3, state_dim=6, n_agents=2, continuous_dim=2, device="cpu")
+        dense, legacy = RolloutBuffer(**kwargs), RolloutBuffer(**kwargs)
+        agent_ids = ["a0", "a1"]
+        obs = np.random.randn(2, 3).astype(np.float32)
+        discrete = np.array([2, 4])
+        continuous = np.random.randn(2, 2).astype(np.float32)
+        rewards = np.array([0.5, -1.0], dtype=np.float32)
+        dones = np.array([False, True])
+        log_probs = np.array([-0.3, -0.7], dtype=np.float32)
+        
+        dense.add_arrays(obs, obs.reshape(-1), discrete, continuous, rewards, dones, log_probs, 0.25)
+        legacy.add({aid: obs[i] for i, aid in enumerate(agent_ids)}, obs.reshape(-1),
+                   {aid: {"discrete": discrete[i], "continuous": continuous[i]} for i, aid in enumerate(agent_ids)},
+                   dict(zip(agent_ids, rewards)), dict(zip(agent_ids, dones)),
+                   dict(zip(agent_ids, log_probs)), 0.25, agent_ids)
+        
+        for name in ("observations", "states", "discrete_actions", "continuous_actions",
+                     "rewards", "dones", "log_probs", "values"):
+            np.testing.assert_array_equal(getattr(dense, name), getattr(legacy, name))
+        assert dense.ptr == legacy.ptr == 1
+    
+    def test_buffer_get_reuses_device_tensors(self):
+        """Minibatches cover every sample and share one tensor conversion per update."""
+        buffer = RolloutBuffer(buffer_size=4, obs_dim=3, state_dim=5, n_agents=2, continuous_dim=2, device="cpu")
+        agent_ids = ["a0", "a1"]
+        for _ in range(4):
+            observations = {aid: np.random.randn(3).astype(np.float32) for aid in agent_ids}
+            state = np.random.randn(5).astype(np.float32)
+            actions = {aid: {"discrete": np.array(1), "continuous": np.random.randn(2)} for aid in agent_ids}
+            rewards = {aid: float(np.random.randn()) for aid in agent_ids}
+            dones = {aid: False for aid in agent_ids}
+            log_probs = {aid: 0.0 for aid in agent_ids}
+            values = {aid: 0.0 for aid in agent_ids}
+            buffer.add(observations, state, actions, rewards, dones, log_probs, values, agent_ids)
+        buffer.compute_advantages(np.zeros(2))
+        
+        batches = list(buffer.get(batch_size=3, shuffle=False))
+        cached = buffer._tensors
+        list(buffer.get(batch_size=3))
+        
+        assert buffer._tensors is cached
+        assert buffer._tensors["states"].shape == (4, 5)
+        obs = torch.cat([b["observations"] for b in batches])
+        np.testing.assert_array_equal(obs.numpy(), buffer.observations.reshape(-1, 3))
+        states = torch.cat([b["states"] for b in batches])
+        np.testing.assert_array_equal(states.numpy(), np.repeat(buffer.states, 2, axis=0))
+        adv = torch.cat([b["advantages"] for b in batches])
+        assert adv.mean().item() == pytest.approx(0.0, abs=1e-5)
+
 
 class TestMAPPOAgent:
     """Tests for the MAPPO Agent."""
@@ -199,6 +374,103 @@ class TestMAPPOAgent:
         assert all("discrete" in a for a in actions.values())
         assert all("continuous" in a for a in actions.values())
     
+    def test_agent_act_matches_per_agent_policy(self):
+        """Batched deterministic actions equal one policy call per agent."""
+        agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu")
+        observations = {f"agent_{i}": np.random.randn(65).astype(np.float32) for i in range(6)}
+        
+        actions, log_probs = agent.act(observations, deterministic=True)
+        
+        assert list(actions) == list(observations)
+        for aid, obs in observations.items():
+            action, lp = agent.policy.act(obs, deterministic=True)
+            assert actions[aid]["discrete"] == int(action["discrete"])
+            np.testing.assert_allclose(actions[aid]["continuous"], action["continuous"], atol=1e-5)
+            assert log_probs[aid] == pytest.approx(float(lp), abs=1e-4)
+    
+    def test_compiled_agent_matches_eager(self):
+        """A compiled policy keeps eager state_dict keys and outputs."""
+        eager = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu")
+        compiled = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu", compile=True)
+        compiled.policy.actor.load_state_dict(eager.policy.actor.state_dict())
+        observations = {f"agent_{i}": np.random.randn(65).astype(np.float32) for i in range(6)}
+        
+        expected, _ = eager.act(observations, deterministic=True)
+        actions, _ = compiled.act(observations, deterministic=True)
+        
+        assert [a["discrete"] for a in actions.values()] == [a["discrete"] for a in expected.values()]
+        for aid in observations:
+            np.testing.assert_allclose(actions[aid]["continuous"], expected[aid]["continuous"], atol=1e-5)
+    
+    def test_compiled_actor_runs_through_graph(self):
+        """Sampling goes through the compiled forward, not the eager one."""
+        agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu", compile=True)
+        actor = agent.policy.actor
+        compiled_call, calls = actor._compiled_call_impl, []
+        actor._compiled_call_impl = lambda *args, **kwargs: calls.append(1) or compiled_call(*args, **kwargs)
+        
+        agent.act_arrays(np.random.randn(6, 65).astype(np.float32))
+        
+        assert calls == [1]
+    
+    def test_act_arrays_returns_batched_outputs(self):
+        """act_arrays returns one array per output, and act() exposes row views of them."""
+        agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu")
+        obs_batch = np.random.randn(6, 65).astype(np.float32)
+        
+        discrete, continuous, log_probs = agent.act_arrays(obs_batch, deterministic=True)
+        actions, lp = agent.act({f"agent_{i}": obs_batch[i] for i in range(6)}, deterministic=True)
+        
+        assert discrete.shape == (6,) and continuous.shape == (6, 4) and log_probs.shape == (6,)
+        np.testing.assert_array_equal([a["discrete"] for a in actions.values()], discrete)
+        np.testing.assert_allclose(np.stack([a["continuous"] for a in actions.values()]), continuous, atol=1e-6)
+        np.testing.assert_allclose(list(lp.values()), log_probs, atol=1e-5)
+    
+    def test_agent_update_trains_actor_and_critic(self):
+        """One update step moves both networks and resets the buffer."""
+        agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=2, n_epochs=1,
+                           batch_size=8, buffer_size=8, device="cpu")
+        agent_ids = ["a0", "a1"]
+        for _ in range(8):
+            observations = {aid: np.random.randn(65).astype(np.float32) for aid in agent_ids}
+            state = np.random.randn(390).astype(np.float32)
+            actions, log_probs = agent.act(observations)
+            rewards = {aid: float(np.random.randn()) for aid in agent_ids}
+            dones = {aid: False for aid in agent_ids}
+            values = {aid: 0.0 for aid in agent_ids}
+            agent.store_transition(observations, state, actions, rewards, dones, log_probs, values, agent_ids)
+        actor_before = [p.detach().clone() for p in agent.policy.actor.parameters()]
+        critic_before = [p.detach().clone() for p in agent.policy.critic.parameters()]
+        
+        stats = agent.update(np.zeros(2, dtype=np.float32))
+        
+        assert all(isinstance(v, float) and np.isfinite(v) for v in stats.values())
+        assert any(not torch.equal(a, b) for a, b in zip(actor_before, agent.policy.actor.parameters()))
+        assert any(not torch.equal(a, b) for a, b in zip(critic_before, agent.policy.critic.parameters()))
+        assert agent.buffer.ptr == 0
+    
+    @pytest.mark.parametrize("use_safetensors", [False, True])
+    def test_save_load_round_trip(self, tmp_path, monkeypatch, use_safetensors):
+        """A saved checkpoint restores weights, optimizer state and counters."""
+        from backend.agents.mappo import agent as agent_module
+        if use_safetensors:
+            pytest.importorskip("safetensors")
+        monkeypatch.setattr(agent_module, "HAS_SAFETENSORS", use_safetensors)
+        source = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=2, device="cpu")
+        source.total_steps, source.total_episodes = 123, 4
+        path = tmp_path / "ckpt.pt"
+        
+        source.save(str(path))
+        target = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=2, device="cpu")
+        target.load(str(path))
+        
+        assert MAPPOAgent.weights_path(str(path)).exists() == use_safetensors
+        for net in ("actor", "critic"):
+            expected = getattr(source.policy, net).state_dict()
+            for key, value in getattr(target.policy, net).state_dict().items():
+                assert torch.equal(value, expected[key])
+        assert (target.total_steps, target.total_episodes) == (123, 4)
+    
     def test_agent_get_values(self):
         """Test value estimation."""
         agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=6, device="cpu")
@@ -206,10 +478,26 @@ class TestMAPPOAgent:
         state = np.random.randn(390).astype(np.float32)
         agent_ids = [f"agent_{i}" for i in range(6)]
         
-        values = agent.get_values(state, agent_ids)
+        value = agent.get_values(state, agent_ids)
+        
+        assert isinstance(value, float)
+        with torch.no_grad():
+            expected = agent.policy.critic(torch.from_numpy(state)[None])[0, 0].item()
+        assert value == pytest.approx(expected, abs=1e-5)
+    
+    def test_store_transition_broadcasts_scalar_value(self):
+        """The shared critic value is stored for every agent of the step."""
+        agent = MAPPOAgent(obs_dim=65, state_dim=390, n_agents=2, device="cpu")
+        agent_ids = ["a0", "a1"]
+        observations = {aid: np.random.randn(65).astype(np.float32) for aid in agent_ids}
+        state = np.random.randn(390).astype(np.float32)
+        actions, log_probs = agent.act(observations)
+        value = agent.get_values(state)
+        
+        agent.store_transition(observations, state, actions, {aid: 0.0 for aid in agent_ids},
+                               {aid: False for aid in agent_ids}, log_probs, value, agent_ids)
         
-        assert len(values) == 6
-        assert all(isinstance(v, float) for v in values.values())
+        np.testing.assert_allclose(agent.buffer.values[0], [value, value], rtol=1e-6)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 """Tests for the FastAPI Server."""
 
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from backend.api.server import app
@@ -134,3 +136,128 @@ class TestRequestValidation:
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestGameWebSocket:
+    """Tests for the game websocket."""
+    
+    def test_websocket_closes_when_game_stops(self):
+        """The websocket handler wakes up and closes once the game is stopped."""
+        from starlette.websockets import WebSocketDisconnect
+        from backend.api.server import games
+        create_response = client.post("/api/v1/games", json={"mode": "ai_vs_ai", "team_size": 1})
+        game_id = create_response.json()["game_id"]
+        
+        with client.websocket_connect(f"/ws/game/{game_id}") as websocket:
+            session = games[game_id]
+            assert not session.finished_event.is_set()
+            websocket.portal.call(session.stop, "stopped")
+            with pytest.raises(WebSocketDisconnect):
+                websocket.receive_json()
+        
+        client.delete(f"/api/v1/games/{game_id}")
+    
+    def test_viewers_get_final_frame_and_game_end_before_close(self):
+        """finished_event fires only after the last game_state and game_end went out."""
+        import asyncio
+        from backend.api import server
+        
+        log = []
+        
+        class FakeWebSocket:
+            async def send_text(self, text):
+                await asyncio.sleep(0)  # yield like a real socket write
+                log.append(json.loads(text)["type"])
+        
+        async def run():
+            session = server.GameSession("g", server.GameCreateRequest(team_size=1, time_limit=1))
+            session.reset()
+            session.connections = [FakeWebSocket()]
+            session.running = True
+            
+            async def viewer():
+                await session.finished_event.wait()
+                log.append("closed")
+            waiting = asyncio.create_task(viewer())
+            await server._run_game_loop(session)
+            await waiting
+        
+        asyncio.run(run())
+        
+        assert log == ["game_state"] * 10 + ["game_end", "closed"]
+    
+    def test_websocket_handler_exits_when_client_disconnects(self):
+        """A client leaving early releases its handler and connection slot before the game ends."""
+        from backend.api.server import games
+        create_response = client.post("/api/v1/games", json={"mode": "ai_vs_ai", "team_size": 1})
+        game_id = create_response.json()["game_id"]
+        
+        with client.websocket_connect(f"/ws/game/{game_id}"):
+            assert len(games[game_id].connections) == 1
+        
+        assert games[game_id].connections == []
+        assert not games[game_id].finished_event.is_set()
+        client.delete(f"/api/v1/games/{game_id}")
+    
+    def test_broadcast_sends_one_payload_to_every_viewer(self, monkeypatch):
+        """A broadcast is serialized once and sent as the same JSON text frame to each viewer."""
+        import asyncio
+        import json
+        from backend.api import server
+        
+        class FakeWebSocket:
+            def __init__(self):
+                self.sent = []
+            
+            async def send_text(self, text):
+                self.sent.append(text)
+        
+        calls = []
+        dumps_text = server.dumps_text
+        monkeypatch.setattr(server, "dumps_text", lambda message: calls.append(1) or dumps_text(message))
+        session = server.GameSession("g", server.GameCreateRequest(team_size=1))
+        session.connections = [FakeWebSocket(), FakeWebSocket()]
+        message = {"type": "game_state", "data": {"hp": 50.0, "position": [1.5, 2.0, 3.0]}}
+        
+        asyncio.run(session.broadcast(message))
+        
+        assert calls == [1]
+        first, second = (ws.sent for ws in session.connections)
+        assert first == second and len(first) == 1
+        assert json.loads(first[0]) == {"type": "game_state", "data": {"hp": 50.0, "position": [1.5, 2.0, 3.0]}}
+    
+    def test_process_session_steps_in_worker(self):
+        """A process-backed session steps its game in a worker process and shuts it down on close."""
+        import asyncio
+        from backend.api.server import GameSessionProxy, GameCreateRequest
+        session = GameSessionProxy("proxy", GameCreateRequest(team_size=1, time_limit=1))
+        try:
+            assert session.info()["step"] == 0
+            
+            async def run(n):
+                return [await session.run_step() for _ in range(n)]
+            states = asyncio.run(run(10))
+            
+            assert [s["step"] for s in states] == list(range(1, 11))
+            assert len(states[-1]["drones"]) == 2
+            assert session.status == "finished" and not session.running
+        finally:
+            session.close()
+        assert not session._process.is_alive()
+    
+    def test_process_session_close_waits_for_inflight_step(self):
+        """close() takes the pipe lock, so it never closes the pipe under a pending round trip."""
+        import threading
+        from backend.api.server import GameSessionProxy, GameCreateRequest
+        session = GameSessionProxy("proxy", GameCreateRequest(team_size=1, time_limit=1))
+        session.info()
+        
+        with session._lock:
+            closer = threading.Thread(target=session.close)
+            closer.start()
+            closer.join(timeout=0.3)
+            assert closer.is_alive() and not session._conn.closed
+        closer.join(timeout=10)
+        
+        assert not closer.is_alive()
+        assert session._conn.closed and not session._process.is_alive()
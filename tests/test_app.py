@@ -0,0 +1,460 @@
+"""Tests for the all-in-one web app (app.py)."""
+
+import gzip
+import http.client
+import json
+import struct
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import numpy as np
+
+import app
+from app import GameManager, GameState, _compute_actions_kernel, _compute_actions_numpy, _wrap_angle
+
+
+def make_drone(drone_id, team, position, orientation=(0.0, 0.0, 0.0), hp=100.0, is_alive=True):
+    return {
+        "id": drone_id, "team": team, "position": list(position),
+        "velocity": [0.0, 0.0, 0.0], "orientation": list(orientation),
+        "hp": hp, "shield": 50.0, "is_alive": is_alive,
+    }
+
+
+class TestSmartActions:
+    """Tests for the batched pursuit policy."""
+    
+    def test_actions_for_every_drone(self):
+        """Every drone gets a well-formed action."""
+        manager = GameManager()
+        state = {"drones": [
+            make_drone("red_0", "red", (-100, 0, 100)),
+            make_drone("red_1", "red", (-100, 50, 100)),
+            make_drone("blue_0", "blue", (100, 0, 100), (0, 0, np.pi)),
+            make_drone("blue_1", "blue", (100, 50, 100), (0, 0, np.pi), is_alive=False),
+        ]}
+        
+        actions = manager._get_smart_actions(state, step=0)
+        
+        assert set(actions) == {"red_0", "red_1", "blue_0", "blue_1"}
+        for action in actions.values():
+            assert action["discrete"] in (0, 1, 2)
+            assert len(action["continuous"]) == 4
+            assert 0.0 <= action["continuous"][0] <= 1.0
+            assert all(-1.0 <= v <= 1.0 for v in action["continuous"][1:])
+        assert actions["blue_1"] == {"discrete": 0, "continuous": [0, 0, 0, 0]}
+    
+    def test_fires_gun_at_aligned_close_target(self):
+        """A drone facing a nearby enemy opens fire."""
+        manager = GameManager()
+        state = {"drones": [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (80, 0, 100), (0, 0, np.pi)),
+        ]}
+        
+        actions = manager._get_smart_actions(state, step=0)
+        
+        assert actions["red_0"]["discrete"] == 1
+        assert actions["blue_0"]["discrete"] == 1
+    
+    def test_prefers_low_hp_target(self):
+        """Target score favours damaged enemies over slightly closer ones."""
+        manager = GameManager()
+        state = {"drones": [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (0, 120, 100), hp=100.0),
+            make_drone("blue_1", "blue", (0, -150, 100), hp=10.0),
+        ]}
+        
+        actions = manager._get_smart_actions(state, step=0)
+        
+        # 目标在 -y 方向，应向右 (负偏航) 转
+        assert actions["red_0"]["continuous"][2] < 0
+    
+    def test_patrol_without_enemies(self):
+        """Drones patrol when the enemy team is wiped out."""
+        manager = GameManager()
+        state = {"drones": [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (80, 0, 100), is_alive=False),
+        ]}
+        
+        actions = manager._get_smart_actions(state, step=10)
+        
+        assert actions["red_0"]["discrete"] == 0
+        assert actions["red_0"]["continuous"][0] == pytest.approx(0.3)
+        assert actions["red_0"]["continuous"][2] == pytest.approx(np.sin(0.5) * 0.3)
+    
+    def test_reuses_actions_dict(self):
+        """Passing the previous actions back overwrites entries in place."""
+        manager = GameManager()
+        state = {"drones": [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (80, 0, 100), is_alive=False),
+        ]}
+        
+        actions = manager._get_smart_actions(state, step=0)
+        entry = actions["red_0"]
+        continuous = entry["continuous"]
+        
+        reused = manager._get_smart_actions(state, step=10, actions=actions)
+        
+        assert reused is actions
+        assert reused["red_0"] is entry and entry["continuous"] is continuous
+        assert continuous[2] == pytest.approx(np.sin(0.5) * 0.3)
+
+
+class TestActionKernels:
+    """The compiled kernel and the NumPy fallback must agree."""
+    
+    @pytest.mark.parametrize("seed", range(5))
+    def test_kernel_matches_numpy(self, seed):
+        rng = np.random.default_rng(seed)
+        n = 8
+        pos = rng.uniform(-300, 300, (n, 3))
+        orient = rng.uniform(-np.pi, np.pi, (n, 3))
+        hp = rng.uniform(0, 100, n)
+        alive = rng.random(n) < 0.8
+        is_red = np.arange(n) < n // 2
+        noise = rng.uniform(-0.1, 0.1, (n, 4))
+        missile_roll = rng.random(n)
+        
+        disc_k, cont_k = _compute_actions_kernel(pos, orient, hp, alive, is_red, noise, missile_roll, seed)
+        disc_n, cont_n = _compute_actions_numpy(pos, orient, hp, alive, is_red, noise, missile_roll, seed)
+        
+        np.testing.assert_array_equal(disc_k, disc_n)
+        np.testing.assert_allclose(cont_k, cont_n, atol=1e-9)
+    
+    @pytest.mark.skipif(not app.HAS_NUMBA, reason="needs Numba")
+    def test_warmup_kernels(self):
+        """Warmup compiles the exact specialization a real game uses."""
+        app.warmup_kernels()
+        signatures = set(_compute_actions_kernel.signatures)
+        state = {"drones": [
+            make_drone("red_0", "red", (-100, 0, 100)),
+            make_drone("blue_0", "blue", (100, 0, 100), (0, 0, np.pi)),
+        ]}
+        
+        GameManager()._get_smart_actions(state, step=0)
+        
+        assert set(_compute_actions_kernel.signatures) == signatures
+
+
+class TestWrapAngle:
+    """Tests for branchless angle normalization."""
+    
+    def test_wrap_scalar_and_array(self):
+        angles = np.array([0.0, 3.0, -3.0, 4.0, -4.0, 7 * np.pi + 0.1, -9 * np.pi - 0.1])
+        wrapped = _wrap_angle(angles)
+        
+        assert np.all(wrapped >= -np.pi) and np.all(wrapped < np.pi)
+        np.testing.assert_allclose(np.cos(wrapped), np.cos(angles), atol=1e-9)
+        np.testing.assert_allclose(np.sin(wrapped), np.sin(angles), atol=1e-9)
+        assert _wrap_angle(4.0) == pytest.approx(4.0 - 2 * np.pi)
+
+
+class TestGameState:
+    """Tests for the preallocated frame buffers."""
+    
+    def test_projectile_buffer_grows(self):
+        """Projectile positions survive buffer growth and split back per frame."""
+        drones = [make_drone("red_0", "red", (0, 0, 100)), make_drone("blue_0", "blue", (80, 0, 100))]
+        game = GameState(game_id="g", status="running", current_frame=0, winner=None, config={})
+        game.allocate(drones, max_steps=3)
+        arrays = app._drone_arrays(drones)
+        info = {"red_alive": 1, "blue_alive": 1}
+        
+        counts = [0, 100, 3]
+        for step, count in enumerate(counts):
+            projectiles = [{"id": f"p{i}", "position": [float(step), float(i), 0.0]} for i in range(count)]
+            game.record_frame(step, arrays, info, projectiles)
+        
+        frames = game.frames_since(0)
+        assert [len(f["projectiles"]) for f in frames] == counts
+        assert frames[1]["projectiles"][99] == {"position": [1.0, 99.0, 0.0]}
+        assert game.frames_since(2)[0]["projectiles"] == frames[2]["projectiles"]
+        assert frames[0]["red_hp"] == frames[0]["blue_hp"] == 100.0
+    
+    def test_shared_projectile_buffer_bounded_by_ammo(self):
+        """Long games size the shared projectile buffer by total ammo, not by max_steps."""
+        drones = [make_drone(f"red_{i}", "red", (0, i, 100)) for i in range(3)]
+        drones += [make_drone(f"blue_{i}", "blue", (80, i, 100)) for i in range(3)]
+        game = GameState(game_id="g", status="running", current_frame=0, winner=None, config={})
+        game.allocate(drones, max_steps=app.MAX_GAME_STEPS, shared=True)
+        try:
+            lifetime_frames = 36
+            assert len(game.proj_positions) == 6 * (app.Drone.MAX_AMMO + app.Drone.MAX_MISSILES) * lifetime_frames
+            assert game.shm.size < 16 * 1024 * 1024
+        finally:
+            game.release(unlink=True)
+
+
+class TestRunGame:
+    """Tests for running a full game."""
+    
+    def test_run_game(self):
+        """A short game runs to completion and records frames."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=30)
+        
+        manager.run_game(game_id)
+        data = manager.get_game_data(game_id)
+        
+        assert data["status"] == "finished"
+        assert 0 < data["total_frames"] <= 30
+        assert len(data["frames"][0]["drones"]) == 4
+        assert data["winner"] in ("red", "blue", "draw")
+    
+    def test_game_data_since(self):
+        """Only frames after ``since`` are returned."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=20)
+        manager.run_game(game_id)
+        
+        full = manager.get_game_data(game_id)
+        delta = manager.get_game_data(game_id, since=5)
+        
+        assert delta["total_frames"] == full["total_frames"]
+        assert len(delta["frames"]) == full["total_frames"] - 5
+        assert delta["frames"][0] == full["frames"][5]
+        assert manager.get_game_data(game_id, since=full["total_frames"])["frames"] == []
+    
+    def test_process_pool_game(self):
+        """Games run in worker processes publish frames through shared memory."""
+        manager = GameManager(workers=1)
+        try:
+            game_id = manager.create_game(team_size=2, max_steps=30)
+            manager.start_game(game_id)
+            
+            deadline = time.time() + 60
+            while manager.get_game_data(game_id)["status"] != "finished":
+                assert time.time() < deadline
+                time.sleep(0.05)
+            data = manager.get_game_data(game_id)
+            
+            assert 0 < data["total_frames"] <= 30
+            assert data["winner"] in ("red", "blue", "draw")
+            assert [f["step"] for f in data["frames"]] == list(range(data["total_frames"]))
+            assert len(data["frames"][-1]["drones"]) == 4
+        finally:
+            manager.close()
+    
+    def test_game_blob_matches_json(self):
+        """The binary frame blob carries the same data as the JSON frames."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=20)
+        manager.run_game(game_id)
+        
+        blob, etag = manager.get_game_blob(game_id, since=3)
+        data = manager.get_game_data(game_id, since=3)
+        since, count, n_drones, status, winner, total = struct.unpack_from("<IIHBBI", blob)
+        
+        assert etag == manager.get_game_etag(game_id)
+        assert (since, count, total) == (3, len(data["frames"]), data["total_frames"])
+        assert app.STATUS_CODES[status] == "finished" and app.WINNER_CODES[winner] == data["winner"]
+        
+        offset = 16
+        for frame in data["frames"]:
+            step, n, n_proj = struct.unpack_from("<iHH", blob, offset)
+            offset += 8
+            values = np.frombuffer(blob, "<f4", 4 + n * 9 + n_proj * 3, offset)
+            offset += values.nbytes
+            
+            assert (step, n, n_proj) == (frame["step"], n_drones, len(frame["projectiles"]))
+            np.testing.assert_allclose(values[:4], [frame["red_alive"], frame["blue_alive"],
+                                                    frame["red_hp"], frame["blue_hp"]])
+            drones = values[4:4 + n * 9].reshape(n, 9)
+            for row, drone in zip(drones, frame["drones"]):
+                np.testing.assert_allclose(row[:7], drone["position"] + drone["velocity"] + [drone["hp"]])
+                assert row[7] == (drone["team"] != "red") and row[8] == drone["is_alive"]
+            np.testing.assert_allclose(values[4 + n * 9:].reshape(-1, 3),
+                                       np.reshape([p["position"] for p in frame["projectiles"]], (-1, 3)))
+        assert offset == len(blob)
+    
+    def test_concurrent_polling_sees_consistent_prefix(self):
+        """Delta polls taken while the game runs stitch into the final replay."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=200)
+        worker = threading.Thread(target=manager.run_game, args=(game_id,))
+        worker.start()
+        
+        frames = []
+        while True:
+            data = manager.get_game_data(game_id, since=len(frames))
+            frames.extend(data["frames"])
+            assert len(frames) == data["total_frames"]
+            if data["status"] == "finished":
+                break
+        worker.join()
+        
+        assert frames == manager.get_game_data(game_id)["frames"]
+        assert [f["step"] for f in frames] == list(range(len(frames)))
+
+
+class TestDumpsJson:
+    """Tests for JSON serialization of NumPy-bearing payloads."""
+    
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_numpy_payload(self, monkeypatch, use_orjson):
+        if use_orjson and not app.HAS_ORJSON:
+            pytest.skip("orjson not installed")
+        monkeypatch.setattr(app, "HAS_ORJSON", use_orjson)
+        data = {"pos": np.array([1.5, 2.0], dtype=np.float32), "n": np.int64(3), "s": "red"}
+        assert json.loads(app.dumps_json(data)) == {"pos": [1.5, 2.0], "n": 3, "s": "red"}
+
+
+@pytest.fixture
+def http_server():
+    """Run the app's HTTP handler on an ephemeral port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), app.SkyBattleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def wait_finished(game_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while app.manager.games[game_id].status != "finished":
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+class TestMinifyHtml:
+    """Tests for the import-time page minifier."""
+    
+    def test_strips_comments_and_indentation(self):
+        html = """<html>
+            <!-- note -->
+            <style>
+                /* header */
+                .a { color: red; }
+            </style>
+            <script>
+                // comment
+                const url = 'http://x';
+
+                draw();
+            </script>
+        </html>"""
+        
+        assert app._minify_html(html) == (
+            "<html>\n<style>\n.a { color: red; }\n</style>\n"
+            "<script>\nconst url = 'http://x';\ndraw();\n</script>\n</html>"
+        )
+
+
+class TestHTTPHandler:
+    """Tests for the HTTP handler."""
+    
+    def test_keep_alive_and_etag(self, http_server):
+        """Polls reuse one connection and unchanged data returns 304."""
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        
+        conn.request("GET", "/api/new_game?team_size=2&max_steps=20")
+        response = conn.getresponse()
+        game_id = json.loads(response.read())["game_id"]
+        wait_finished(game_id)
+        
+        conn.request("GET", f"/api/game_data?game_id={game_id}")
+        response = conn.getresponse()
+        data = json.loads(response.read())
+        etag = response.getheader("ETag")
+        assert response.status == 200
+        assert data["status"] == "finished"
+        assert etag
+        
+        # 同一连接上的条件请求
+        conn.request("GET", f"/api/game_data?game_id={game_id}", headers={"If-None-Match": etag})
+        response = conn.getresponse()
+        assert response.read() == b""
+        assert response.status == 304
+        
+        conn.request("GET", f"/api/game_data.bin?game_id={game_id}&since=0", headers={"If-None-Match": etag})
+        response = conn.getresponse()
+        assert response.read() == b""
+        assert response.status == 304
+        
+        conn.request("GET", f"/api/game_data.bin?game_id={game_id}&since=0")
+        response = conn.getresponse()
+        blob = response.read()
+        assert response.getheader("Content-Type") == "application/octet-stream"
+        assert struct.unpack_from("<I", blob, 4)[0] == data["total_frames"]
+        
+        # 参数错误返回 400，连接仍可继续使用
+        conn.request("GET", "/api/game_data?game_id=x&since=abc")
+        response = conn.getresponse()
+        assert "since" in json.loads(response.read())["error"]
+        assert response.status == 400
+        
+        conn.request("GET", f"/api/new_game?max_steps={app.MAX_GAME_STEPS + 1}")
+        response = conn.getresponse()
+        assert "max_steps" in json.loads(response.read())["error"]
+        assert response.status == 400
+        
+        conn.request("GET", "/missing")
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 404
+        conn.close()
+    
+    def test_game_stream(self, http_server):
+        """The event stream pushes one finished event once the game ends."""
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=30)
+        conn.request("GET", "/api/new_game?team_size=2&max_steps=20")
+        game_id = json.loads(conn.getresponse().read())["game_id"]
+        
+        conn.request("GET", f"/api/game_stream?game_id={game_id}")
+        response = conn.getresponse()
+        assert response.getheader("Content-Type") == "text/event-stream"
+        assert b"data: finished" in response.read()
+        assert app.manager.games[game_id].status == "finished"
+        conn.close()
+        
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", "/api/game_stream?game_id=missing")
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 404
+        conn.close()
+    
+    def test_main_page(self, http_server):
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", "/")
+        response = conn.getresponse()
+        body = response.read()
+        assert response.status == 200
+        assert int(response.getheader("Content-Length")) == len(body)
+        assert "SkyBattle" in body.decode("utf-8")
+        
+        conn.request("GET", "/", headers={"Accept-Encoding": "gzip, deflate"})
+        response = conn.getresponse()
+        compressed = response.read()
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert gzip.decompress(compressed) == body
+        
+        conn.request("GET", "/", headers={"Accept-Encoding": "gzip;q=0, identity"})
+        response = conn.getresponse()
+        assert response.read() == body
+        assert response.getheader("Content-Encoding") is None
+        
+        # 条件请求命中时返回 304
+        conn.request("GET", "/", headers={"If-None-Match": response.getheader("ETag")})
+        response = conn.getresponse()
+        assert response.read() == b""
+        assert response.status == 304
+        
+        if app.HAS_BROTLI:
+            import brotli
+            conn.request("GET", "/", headers={"Accept-Encoding": "gzip, br"})
+            response = conn.getresponse()
+            assert response.getheader("Content-Encoding") == "br"
+            assert brotli.decompress(response.read()) == body
+        conn.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
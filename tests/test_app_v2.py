@@ -0,0 +1,634 @@
+"""Tests for the enhanced web app (app_v2.py)."""
+
+import gzip
+import http.client
+import json
+import math
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import app_v2
+from app_v2 import (
+    ROLE_ATTACKER, ROLE_LEADER, ROLE_SUPPORT, GameManager, GameState, SmartStrategy,
+    _pursue_batch_kernel, _pursue_kernel, _pursue_numpy, drones_to_soa,
+)
+
+
+def make_drone(drone_id, team, position, orientation=(0.0, 0.0, 0.0), hp=100.0, is_alive=True):
+    return {
+        "id": drone_id, "team": team, "position": list(position),
+        "velocity": [0.0, 0.0, 0.0], "orientation": list(orientation),
+        "hp": hp, "shield": 50.0, "is_alive": is_alive,
+    }
+
+
+class TestSmartStrategy:
+    """Tests for the role-based team strategy."""
+
+    def test_actions_for_every_drone(self):
+        """Every drone gets a well-formed action and dead drones idle."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (-100, 0, 100)),
+            make_drone("red_1", "red", (-120, 50, 100)),
+            make_drone("red_2", "red", (-140, -50, 100)),
+            make_drone("blue_0", "blue", (100, 0, 100), (0, 0, np.pi)),
+            make_drone("blue_1", "blue", (100, 50, 100), (0, 0, np.pi), is_alive=False),
+        ]
+
+        actions = strategy.get_team_actions(drones_to_soa(drones), step=0)
+
+        assert set(actions) == {d["id"] for d in drones}
+        for action in actions.values():
+            assert action["discrete"] in (0, 1, 2)
+            assert len(action["continuous"]) == 4
+            assert 0.0 <= action["continuous"][0] <= 1.0
+            assert all(-1.0 <= v <= 1.0 for v in action["continuous"][1:])
+        assert actions["blue_1"] == {"discrete": 0, "continuous": [0, 0, 0, 0]}
+
+    def test_missile_countdown_advances_only_in_range(self):
+        """The countdown ticks on aimed in-range steps and resets after a launch."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (300, 0, 100), (0, 0, np.pi)),
+        ]
+        state = drones_to_soa(drones)
+        strategy.get_team_actions(state, step=0)
+        strategy.missile_countdown[:] = 2
+
+        actions = strategy.get_team_actions(state, step=1)
+        assert actions["red_0"]["discrete"] == 0
+        assert strategy.missile_countdown[0] == 1
+
+        actions = strategy.get_team_actions(state, step=2)
+        assert actions["red_0"]["discrete"] == 2
+        assert strategy.missile_countdown[0] >= 1
+
+        # Out of missile range the countdown does not advance
+        far = drones_to_soa([drones[0], make_drone("blue_0", "blue", (900, 0, 100), (0, 0, np.pi))])
+        strategy.missile_countdown[:] = 2
+        for step in range(3, 20):
+            strategy.get_team_actions(far, step=step)
+        assert strategy.missile_countdown[0] == 2
+
+    def test_missile_launch_rate_matches_per_step_probability(self):
+        """Launches per in-range step average MISSILE_PROBABILITY, like an independent 3% roll."""
+        strategy = SmartStrategy()
+        strategy.rng = np.random.default_rng(0)
+        red = make_drone("red_0", "red", (0, 0, 100))
+        near = drones_to_soa([red, make_drone("blue_0", "blue", (300, 0, 100), (0, 0, np.pi))])
+        far = drones_to_soa([red, make_drone("blue_0", "blue", (900, 0, 100), (0, 0, np.pi))])
+        in_range_steps = 20000
+
+        # Out-of-range steps in between must not shorten the cooldown
+        launches = 0
+        for step in range(2 * in_range_steps):
+            actions = strategy.get_team_actions(near if step % 2 else far, step=step)
+            launches += actions["red_0"]["discrete"] == 2
+
+        assert launches / in_range_steps == pytest.approx(app_v2.MISSILE_PROBABILITY, rel=0.15)
+
+    def test_roles_reassigned_only_when_alive_set_changes(self, monkeypatch):
+        """Roles are re-sorted on a death or every 50 steps, not on every step."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (-100, 0, 100)),
+            make_drone("red_1", "red", (-120, 50, 100)),
+            make_drone("blue_0", "blue", (100, 0, 100), (0, 0, np.pi)),
+            make_drone("blue_1", "blue", (100, 50, 100), (0, 0, np.pi)),
+        ]
+        state = drones_to_soa(drones)
+        strategy.get_team_actions(state, step=0)
+
+        calls = []
+        monkeypatch.setattr(strategy, "assign_roles", lambda team, s: calls.append(team))
+        strategy.get_team_actions(state, step=1)
+        assert calls == []
+
+        state["alive"][3] = False
+        strategy.get_team_actions(state, step=2)
+        assert calls == ["red", "blue"]
+
+        strategy.get_team_actions(state, step=3)
+        strategy.get_team_actions(state, step=50)
+        assert calls == ["red", "blue", "red", "blue"]
+
+    def test_leader_fires_at_nearest_enemy(self):
+        """The leader pursues the nearest enemy and opens fire when aligned."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (80, 0, 100), (0, 0, np.pi)),
+            make_drone("blue_1", "blue", (0, 600, 100), (0, 0, np.pi)),
+        ]
+
+        actions = strategy.get_team_actions(drones_to_soa(drones), step=0)
+
+        assert strategy.roles[0] == ROLE_LEADER
+        assert actions["red_0"]["discrete"] == 1
+        assert abs(actions["red_0"]["continuous"][2]) < 0.1
+
+    def test_support_covers_ally_in_danger(self):
+        """A support drone turns towards the enemies surrounding an ally."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (300, 0, 100)),
+            make_drone("red_1", "red", (0, 0, 100), hp=20.0),
+            make_drone("red_2", "red", (0, -300, 100), orientation=(0, 0, np.pi / 2)),
+            make_drone("blue_0", "blue", (0, 50, 100)),
+            make_drone("blue_1", "blue", (50, 50, 100)),
+            make_drone("blue_2", "blue", (-900, -300, 100), hp=10.0),
+        ]
+
+        strategy.roles = np.array([ROLE_LEADER, ROLE_ATTACKER, ROLE_SUPPORT] + [ROLE_ATTACKER] * 3,
+                                  dtype=np.int8)
+
+        action = strategy.get_team_actions(drones_to_soa(drones), step=1)["red_2"]
+
+        # Weakest enemy blue_2 is behind; the threat near red_1 lies straight ahead
+        assert abs(action["continuous"][2]) < 0.3
+
+
+    def test_assign_roles_by_forward_position(self):
+        """The most forward drone leads, the next ones attack and the rest support."""
+        strategy = SmartStrategy()
+        drones = [make_drone(f"red_{i}", "red", (x, 0, 100)) for i, x in enumerate((-300, -100, -200, 0, -400))]
+        drones.append(make_drone("blue_0", "blue", (100, 0, 100)))
+
+        strategy.assign_roles("red", drones_to_soa(drones))
+
+        assert list(strategy.roles) == [
+            ROLE_SUPPORT, ROLE_ATTACKER, ROLE_ATTACKER, ROLE_LEADER, ROLE_SUPPORT, ROLE_ATTACKER,
+        ]
+
+    def test_attacker_follows_assigned_target(self):
+        """Attackers chase their assigned target and fall back to the nearest once it dies."""
+        strategy = SmartStrategy()
+        drones = [
+            make_drone("red_0", "red", (0, 0, 100)),
+            make_drone("blue_0", "blue", (100, 0, 100)),
+            make_drone("blue_1", "blue", (0, 400, 100)),
+        ]
+        strategy.roles = np.array([ROLE_ATTACKER, ROLE_ATTACKER, ROLE_ATTACKER], dtype=np.int8)
+        strategy.targets = {"red_0": "blue_1"}
+
+        chasing = strategy.get_team_actions(drones_to_soa(drones), step=1)
+        drones[2]["is_alive"] = False
+        fallback = strategy.get_team_actions(drones_to_soa(drones), step=2)
+
+        assert chasing["red_0"]["continuous"][2] == pytest.approx(1.0, abs=0.05)
+        assert fallback["red_0"]["continuous"][2] == pytest.approx(0.0, abs=0.05)
+
+    def test_assign_targets_focuses_lowest_hp(self):
+        """Half the attackers focus the weakest target; the rest spread by HP order."""
+        strategy = SmartStrategy()
+        attackers = [make_drone(f"red_{i}", "red", (0, i, 100)) for i in range(4)]
+        targets = [
+            make_drone("blue_0", "blue", (100, 0, 100), hp=80.0),
+            make_drone("blue_1", "blue", (100, 10, 100), hp=30.0),
+            make_drone("blue_2", "blue", (100, 20, 100), hp=60.0),
+        ]
+
+        strategy._assign_targets([a["id"] for a in attackers], [t["id"] for t in targets],
+                                 np.array([t["hp"] for t in targets]))
+
+        assert strategy.targets == {
+            "red_0": "blue_1", "red_1": "blue_1", "red_2": "blue_0", "red_3": "blue_1",
+        }
+
+
+class TestPursueKernel:
+    """Tests for the scalar pursuit kernel."""
+
+    def test_yaw_error_wraps_across_pi(self):
+        """A target just across the +-pi seam needs a small left turn, not a full spin."""
+        tx, ty = 100 * math.cos(-3.0), 100 * math.sin(-3.0)
+
+        discrete, throttle, pitch_rate, yaw_rate, roll = _pursue_kernel(
+            0.0, 0.0, 100.0, tx, ty, 100.0, 0.0, 0.0, 0.0,
+            3.0, 0.0, 1.0, 0.5, 0.5, 0.5)
+
+        assert yaw_rate == pytest.approx((2 * math.pi - 6.0) * 1.5)
+        assert discrete == 1
+        assert throttle == pytest.approx(0.5)
+        assert pitch_rate == pytest.approx(0.0)
+        assert roll == pytest.approx(0.0)
+
+
+    def test_yaw_error_wraps_multiple_turns(self):
+        """An unnormalised heading several turns away wraps in a single step."""
+        discrete, throttle, pitch_rate, yaw_rate, roll = _pursue_kernel(
+            0.0, 0.0, 100.0, 100.0, 0.0, 100.0, 0.0, 0.0, 0.0,
+            6 * math.pi + 0.2, 0.0, 1.0, 0.5, 0.5, 0.5)
+
+        assert yaw_rate == pytest.approx(-0.3)
+
+
+    def test_batched_numpy_matches_kernel(self):
+        """The NumPy batch path and the compiled batch kernel agree drone for drone."""
+        rng = np.random.default_rng(7)
+        n = 64
+        pos = rng.uniform(-400, 400, (n, 3))
+        target_pos = pos + rng.uniform(-300, 300, (n, 3))
+        target_pos[0] = pos[0]  # degenerate: already on top of the target
+        target_vel = rng.uniform(-50, 50, (n, 3))
+        ori = rng.uniform(-np.pi, np.pi, (n, 3))
+        aggression = rng.uniform(0.7, 0.9, n)
+        rand = rng.random((n, 3))
+
+        discrete, continuous = _pursue_numpy(
+            pos, ori, target_pos, target_vel, aggression, rand)
+        expected_discrete, expected_continuous = _pursue_batch_kernel(
+            pos, ori, target_pos, target_vel, aggression, rand)
+
+        np.testing.assert_array_equal(discrete, expected_discrete)
+        np.testing.assert_allclose(continuous, expected_continuous, atol=1e-9)
+
+
+    @pytest.mark.skipif(not app_v2.HAS_NUMBA, reason="needs Numba")
+    def test_warmup_matches_game_specialization(self):
+        """Warmup compiles the float32 specialization that env-driven games use."""
+        from backend.envs import CombatEnv, CombatConfig
+        app_v2.warmup_kernels()
+        signatures = set(_pursue_batch_kernel.signatures)
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=0)
+
+        SmartStrategy().get_team_actions(env.get_state_soa(), step=0)
+
+        assert set(_pursue_batch_kernel.signatures) == signatures
+
+
+class TestRunGame:
+    """End-to-end runs of the game loop."""
+
+    def test_run_game_finishes_with_winner(self):
+        """A short game runs to completion and records frames."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=3, max_steps=60)
+
+        manager.run_game(game_id)
+
+        data = manager.get_game_data(game_id)
+        assert data["status"] == "finished"
+        assert data["winner"] in ("red", "blue", "draw")
+        assert 0 < data["total_frames"] <= 60
+        assert data["frames"][0]["step"] == 0
+        assert len(data["frames"]) == data["total_frames"]
+
+
+    def test_process_pool_games(self):
+        """Games submitted to the process pool finish and come back with their frames."""
+        manager = GameManager(workers=2)
+        try:
+            game_ids = [manager.create_game(team_size=2, max_steps=30) for _ in range(2)]
+            for game_id in game_ids:
+                manager.start_game(game_id)
+
+            deadline = time.time() + 60
+            while any(manager.games[g].status != "finished" for g in game_ids):
+                assert time.time() < deadline
+                time.sleep(0.05)
+        finally:
+            manager.close()
+
+        for game_id in game_ids:
+            data = json.loads(manager.get_game_json(game_id))
+            assert data["winner"] in ("red", "blue", "draw")
+            assert len(data["frames"]) == data["total_frames"] > 0
+
+
+    def test_thread_pool_is_bounded(self):
+        """More games than the thread limit share the bounded pool and all finish."""
+        manager = GameManager()
+        game_ids = [manager.create_game(team_size=1, max_steps=20) for _ in range(app_v2.GAME_THREADS + 2)]
+        try:
+            for game_id in game_ids:
+                manager.start_game(game_id)
+            assert manager._threads._max_workers == app_v2.GAME_THREADS
+
+            deadline = time.time() + 60
+            while any(manager.games[g].status != "finished" for g in game_ids):
+                assert time.time() < deadline
+                time.sleep(0.05)
+        finally:
+            manager.close()
+
+    def test_close_stops_queued_games(self):
+        """Closing the manager stops games that have not finished yet."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=1, max_steps=20)
+
+        manager.close()
+        manager.run_game(game_id)
+
+        assert manager.games[game_id].status == "stopped"
+        assert manager.games[game_id].n_frames == 0
+
+
+class TestGameState:
+    """Tests for the columnar frame store."""
+
+    def test_frames_round_trip_through_columns(self):
+        """Recorded render state comes back in the dict shape the page draws."""
+        game = GameState.allocate("battle_0001", team_size=1, max_steps=4)
+        drones = [
+            make_drone("red_0", "red", (-100, 5, 100), hp=75.0),
+            make_drone("blue_0", "blue", (100, -5, 120), hp=0.0, is_alive=False),
+        ]
+        state = drones_to_soa(drones)
+        state["projectiles"] = np.array([[1.5, 2.5, 3.5]], dtype=np.float32)
+
+        team_hp = game.record_frame(state, np.array([ROLE_LEADER, ROLE_SUPPORT]), 1, 0)
+        frames = game.frame_dicts()
+
+        assert team_hp == (75.0, 0.0)
+        assert game.n_frames == 1
+        assert frames == [{
+            "step": 0,
+            "drones": [
+                {"id": "red_0", "team": "red", "position": [-100.0, 5.0, 100.0],
+                 "velocity": [0.0, 0.0, 0.0], "orientation": [0.0, 0.0, 0.0],
+                 "hp": 75.0, "shield": 50.0, "is_alive": True, "role": "leader"},
+                {"id": "blue_0", "team": "blue", "position": [100.0, -5.0, 120.0],
+                 "velocity": [0.0, 0.0, 0.0], "orientation": [0.0, 0.0, 0.0],
+                 "hp": 0.0, "shield": 50.0, "is_alive": False, "role": "support"},
+            ],
+            "projectiles": [{"position": [1.5, 2.5, 3.5]}],
+            "red_alive": 1, "blue_alive": 0, "red_hp": 75.0, "blue_hp": 0.0,
+        }]
+
+    def test_game_json_since_step(self):
+        """The serialized payload only carries frames from since_step onwards."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=20)
+        manager.run_game(game_id)
+        game = manager.games[game_id]
+
+        full = json.loads(manager.get_game_json(game_id))
+        tail = json.loads(manager.get_game_json(game_id, since=game.n_frames - 3))
+        empty = json.loads(manager.get_game_json(game_id, since=game.n_frames))
+
+        assert full["frames"] == json.loads(json.dumps(game.frame_dicts()))
+        assert tail["frames"] == full["frames"][-3:]
+        assert empty["frames"] == []
+        assert empty["status"] == "finished"
+        assert empty["total_frames"] == game.n_frames
+
+    def test_finished_payload_serialized_once(self, monkeypatch):
+        """A finished game's full payload is built once and reused verbatim."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=10)
+        manager.run_game(game_id)
+
+        first = manager.get_game_json(game_id)
+        monkeypatch.setattr(app_v2, "dumps_json", lambda obj: pytest.fail("re-serialized"))
+        second = manager.get_game_json(game_id)
+
+        assert second is first
+        assert json.loads(first)["winner"] == manager.games[game_id].winner
+
+    def test_running_payload_not_cached(self):
+        """Payloads of unfinished games are never cached."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=10)
+
+        manager.get_game_json(game_id)
+
+        assert manager.games[game_id].payload_bytes is None
+
+
+@pytest.fixture
+def http_server():
+    """Run the app's HTTP handler on an ephemeral port."""
+    server = app_v2.PooledHTTPServer(("127.0.0.1", 0), app_v2.Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class TestHandler:
+    """Tests for the HTTP API."""
+
+    def test_incremental_polling_collects_every_frame(self, http_server):
+        """Polling with since_step accumulates exactly the recorded frames."""
+        def get(path):
+            conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            body = resp.read()
+            conn.close()
+            return resp, body
+
+        _, body = get("/api/new_game?team_size=2&max_steps=40")
+        game_id = json.loads(body)["game_id"]
+
+        frames = []
+        deadline = time.time() + 30
+        while True:
+            resp, body = get(f"/api/game_data?game_id={game_id}&since_step={len(frames)}")
+            assert resp.status == 200
+            assert int(resp.getheader("Content-Length")) == len(body)
+            data = json.loads(body)
+            frames.extend(data["frames"])
+            if data["status"] == "finished":
+                break
+            assert time.time() < deadline
+            time.sleep(0.02)
+
+        assert [f["step"] for f in frames] == list(range(data["total_frames"]))
+
+    @pytest.mark.parametrize("query", [
+        "team_size=-1",
+        "team_size=0",
+        f"team_size={app_v2.MAX_TEAM_SIZE + 1}",
+        f"max_steps={app_v2.MAX_GAME_STEPS + 1}",
+        "max_steps=10000000000",
+        "max_steps=abc",
+    ])
+    def test_new_game_rejects_out_of_range_params(self, http_server, query):
+        """Invalid sizes get a 400 before any frame buffer is allocated."""
+        games_before = len(app_v2.manager.games)
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", f"/api/new_game?{query}")
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+
+        assert resp.status == 400
+        assert int(resp.getheader("Content-Length")) == len(body)
+        assert "error" in json.loads(body)
+        assert len(app_v2.manager.games) == games_before
+
+    def test_page_served_from_prebuilt_bytes(self, http_server):
+        """The index page is the pre-encoded HTML with an exact Content-Length."""
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", "/")
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+
+        assert resp.status == 200
+        assert body == app_v2.HTML_PAGE.encode("utf-8")
+        assert resp.getheader("Content-Length") == str(len(body))
+
+    @pytest.mark.parametrize("accept, gzipped", [
+        ("gzip, deflate", True),
+        ("br;q=1.0, gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("identity", False),
+    ])
+    def test_page_gzip_negotiation(self, http_server, accept, gzipped):
+        """The precompressed page is sent only to clients accepting gzip."""
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", "/", headers={"Accept-Encoding": accept})
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+
+        assert resp.getheader("Content-Length") == str(len(body))
+        if gzipped:
+            assert resp.getheader("Content-Encoding") == "gzip"
+            body = gzip.decompress(body)
+        else:
+            assert resp.getheader("Content-Encoding") is None
+        assert body == app_v2.HTML_PAGE_BYTES
+
+    def test_page_etag_short_circuits_repeat_loads(self, http_server):
+        """A matching If-None-Match gets an empty 304 for the same encoding."""
+        def get(headers):
+            conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+            conn.request("GET", "/", headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            conn.close()
+            return resp, body
+
+        first, _ = get({"Accept-Encoding": "gzip"})
+        etag = first.getheader("ETag")
+        repeat, body = get({"Accept-Encoding": "gzip", "If-None-Match": etag})
+        plain, plain_body = get({"If-None-Match": etag})
+
+        assert repeat.status == 304 and body == b""
+        assert repeat.getheader("ETag") == etag
+        assert plain.status == 200 and plain_body == app_v2.HTML_PAGE_BYTES
+        assert plain.getheader("ETag") != etag
+
+    def test_minify_fallback_keeps_code_lines(self, monkeypatch):
+        """Without htmlmin, comments and indentation go but every code line stays."""
+        monkeypatch.setattr(app_v2, "HAS_HTMLMIN", False)
+        html = (
+            "<html>\n    <!-- banner -->\n    <style>\n        /* note */ body { margin: 0; }\n"
+            "    </style>\n    <script>\n        // setup\n        const a = 1\n\n"
+            "        const b = 2;\n    </script>\n</html>\n"
+        )
+
+        minified = app_v2.minify_html(html)
+
+        assert minified.split("\n") == [
+            "<html>", "<style>", "body { margin: 0; }", "</style>", "<script>",
+            "const a = 1", "const b = 2;", "</script>", "</html>",
+        ]
+
+    def test_page_sent_with_one_sendfile(self):
+        """The full prebuilt page response goes out in one sendfile call."""
+        class Connection:
+            def __init__(self):
+                self.sent = []
+
+            def sendfile(self, file, offset=0, count=None):
+                file.seek(offset)
+                self.sent.append(file.read())
+
+        handler = app_v2.Handler.__new__(app_v2.Handler)
+        handler.headers = {"Accept-Encoding": "gzip"}
+        handler.connection = Connection()
+
+        handler.send_page()
+
+        assert handler.connection.sent == [app_v2.HTML_PAGE_GZ_RESPONSE]
+        assert handler.connection.sent[0].endswith(app_v2.HTML_PAGE_GZ)
+
+    def test_page_without_sendfile_writes_bytes(self, http_server, monkeypatch):
+        """Platforms without os.sendfile get the same response via a plain write."""
+        monkeypatch.setattr(app_v2, "HAS_SENDFILE", False)
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        conn.request("GET", "/")
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+
+        assert resp.status == 200 and body == app_v2.HTML_PAGE_BYTES
+
+    def test_polls_reuse_one_connection(self, http_server):
+        """Page, API and 404 responses all keep the HTTP/1.1 connection open."""
+        conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+        statuses, sockets = [], []
+        for path in ("/", "/api/status", "/missing", "/api/status"):
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            statuses.append(resp.status)
+            sockets.append(conn.sock)
+            assert resp.version == 11 and not resp.will_close
+        conn.close()
+
+        assert statuses == [200, 200, 404, 200]
+        assert all(sock is sockets[0] for sock in sockets)
+
+    def test_idle_connection_does_not_block_page(self, http_server):
+        """A client that never sends its request does not stall other clients."""
+        idle = socket.create_connection(("127.0.0.1", http_server), timeout=10)
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=5)
+            conn.request("GET", "/")
+            resp = conn.getresponse()
+            body = resp.read()
+            conn.close()
+        finally:
+            idle.close()
+
+        assert resp.status == 200 and body == app_v2.HTML_PAGE_BYTES
+
+    def test_idle_keepalive_connections_do_not_starve_pool(self, http_server):
+        """Idle keep-alive connections from a few browser tabs leave workers for other clients."""
+        idle = []
+        for _ in range(12):
+            conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+            conn.request("GET", "/api/status")
+            conn.getresponse().read()
+            idle.append(conn)
+        try:
+            start = time.perf_counter()
+            conn = http.client.HTTPConnection("127.0.0.1", http_server, timeout=10)
+            conn.request("GET", "/")
+            resp = conn.getresponse()
+            resp.read()
+            conn.close()
+            elapsed = time.perf_counter() - start
+        finally:
+            for conn in idle:
+                conn.close()
+
+        assert resp.status == 200
+        assert elapsed < 2.0
+        assert app_v2.Handler.timeout <= 5
+
+    def test_frame_json_without_orjson(self, monkeypatch):
+        """The stdlib fallback serializes frame rows to the same JSON as orjson."""
+        manager = GameManager()
+        game_id = manager.create_game(team_size=2, max_steps=10)
+        manager.run_game(game_id)
+        game = manager.games[game_id]
+        expected = json.loads(manager.get_game_json(game_id))["frames"]
+
+        monkeypatch.setattr(app_v2, "HAS_ORJSON", False)
+
+        assert [json.loads(app_v2.dumps_json(game._frame_row(k))) for k in range(game.n_frames)] == expected
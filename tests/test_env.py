@@ -3,6 +3,8 @@
 import pytest
 import numpy as np
 from backend.envs import CombatEnv, CombatConfig, Drone, DroneAction
+from backend.envs.combat_env import SPREAD_POOL_SIZE
+from backend.envs.weapons import Bullet, MissileProjectile, Flare
 
 
 class TestDrone:
@@ -136,6 +138,158 @@ class TestCombatEnv:
             assert obs.shape == (env.obs_dim,)
             assert obs.dtype == np.float32
     
+    def test_observation_neighbour_slots(self):
+        """Neighbour slots list the nearest living drones first and zero-pad the rest."""
+        env = CombatEnv(config=CombatConfig(team_size=3))
+        env.reset(seed=0)
+        me = env.drones["red_0"]
+        env.drones["blue_0"].position = me.position + np.array([300.0, 0.0, 0.0], dtype=np.float32)
+        env.drones["blue_1"].position = me.position + np.array([0.0, 90.0, 20.0], dtype=np.float32)
+        env.drones["blue_2"].is_alive = False
+        env.drones["red_2"].is_alive = False
+        
+        obs = env._get_observations()["red_0"]
+        
+        first, second, third = obs[13:23], obs[23:33], obs[33:43]
+        nearest = env.drones["blue_1"]
+        np.testing.assert_allclose(first[:3], (nearest.position - me.position) / 500.0, atol=1e-6)
+        assert first[6] == pytest.approx(me.distance_to(nearest) / 1000.0, abs=1e-6)
+        assert first[7] == pytest.approx(me.angle_to(nearest) / np.pi, abs=1e-5)
+        assert second[6] == pytest.approx(me.distance_to(env.drones["blue_0"]) / 1000.0, abs=1e-6)
+        assert not third.any()
+        ally, missing_ally = obs[43:51], obs[51:59]
+        assert ally[7] == 1.0 and not missing_ally.any()
+        np.testing.assert_allclose(obs[-3:], (me.position + 500.0) / np.array([1000.0, 1000.0, 1000.0]), atol=1e-6)
+    
+    def test_missile_targets_nearest_enemy(self):
+        """Test missiles lock onto the closest living enemy."""
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=42)
+        shooter = env.drones["red_0"]
+        env.drones["blue_0"].position = shooter.position + np.array([300.0, 0.0, 0.0], dtype=np.float32)
+        env.drones["blue_1"].position = shooter.position + np.array([80.0, 0.0, 0.0], dtype=np.float32)
+        
+        env._fire_missile(shooter)
+        
+        assert env.projectiles[-1].target_id == "blue_1"
+    
+    def test_gun_spread_is_seeded(self):
+        """Bullet spread comes from the seeded env RNG and refills past one pool."""
+        def directions(seed, shots):
+            env = CombatEnv(config=CombatConfig(team_size=1))
+            env.reset(seed=seed)
+            for _ in range(shots):
+                env._fire_gun(env.drones["red_0"])
+            return np.array([p.velocity for p in env.projectiles])
+        
+        shots = SPREAD_POOL_SIZE + 5
+        first, again, other = directions(7, shots), directions(7, shots), directions(8, shots)
+        
+        np.testing.assert_array_equal(first, again)
+        assert not np.allclose(first, other)
+        assert not np.allclose(first[:5], first[SPREAD_POOL_SIZE:])
+    
+    def test_collisions_skip_drones_killed_this_step(self):
+        """A projectile does not hit a drone an earlier projectile just killed."""
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=0)
+        target = env.drones["blue_0"]
+        target.hp, target.shield = 5.0, 0.0
+        here = target.position.copy()
+        env.projectiles = [
+            Bullet(f"b{i}", "red_0", "red", here.copy(), np.zeros(3, dtype=np.float32), 10.0, 1.0)
+            for i in range(2)
+        ] + [Bullet("own", "blue_1", "blue", here.copy(), np.zeros(3, dtype=np.float32), 10.0, 1.0)]
+        
+        events = env._check_collisions()
+        
+        assert events == [{"type": "kill", "attacker": "red_0", "target": "blue_0", "damage": 10.0}]
+        assert [p.id for p in env.projectiles] == ["b1", "own"]
+        assert env.drones["red_0"].kills == 1
+    
+    @pytest.mark.parametrize("use_numba", [True, False])
+    def test_projectile_step_matches_object_update(self, monkeypatch, use_numba):
+        """The array projectile pass matches per-object tracking and update, including flares."""
+        from backend.envs import combat_env
+        monkeypatch.setattr(combat_env, "HAS_NUMBA", use_numba and combat_env.HAS_NUMBA)
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=0)
+        target = env.drones["blue_0"]
+        
+        def missile(pid, x):
+            return MissileProjectile(pid, "red_0", "red", np.array([x, 0.0, 100.0]),
+                                     np.array([0.0, 150.0, 0.0]), 40.0, 3.5, target_id="blue_0")
+        env.projectiles = [missile("homing", -200.0), missile("decoyed", 200.0),
+                           Bullet("expiring", "red_0", "red", np.zeros(3), np.ones(3), 8.0, 0.05)]
+        env.flares = [Flare("f", np.array([200.0, 0.0, 100.0]), "blue_0")]
+        expected = missile("homing", -200.0)
+        expected.update_tracking(target.position, 0.1)
+        expected.update(0.1)
+        
+        env._update_projectiles(0.1)
+        
+        assert [p.id for p in env.projectiles] == ["homing", "decoyed"]
+        homing, decoyed = env.projectiles
+        np.testing.assert_allclose(homing.position, expected.position, rtol=1e-6)
+        np.testing.assert_allclose(homing.velocity, expected.velocity, rtol=1e-6)
+        assert homing.lifetime == pytest.approx(3.4)
+        assert decoyed.target_id is None
+        np.testing.assert_allclose(decoyed.position, [200.0, 15.0, 100.0])
+    
+    def test_boundaries_clamp_and_ground_damage(self):
+        """Drones leaving the map are clamped and bounced; hitting the ground costs HP."""
+        env = CombatEnv(config=CombatConfig(team_size=1))
+        env.reset(seed=0)
+        low, high = env.drones["red_0"], env.drones["blue_0"]
+        low.position = np.array([-600.0, 0.0, -10.0], dtype=np.float32)
+        low.velocity = np.array([-20.0, 5.0, -10.0], dtype=np.float32)
+        high.position = np.array([0.0, 700.0, 400.0], dtype=np.float32)
+        high.velocity = np.array([0.0, 30.0, 8.0], dtype=np.float32)
+        shield = low.shield
+        
+        env._check_boundaries()
+        
+        np.testing.assert_array_equal(low.position, [-500.0, 0.0, 0.0])
+        np.testing.assert_array_equal(low.velocity, [10.0, 5.0, 5.0])
+        np.testing.assert_array_equal(high.position, [0.0, 500.0, 300.0])
+        np.testing.assert_array_equal(high.velocity, [0.0, -15.0, -4.0])
+        assert low.shield == shield - 5.0 and high.shield == shield
+    
+    def test_alive_bitset_tracks_drones(self):
+        """Kills and direct is_alive writes land in the env's alive bitset used by done/info."""
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=0)
+        env.drones["blue_0"].take_damage(500.0)
+        env.drones["blue_1"].is_alive = False
+        
+        assert env._alive.tolist() == [True, True, False, False]
+        assert env._team_id.tolist() == [0, 0, 1, 1]
+        assert env._get_info() == {"step": 0, "red_alive": 2, "blue_alive": 0, "winner": "red"}
+        terminated, _ = env._check_done()
+        assert all(terminated.values())
+        
+        env.reset(seed=0)
+        assert env._alive.all() and env.drones["blue_1"].is_alive
+    
+    def test_state_soa_matches_render_state(self):
+        """The array snapshot carries the same values as the render dicts."""
+        env = CombatEnv(config=CombatConfig(team_size=2))
+        env.reset(seed=3)
+        for _ in range(5):
+            env.step({d: {"discrete": 1, "continuous": [1.0, 0.0, 0.2, 0.0]} for d in env.drones})
+        
+        soa = env.get_state_soa()
+        render = env.get_state_for_render()
+        
+        assert soa["ids"] == [d["id"] for d in render["drones"]]
+        assert [("red", "blue")[t] for t in soa["team"]] == [d["team"] for d in render["drones"]]
+        np.testing.assert_allclose(soa["pos"], [d["position"] for d in render["drones"]], rtol=1e-6)
+        np.testing.assert_allclose(soa["vel"], [d["velocity"] for d in render["drones"]], rtol=1e-6)
+        np.testing.assert_allclose(soa["hp"], [d["hp"] for d in render["drones"]], rtol=1e-6)
+        assert soa["alive"].tolist() == [d["is_alive"] for d in render["drones"]]
+        assert soa["projectiles"].shape == (len(render["projectiles"]), 3)
+        assert env.get_state_soa()["pos"] is soa["pos"]
+    
     def test_env_gymnasium_compatible(self):
         """Test Gymnasium compatibility."""
         env = CombatEnv()
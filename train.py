@@ -49,6 +49,8 @@ def train(args):
         lr_actor=args.lr_actor,
         lr_critic=args.lr_critic,
         buffer_size=args.buffer_size,
+        compile=args.compile,
+        cuda_graph=args.cuda_graph,
     )
     
     # Training metrics
@@ -61,43 +63,49 @@ def train(args):
     for episode in pbar:
         observations, info = env.reset()
         agent_ids = list(observations.keys())
-        state = np.concatenate([observations[aid] for aid in agent_ids])
+        obs_batch = np.stack([observations[aid] for aid in agent_ids])
+        state = obs_batch.reshape(-1)
         
         episode_reward = 0.0
         step = 0
         done = False
         
         while not done:
-            # Get actions
-            actions, log_probs = agent.act(observations)
-            values = agent.get_values(state, agent_ids)
+            # Get actions as dense arrays in agent_ids order; only the env sees dicts
+            discrete, continuous, log_probs = agent.act_arrays(obs_batch)
+            value = agent.get_values(state)
+            actions = {aid: {"discrete": discrete[i], "continuous": continuous[i]}
+                       for i, aid in enumerate(agent_ids)}
             
             # Step environment
             next_observations, rewards, terminated, truncated, info = env.step(actions)
             done = all(terminated.values()) or all(truncated.values())
             
-            next_state = np.concatenate([next_observations[aid] for aid in agent_ids])
+            next_obs_batch = np.stack([next_observations[aid] for aid in agent_ids])
+            next_state = next_obs_batch.reshape(-1)
+            reward_arr = np.array([rewards[aid] for aid in agent_ids], dtype=np.float32)
             
             # Store transition
-            agent.store_transition(
-                observations=observations,
+            agent.store_arrays(
+                observations=obs_batch,
                 state=state,
-                actions=actions,
-                rewards=rewards,
-                dones=terminated,
+                discrete_actions=discrete,
+                continuous_actions=continuous,
+                rewards=reward_arr,
+                dones=[terminated[aid] for aid in agent_ids],
                 log_probs=log_probs,
-                values=values,
-                agent_ids=agent_ids,
+                values=value,
             )
             
-            observations = next_observations
+            obs_batch = next_obs_batch
             state = next_state
-            episode_reward += sum(rewards.values())
+            episode_reward += float(reward_arr.sum())
             step += 1
             
             # Update agent
             if agent.should_update():
-                last_values = np.array([agent.policy.get_value(state) for _ in agent_ids])
+                # The centralized critic value is shared by all agents: one forward, broadcast
+                last_values = np.full(len(agent_ids), agent.get_values(state), dtype=np.float32)
                 metrics = agent.update(last_values)
         
         # Record episode stats
@@ -198,6 +206,9 @@ def main():
     parser.add_argument("--self-play", action="store_true", help="Enable self-play training")
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
     parser.add_argument("--log-dir", type=str, default="runs", help="TensorBoard log directory")
+    parser.add_argument("--compile", action="store_true", help="Compile actor/critic with torch.compile")
+    parser.add_argument("--cuda-graph", action="store_true",
+                        help="Replay the actor forward as a CUDA graph (ignored with --compile or off CUDA)")
     
     args = parser.parse_args()
     